@@ -36,13 +36,16 @@ QUOTIENT_CONDITIONS = {
 }
 
 
-def apply_conditions(D, T, conditions):
+def apply_conditions(D, T, conditions, stats=None):
     result = np.full_like(D, np.nan, dtype=float)
     for case in conditions.values():
         d_mask = np.isin(D, case["D_values"])
         for q_value, condition in case["q_conditions"]:
             mask = d_mask & condition(D, T)
             result[mask] = q_value
+            if stats is not None:
+                stats.count("mask_evaluations")
+                stats.count("cells_assigned", np.count_nonzero(mask))
     return result
 
 
@@ -130,7 +133,7 @@ def plot_scatter(
         )
 
 
-def plot_quotient_regions(D, T, q, overlap_q1_q0, overlap_q0_qm1, quadrants):
+def plot_quotient_regions(D, T, q, overlap_q1_q0, overlap_q0_qm1, quadrants, save_path=None, show=True):
     fig, ax = plt.subplots(figsize=(4, 100))
 
     cmap = create_custom_colormap()
@@ -217,29 +220,28 @@ def plot_quotient_regions(D, T, q, overlap_q1_q0, overlap_q0_qm1, quadrants):
     ax.yaxis.set_major_formatter(FuncFormatter(binary_formatter(T_BITS, T_FRACTIONAL_BITS)))
 
     plt.tight_layout()
-    current_file_path = os.path.abspath(__file__)
-    current_dir = os.path.dirname(current_file_path)
-    save_path = os.path.abspath(os.path.join(current_dir, "../../figures/division"))
+    if save_path is None:
+        current_file_path = os.path.abspath(__file__)
+        current_dir = os.path.dirname(current_file_path)
+        save_path = os.path.abspath(os.path.join(current_dir, "../../figures/division"))
     os.makedirs(save_path, exist_ok=True)
     filename = f"radix2_qds_basic_{quadrants}.pdf"
     full_save_path = os.path.join(save_path, filename)
     plt.savefig(full_save_path, dpi=600, format="pdf", bbox_inches="tight")
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)
 
 
 def main():
-    try:
-        # Calculate quotient digits
-        q = get_quotient_digit(D, T)
+    # Calculate quotient digits
+    q = get_quotient_digit(D, T)
 
-        # Detect overlap regions
-        overlap_q1_q0, overlap_q0_qm1 = detect_overlaps(D, T)
+    # Detect overlap regions
+    overlap_q1_q0, overlap_q0_qm1 = detect_overlaps(D, T)
 
-        # Plot the results for quadrants 1, 2, 3, and 4
-        plot_quotient_regions(D, T, q, overlap_q1_q0, overlap_q0_qm1, "quadrants_1_2_3_4")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    # Plot the results for quadrants 1, 2, 3, and 4
+    plot_quotient_regions(D, T, q, overlap_q1_q0, overlap_q0_qm1, "quadrants_1_2_3_4")
 
 
 if __name__ == "__main__":
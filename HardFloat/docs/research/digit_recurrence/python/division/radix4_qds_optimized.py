@@ -40,13 +40,16 @@ QUOTIENT_CONDITIONS = {
 }
 
 
-def apply_conditions(D, T, conditions):
+def apply_conditions(D, T, conditions, stats=None):
     result = np.full_like(D, np.nan, dtype=float)
     for case in conditions.values():
         d_mask = np.isin(D, case["D_values"])
         for q_value, condition in case["q_conditions"]:
             mask = d_mask & condition(D, T)
             result[mask] = q_value
+            if stats is not None:
+                stats.count("mask_evaluations")
+                stats.count("cells_assigned", np.count_nonzero(mask))
     return result
 
 
@@ -92,7 +95,7 @@ def transform(x: int, y: int) -> tuple[int, int]:
         return (xp_high, yp_high)
 
 
-def remove_overlaps(d_list, min_t_list, max_t_list):
+def remove_overlaps(d_list, min_t_list, max_t_list, stats=None, log=print):
     for i in range(len(d_list) - 1):
         if d_list[i + 1] - d_list[i] == 0:
             x = max_t_list[i + 1]
@@ -104,12 +107,18 @@ def remove_overlaps(d_list, min_t_list, max_t_list):
                 new_x, new_y = transform(x, y)
                 max_t_list[i + 1] = new_x
                 min_t_list[i] = new_y
+                if stats is not None:
+                    stats.count("overlaps_resolved")
             except ValueError as e:
-                print(f"Error at index {i}: {e}")
+                if stats is not None:
+                    stats.count("unsupported_diff")
+                    stats.event("unsupported_diff", column=int(d_list[i]), index=i, diff=int(diff))
+                if log is not None:
+                    log(f"Error at index {i}: {e}")
     return min_t_list, max_t_list
 
 
-def get_quotient_digit_no_overlap(D, T, conditions):
+def get_quotient_digit_no_overlap(D, T, conditions, stats=None):
     """Calculates quotient digits after removing overlaps."""
     result = np.full_like(D, np.nan, dtype=float)
 
@@ -127,6 +136,8 @@ def get_quotient_digit_no_overlap(D, T, conditions):
                 if t_values.size > 0:
                     min_t_values[q_value] = np.min(t_values)
                     max_t_values[q_value] = np.max(t_values)
+            if stats is not None:
+                stats.count("mask_evaluations", len(q_conditions))
 
             # Sort q values based on sign of D
             sorted_q_values = sorted(min_t_values.keys(), reverse=(d_val >= 0))
@@ -137,13 +148,14 @@ def get_quotient_digit_no_overlap(D, T, conditions):
             max_t_list = [max_t_values[q] for q in sorted_q_values]
 
             # Remove overlaps
-            min_t_list, max_t_list = remove_overlaps(d_list, min_t_list, max_t_list)
-            print(d_list, min_t_list, max_t_list)
+            min_t_list, max_t_list = remove_overlaps(d_list, min_t_list, max_t_list, stats)
 
             # Apply the adjusted conditions
             for i, q_value in enumerate(sorted_q_values):
                 mask = d_mask & (T >= min_t_list[i]) & (T <= max_t_list[i])
                 result[mask] = q_value
+                if stats is not None:
+                    stats.count("cells_assigned", np.count_nonzero(mask))
 
     return result
 
@@ -172,7 +184,7 @@ def create_custom_colormap():
     return ListedColormap(colors)
 
 
-def plot_quotient_regions_no_overlap(D, T, q, quadrants):
+def plot_quotient_regions_no_overlap(D, T, q, quadrants, save_path=None, show=True):
     fig, ax = plt.subplots(figsize=(4, 100))
     cmap = create_custom_colormap()
     color_mapping = {
@@ -235,26 +247,25 @@ def plot_quotient_regions_no_overlap(D, T, q, quadrants):
     ax.yaxis.set_major_formatter(FuncFormatter(binary_formatter(T_BITS, T_FRACTIONAL_BITS)))
 
     plt.tight_layout()
-    current_file_path = os.path.abspath(__file__)
-    current_dir = os.path.dirname(current_file_path)
-    save_path = os.path.abspath(os.path.join(current_dir, "../../figures/division"))
+    if save_path is None:
+        current_file_path = os.path.abspath(__file__)
+        current_dir = os.path.dirname(current_file_path)
+        save_path = os.path.abspath(os.path.join(current_dir, "../../figures/division"))
     os.makedirs(save_path, exist_ok=True)
     filename = f"radix4_qds_optimized_{quadrants}.pdf"
     full_save_path = os.path.join(save_path, filename)
     plt.savefig(full_save_path, dpi=600, format="pdf", bbox_inches="tight")
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)
 
 
 def main():
-    try:
-        # Calculate quotient digits without overlaps
-        q_no_overlap = get_quotient_digit_no_overlap(D, T, QUOTIENT_CONDITIONS)
+    # Calculate quotient digits without overlaps
+    q_no_overlap = get_quotient_digit_no_overlap(D, T, QUOTIENT_CONDITIONS)
 
-        # Plot the results for quadrants 1, 2, 3, and 4
-        plot_quotient_regions_no_overlap(D, T, q_no_overlap, "quadrants_1_2_3_4")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    # Plot the results for quadrants 1, 2, 3, and 4
+    plot_quotient_regions_no_overlap(D, T, q_no_overlap, "quadrants_1_2_3_4")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,6 @@
+"""Shared tooling for the digit-recurrence selector scripts.
+
+The scripts under ``division/`` and ``square_root/`` stay runnable on their own; this package
+drives them in bulk and hosts the analysis helpers that operate on the tables they generate.
+Run it from the ``python/`` directory: ``python -m drtools --help`` lists the driver's subcommands.
+"""
@@ -0,0 +1,197 @@
+"""Quotient-digit activity and a first-order switching-energy estimate of the recurrence loop.
+
+The digit a selector picks sets how much of the loop switches: a zero digit adds nothing to the
+residual and shifts a constant digit into the on-the-fly converter, a digit of 2 selects the shifted
+divisor multiple.  ``simulate_activity`` runs ``simulate_division``/``simulate_sqrt`` with
+``words=True`` and counts, per operation,
+
+* the selected digits, by value;
+* bit toggles of the registers and buses of one iteration: the residual ``sum`` and ``carry`` words,
+  the ``addend`` (the divisor multiple or root subtrahend) into the 3:2 row, and the
+  ``quotient``/``quotient_minus_ulp`` registers of the on-the-fly conversion, which shift in
+  ``log2(r)`` bits per digit as ``accRes``/``accResMinusUlp`` do.
+
+Toggles are counted between consecutive iterations of one operation only, not against whatever the
+previous operation left in the registers.  Operations that fail to converge are dropped from the
+histogram, the toggles and the per-operation figures, and reported as ``failures``.  The energy per
+operation is ``toggles * C * Vdd**2 / 2`` with one switched capacitance per bit, so it ranks tables
+rather than predicting a layout.
+
+Tables are compared under overlap-resolution ``POLICIES``, over the same conditions:
+
+* ``basic`` -- the basic scripts' ``apply_conditions``, where the digit listed last wins an overlap;
+* ``transform`` -- ``drtools.tables.overlap_policy``, the radix's seams, as the pipeline resolves every target;
+* ``min_magnitude``/``max_magnitude`` -- every cell gets the smallest or largest-magnitude digit its
+  conditions allow, i.e. the most zero digits or the fewest.
+
+    python -m drtools.activity
+    python -m drtools.activity --only radix4_qds_optimized --policy transform min_magnitude --count 1000000
+    python -m drtools.activity --spec operation=square_root radix=4 x_bits=5 t_bits=8 --operand-bits 25
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from . import simulate, tables
+
+DEFAULT_BATCH = 1 << 14
+POLICIES = ("basic", "transform", "min_magnitude", "max_magnitude")
+NETS = ("sum", "carry", "addend", "quotient", "quotient_minus_ulp")
+POPCOUNT = np.array([bin(octet).count("1") for octet in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """Set bits of every ``uint64`` word."""
+    octets = np.ascontiguousarray(words, dtype=np.uint64).view(np.uint8)
+    return POPCOUNT[octets].reshape(*np.shape(words), 8).sum(axis=-1, dtype=np.int64)
+
+
+def toggles(states):
+    """Bit toggles between consecutive rows of ``(steps, operands)`` words, per operand."""
+    return popcount(states[1:] ^ states[:-1]).sum(axis=0)
+
+
+def on_the_fly(digits, radix):
+    """``(quotient, quotient_minus_ulp)`` register states, ``(iterations + 1, operands)``.
+
+    Both registers shift ``log2(radix)`` bits per digit and keep the ``log2(radix) * iterations``
+    bits of the full result.
+    """
+    iterations, count = digits.shape
+    width = (radix.bit_length() - 1) * iterations
+    if width > 64:
+        raise ValueError(f"A {width}-bit result register does not fit the uint64 model")
+    mask = (1 << width) - 1
+    quotient = np.zeros((iterations + 1, count), dtype=np.int64)
+    minus_ulp = np.zeros((iterations + 1, count), dtype=np.int64)
+    for j in range(iterations):
+        q = digits[j].astype(np.int64)
+        q_shifted, m_shifted = quotient[j] * radix, minus_ulp[j] * radix
+        quotient[j + 1] = np.where(q >= 0, q_shifted + q, m_shifted + radix + q) & mask
+        minus_ulp[j + 1] = np.where(q > 0, q_shifted + q - 1, m_shifted + radix - 1 + q) & mask
+    return quotient.astype(np.uint64), minus_ulp.astype(np.uint64)
+
+
+def policy_digits(X, T, conditions, policy):
+    """The digit grid that gives every cell the smallest (largest) magnitude digit allowed there."""
+    digits = np.full_like(X, np.nan, dtype=float)
+    for case in conditions.values():
+        values, digit_conditions = tables.case_fields(case)
+        x_mask = np.isin(X, values)
+        # Later digits overwrite earlier ones.
+        for digit, condition in sorted(
+            digit_conditions, key=lambda pair: abs(pair[0]), reverse=policy == "min_magnitude"
+        ):
+            digits[x_mask & condition(X, T)] = digit
+    return digits
+
+
+def policy_lut(target, policy):
+    """``(spec, lut)`` of ``target`` with its overlaps resolved by ``policy``."""
+    from .exhaustive import target_lut
+    from .lut import compile_lut
+    from .pipeline import load_target, target_spec
+
+    if policy == "transform":
+        return target_lut(target)
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}")
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    if policy == "basic":
+        digits = tables.apply_conditions(X, T, conditions)
+    else:
+        digits = policy_digits(X, T, conditions, policy)
+    return spec, compile_lut(spec, X, T, digits)
+
+
+def simulate_activity(
+    spec, lut, operand_bits, iterations=None, count=1 << 16, seed=0, batch=DEFAULT_BATCH, signed_divisor=False
+):
+    """Returns the digit histogram and per-net toggle totals of those of ``count`` random operations that converge."""
+    from .exhaustive import default_iterations
+
+    iterations = iterations or default_iterations(spec, operand_bits)
+    a = spec.digit_bound
+    summary = {
+        "operations": count,
+        "failures": 0,
+        "iterations": iterations,
+        "digits": np.zeros(2 * a + 1, dtype=np.int64),
+        "toggles": dict.fromkeys(NETS, 0),
+    }
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        operands = simulate.random_operands(spec.operation, size, operand_bits, seed + start // batch, signed_divisor)
+        if spec.operation == "division":
+            result = simulate.simulate_division(lut, spec, *operands, iterations, operand_bits, words=True)
+        else:
+            result = simulate.simulate_sqrt(lut, spec, *operands, iterations, operand_bits, words=True)
+        ok = result.ok
+        digits = result.digits[:, ok]
+        quotient, minus_ulp = on_the_fly(digits, spec.radix)
+        states = {net: words[:, ok] for net, words in result.words.items()}
+        states.update(quotient=quotient, quotient_minus_ulp=minus_ulp)
+        for net in NETS:
+            summary["toggles"][net] += int(toggles(states[net]).sum())
+        summary["digits"] += np.bincount(digits.ravel().astype(np.int64) + a, minlength=2 * a + 1)
+        summary["failures"] += int((~result.ok).sum())
+    return summary
+
+
+def energy(summary, capacitance, vdd):
+    """Switching energy per converged operation, in the units of ``capacitance * vdd**2``."""
+    operations = max(summary["operations"] - summary["failures"], 1)
+    return sum(summary["toggles"].values()) / operations * capacitance * vdd * vdd / 2
+
+
+def describe(summary, capacitance, vdd):
+    a = (summary["digits"].size - 1) // 2
+    steps = max(int(summary["digits"].sum()), 1)
+    operations = max(summary["operations"] - summary["failures"], 1)
+    digits = "  ".join(f"{digit:+d} {100 * n / steps:5.1f}%" for digit, n in zip(range(-a, a + 1), summary["digits"]))
+    nets = "  ".join(f"{net} {n / operations:.1f}" for net, n in summary["toggles"].items())
+    total = sum(summary["toggles"].values()) / operations
+    return [
+        f"  digits      {digits}",
+        f"  toggles/op  {nets}  total {total:.1f}",
+        f"  energy/op   {energy(summary, capacitance, vdd):.1f} fJ ({summary['iterations']} iterations)",
+    ]
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .pipeline import target_name
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Digit activity, register toggles and switching energy per operation.")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--policy", nargs="+", choices=POLICIES, default=list(POLICIES))
+    parser.add_argument("--operand-bits", type=int, default=24)
+    parser.add_argument("--iterations", type=int, help="recurrence steps (default: operand bits plus a guard digit)")
+    parser.add_argument("--count", type=int, default=1 << 18, help="random operations (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--signed-divisor", action="store_true", help="draw negative divisors too")
+    parser.add_argument("--capacitance", type=float, default=1.0, help="fF switched per bit toggle (default: 1)")
+    parser.add_argument("--vdd", type=float, default=0.8, help="supply voltage (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    for target in targets or ["radix4_qds_optimized"]:
+        for policy in args.policy:
+            spec, lut = policy_lut(target, policy)
+            summary = simulate_activity(
+                spec, lut, args.operand_bits, args.iterations, args.count, args.seed, signed_divisor=args.signed_divisor
+            )
+            name = target_name(target)
+            print(f"{name} {policy}: {summary['operations']} operations, {summary['failures']} failures dropped")
+            for line in describe(summary, args.capacitance, args.vdd):
+                print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Headless, parallel regeneration of the selector figures.
+
+Every (script, quadrants) pair is rendered with the non-interactive Agg backend in a process pool.
+A figure is skipped when the hash of the tables it plots matches the one recorded in the manifest
+next to the figures and the PDF is still on disk.
+
+    python -m drtools.batch [--jobs N] [--force] [--figures-dir DIR] [--only NAME ...]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from .scripts import FIGURE_SCRIPTS, FIGURES_DIR
+
+MANIFEST_NAME = ".figure_hashes.json"
+
+
+@dataclass
+class RenderResult:
+    """One figure of ``render_all``: ``status`` is ``rendered``, ``unchanged`` or ``failed``."""
+
+    key: str
+    status: str
+    seconds: float = 0.0
+    error: BaseException = None
+
+
+def table_hash(name, quadrants, inputs):
+    digest = hashlib.sha256(f"{name}:{quadrants}".encode())
+    for array in inputs:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(figures_dir):
+    path = os.path.join(figures_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(figures_dir, manifest):
+    os.makedirs(figures_dir, exist_ok=True)
+    path = os.path.join(figures_dir, MANIFEST_NAME)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg", force=True)
+
+
+def render_figure(name, quadrants, figures_dir, known_hash=None, force=False):
+    """Renders one figure unless its table hash is unchanged; returns (key, hash, status, seconds)."""
+    script = FIGURE_SCRIPTS[name]
+    start = time.perf_counter()
+    module = script.load()
+    inputs = script.compute(module)
+    digest = table_hash(name, quadrants, inputs)
+    figure_path = script.figure_path(quadrants, figures_dir)
+    key = os.path.relpath(figure_path, figures_dir)
+    if not force and digest == known_hash and os.path.exists(figure_path):
+        return key, digest, "unchanged", time.perf_counter() - start
+    script.plot(module, inputs, quadrants, figures_dir=figures_dir, show=False)
+    return key, digest, "rendered", time.perf_counter() - start
+
+
+def figure_jobs(names=None):
+    names = names or list(FIGURE_SCRIPTS)
+    return [(name, quadrants) for name in names for quadrants in FIGURE_SCRIPTS[name].quadrants]
+
+
+def render_all(names=None, figures_dir=FIGURES_DIR, jobs=None, force=False):
+    """Renders every figure/quadrant combination in parallel and updates the manifest.
+
+    Returns a ``RenderResult`` per figure; one whose render raised is ``failed`` and holds the
+    exception.  The manifest keeps the digests of every figure that did render, even when others
+    failed.
+    """
+    os.environ["MPLBACKEND"] = "Agg"
+    manifest = load_manifest(figures_dir)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+            futures = []
+            for name, quadrants in figure_jobs(names):
+                key = os.path.relpath(FIGURE_SCRIPTS[name].figure_path(quadrants, figures_dir), figures_dir)
+                futures.append(
+                    (key, executor.submit(render_figure, name, quadrants, figures_dir, manifest.get(key), force))
+                )
+            for key, future in futures:
+                try:
+                    key, digest, status, seconds = future.result()
+                except Exception as error:
+                    results.append(RenderResult(key, "failed", error=error))
+                    continue
+                manifest[key] = digest
+                results.append(RenderResult(key, status, seconds))
+    finally:
+        save_manifest(figures_dir, manifest)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate the selector figures without a GUI.")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="render even if the table hash is unchanged")
+    parser.add_argument("--figures-dir", default=FIGURES_DIR, help="output root (default: %(default)s)")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="restrict to these scripts")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = render_all(args.only, os.path.abspath(args.figures_dir), args.jobs, args.force)
+    for result in results:
+        if result.error is not None:
+            print(f"{result.status:>9}  {result.key}: {type(result.error).__name__}: {result.error}")
+        else:
+            print(f"{result.status:>9}  {result.seconds:6.2f}s  {result.key}")
+    rendered = sum(result.status == "rendered" for result in results)
+    failed = sum(result.status == "failed" for result in results)
+    print(
+        f"{rendered} rendered, {len(results) - rendered - failed} unchanged, {failed} failed "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""Benchmarks of the selector pipeline with stored baselines and a regression report.
+
+Each benchmark runs ``--repeat`` times and records the minimum and median wall time; regressions
+are judged on the minimum, which is the least sensitive to a busy machine.  The grid
+sizes are ``x_bits/t_bits`` pairs of radix-4 division lattices built by ``drtools.regions``; the
+script functions (``apply_conditions``, ``get_quotient_digit_no_overlap``, ``remove_overlaps``) are
+called from ``radix4_qds_optimized.py`` on those lattices, and its scatter plot and both exports draw
+the resolved table of each.
+
+    python -m drtools.bench                       # run and compare with the stored baseline
+    python -m drtools.bench --save-baseline       # run and replace the baseline
+    python -m drtools.bench --sizes 5/8 8/14 --only simulate --repeat 3
+
+Timings only compare on one machine, so ``bench_baseline.json`` is not committed: the first
+``--save-baseline`` run on a machine writes it next to the ``drtools`` package (git ignores it), and
+until then every benchmark reports ``new``.
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import simulate, tables
+from .lut import compile_lut
+from .regions import TableSpec
+from .scripts import FIGURE_SCRIPTS, PYTHON_DIR
+
+DEFAULT_SIZES = ("5/8", "6/10", "7/12", "8/14")
+DEFAULT_BASELINE = os.path.join(PYTHON_DIR, "bench_baseline.json")
+SIMULATION_OPERANDS = 1 << 14
+SIMULATION_ITERATIONS = 12
+OPERAND_BITS = 24
+
+
+def parse_size(text):
+    x_bits, t_bits = (int(part) for part in text.split("/"))
+    return TableSpec("division", 4, x_bits, t_bits)
+
+
+def column_intervals(X, T, conditions):
+    """Returns the per-column ``(x_list, min_t_list, max_t_list)`` that ``remove_overlaps`` walks."""
+    columns = []
+    t_values = T[:, 0]
+    for case in conditions.values():
+        values, digit_conditions = tables.case_fields(case)
+        masks = [(digit, condition(X, T)) for digit, condition in digit_conditions]
+        for x in values:
+            column = int(np.flatnonzero(X[0] == x)[0])
+            bounds = {}
+            for digit, mask in masks:
+                t = t_values[mask[:, column]]
+                if t.size > 0:
+                    bounds[digit] = (int(t.min()), int(t.max()))
+            order = sorted(bounds, reverse=(x >= 0))
+            columns.append(([x] * len(order), [bounds[q][0] for q in order], [bounds[q][1] for q in order]))
+    return columns
+
+
+def benchmark_cases(sizes):
+    """Yields ``(name, setup)`` pairs; ``setup()`` returns the zero-argument callable to time.
+
+    A benchmark that holds resources while it runs (the plots' output directory) returns a context
+    manager yielding the callable instead.
+    """
+    division = FIGURE_SCRIPTS["radix4_qds_optimized"]
+    module = division.load()
+
+    for text in sizes:
+        spec = parse_size(text)
+        label = f"x{spec.x_bits}_t{spec.t_bits}"
+
+        def setup_apply(spec=spec):
+            X, T = spec.grid()
+            conditions = spec.conditions()
+            return lambda: module.apply_conditions(X, T, conditions)
+
+        def setup_no_overlap(spec=spec):
+            X, T = spec.grid()
+            conditions = spec.conditions()
+            return lambda: module.get_quotient_digit_no_overlap(X, T, conditions)
+
+        def setup_remove_overlaps(spec=spec):
+            X, T = spec.grid()
+            columns = column_intervals(X, T, spec.conditions())
+
+            def run():
+                for x_list, min_t_list, max_t_list in columns:
+                    module.remove_overlaps(x_list, list(min_t_list), list(max_t_list))
+
+            return run
+
+        def setup_simulate(spec=spec):
+            X, T = spec.grid()
+            digits, _, _ = tables.resolve_overlaps(X, T, spec.conditions(), module.remove_overlaps)
+            table = compile_lut(spec, X, T, digits)
+            x, d = simulate.random_operands("division", SIMULATION_OPERANDS, OPERAND_BITS)
+            return lambda: simulate.simulate_division(table, spec, x, d, SIMULATION_ITERATIONS, OPERAND_BITS)
+
+        @contextlib.contextmanager
+        def setup_plot(fmt, spec=spec):
+            from .export import export_figure
+
+            X, T = spec.grid()
+            inputs = (X, T, module.get_quotient_digit_no_overlap(X, T, spec.conditions()))
+            with tempfile.TemporaryDirectory(prefix="drtools_bench_") as figures_dir:
+                if fmt == "scatter":
+                    yield lambda: division.plot(
+                        module, inputs, "quadrants_1_2_3_4", figures_dir=figures_dir, show=False
+                    )
+                else:
+                    yield lambda: export_figure(division.name, "quadrants_1_2_3_4", fmt, figures_dir, inputs=inputs)
+
+        yield f"apply_conditions/{label}", setup_apply
+        yield f"get_quotient_digit_no_overlap/{label}", setup_no_overlap
+        yield f"remove_overlaps/{label}", setup_remove_overlaps
+        yield f"simulate_division/{label}", setup_simulate
+        yield f"plot/scatter/{label}", lambda setup_plot=setup_plot: setup_plot("scatter")
+        yield f"plot/polygon_pdf/{label}", lambda setup_plot=setup_plot: setup_plot("pdf")
+        yield f"plot/pgfplots/{label}", lambda setup_plot=setup_plot: setup_plot("tikz")
+
+    def setup_simulate_sqrt():
+        script = FIGURE_SCRIPTS["radix4_rds_optimized"]
+        root_module = script.load()
+        X, T, digits = script.compute(root_module)[:3]
+        spec = script.spec(root_module)
+        table = compile_lut(spec, X, T, digits)
+        (x,) = simulate.random_operands("square_root", SIMULATION_OPERANDS, OPERAND_BITS)
+        return lambda: simulate.simulate_sqrt(table, spec, x, SIMULATION_ITERATIONS, OPERAND_BITS)
+
+    yield "simulate_sqrt/x5_t8", setup_simulate_sqrt
+
+
+def measure(function, repeat, budget):
+    """Times ``repeat`` calls after a warm-up, stopping early once ``budget`` seconds are spent.
+
+    A warm-up slower than the budget is kept as the only sample, so the largest lattices still
+    finish in reasonable time.
+    """
+    start = time.perf_counter()
+    function()
+    warmup = time.perf_counter() - start
+    times = [warmup] if warmup > budget else []
+    spent = 0.0
+    while len(times) < repeat and (not times or spent < budget):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        spent += times[-1]
+    return {"min": min(times), "median": statistics.median(times), "repeat": len(times)}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, patterns=None, repeat=5, budget=5.0, log=None):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    results = {}
+    for name, setup in benchmark_cases(sizes):
+        if patterns and not any(fnmatch.fnmatch(name, f"*{pattern}*") for pattern in patterns):
+            continue
+        # The scripts print overlap widths and unresolved cells as they go; keep that out of the report.
+        with contextlib.ExitStack() as stack, contextlib.redirect_stdout(io.StringIO()):
+            function = setup()
+            if isinstance(function, contextlib.AbstractContextManager):
+                function = stack.enter_context(function)
+            results[name] = measure(function, repeat, budget)
+        if log:
+            log(name, results[name])
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance):
+    """Returns ``[(name, baseline_min, current_min, ratio, status), ...]`` for the measured benchmarks."""
+    rows = []
+    for name, result in results.items():
+        reference = baseline["results"].get(name) if baseline else None
+        if reference is None:
+            rows.append((name, None, result["min"], None, "new"))
+            continue
+        ratio = result["min"] / reference["min"]
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+        elif ratio < 1 - tolerance:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append((name, reference["min"], result["min"], ratio, status))
+    return rows
+
+
+def format_report(rows):
+    width = max(len(name) for name, *_ in rows)
+    lines = [f"{'benchmark':<{width}}  {'baseline':>10}  {'current':>10}  {'ratio':>6}  status"]
+    for name, reference, current, ratio, status in rows:
+        reference = f"{reference * 1e3:9.2f}ms" if reference is not None else f"{'-':>10}"
+        ratio = f"{ratio:6.2f}" if ratio is not None else f"{'-':>6}"
+        lines.append(f"{name:<{width}}  {reference}  {current * 1e3:8.2f}ms  {ratio}  {status}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the selector pipeline.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="x_bits/t_bits lattices")
+    parser.add_argument("--only", nargs="+", help="run benchmarks whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=5.0, help="seconds per benchmark before stopping early")
+    parser.add_argument(
+        "--baseline", default=DEFAULT_BASELINE, help="baseline file, written by --save-baseline (default: %(default)s)"
+    )
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--json", help="also write the results and comparison to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.sizes,
+        args.only,
+        args.repeat,
+        args.budget,
+        log=lambda name, result: print(f"{result['median'] * 1e3:10.2f}ms  {name}", file=sys.stderr),
+    )
+    baseline = load_baseline(args.baseline)
+    rows = compare(results, baseline, args.tolerance)
+    print(format_report(rows))
+    if baseline is None and not args.save_baseline:
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record this machine's")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"environment": environment(), "results": results, "comparison": rows}, f, indent=2)
+            f.write("\n")
+    if args.save_baseline:
+        merged = dict(baseline["results"]) if baseline else {}
+        merged.update(results)
+        save_baseline(args.baseline, merged)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    return 1 if any(status == "REGRESSION" for *_, status in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
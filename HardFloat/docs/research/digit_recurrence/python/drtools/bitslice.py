@@ -0,0 +1,377 @@
+"""Bit-sliced simulation of the division recurrence, 64 operands per ``uint64``.
+
+A ``W``-bit quantity of ``N`` operands is held as ``W`` bit planes of ``ceil(N / 64)`` words: plane
+``i`` packs bit ``i`` of 64 operands per word.  Every step of ``drtools.simulate.simulate_division``
+becomes bitwise operations on whole planes -- the ``t_bits`` estimate adder, the selector evaluated
+as minimized sums of products (``drtools.logic``) over the estimate and divisor column bits, the
+3:2 carry-save update, the convergence check and the on-the-fly conversion of the quotient -- so one
+NumPy operation advances 64 operands by one bit.  The divisor does not change between steps, so the
+column halves of the products, the multiples of ``d`` and the convergence bound are formed once.
+
+The results match ``simulate_division`` operand for operand, including the wrap of the estimate;
+only the wrapping carry-save estimate and the multiples ``d`` and ``2d`` are modelled.  Operands are
+packed from arrays, or for ``drtools.exhaustive`` built directly as planes of the enumeration::
+
+    functions = bitslice.selector_functions(lut, spec.digit_bound)
+    result = bitslice.simulate_division(lut, spec, x, d, iterations, operand_bits, functions)
+    x, d = bitslice.exhaustive_planes(operand_bits, start, stop)
+    result = bitslice.simulate_planes(lut, spec, x, d, stop - start, iterations, operand_bits, functions)
+
+Minimizing the selector takes seconds for a radix-4 script table and minutes for a ``x_bits=7,
+t_bits=9`` one, so ``drtools.exhaustive`` takes them from ``cached_selector_functions``, which
+keeps the result under the cache directory.
+"""
+
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass
+
+import numpy as np
+
+from .logic import minimize
+from .lut import HOLE
+from .simulate import datapath
+
+ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+ZERO = np.uint64(0)
+BLOCK_LANES = 4096
+
+
+@dataclass
+class BitSlicedResult:
+    ok: np.ndarray
+    failed_at: np.ndarray
+    quotient: np.ndarray
+
+    @property
+    def result(self):
+        """The quotient modulo ``2**(iterations * log2(r))``, as signed integers."""
+        return unpack(self.quotient, self.ok.size)
+
+
+def pack(values, width):
+    """Returns the ``(width, ceil(N / 64))`` bit planes of the two's-complement ``values``."""
+    values = np.asarray(values, dtype=np.int64)
+    padded = np.zeros(-(-values.size // 64) * 64, dtype=np.int64)
+    padded[: values.size] = values
+    octets = np.ascontiguousarray(padded.view(np.uint8).reshape(-1, 8).T)
+    planes = np.empty((width, padded.size // 8), dtype=np.uint8)
+    for i in range(width):
+        bit = min(i, 63)
+        planes[i] = np.packbits(octets[bit >> 3] >> (bit & 7) & 1, bitorder="little")
+    return planes.view(np.uint64)
+
+
+def unpack(planes, count, signed=True):
+    """Inverse of ``pack`` for the first ``count`` operands."""
+    octets = np.zeros((8, planes.shape[1] * 64), dtype=np.uint8)
+    for i, plane in enumerate(planes[:64]):
+        octets[i >> 3] |= np.unpackbits(plane.view(np.uint8), bitorder="little") << (i & 7)
+    values = np.ascontiguousarray(octets.T).view(np.int64)[:count, 0]
+    if signed and len(planes) < 64:
+        values = values - ((values >> (len(planes) - 1) & 1) << len(planes))
+    return values
+
+
+def exhaustive_planes(operand_bits, start, stop, signed_divisor=True):
+    """Planes of the division operands ``start`` to ``stop`` of ``simulate.exhaustive_operands``.
+
+    The enumeration index is bit-sliced directly: its low six bits are the same in every word and
+    the others are constant across a word, so no operand is packed.  ``start`` must be a multiple
+    of 64; the lanes past ``stop`` hold operands that are not checked.
+    """
+    if start % 64:
+        raise ValueError(f"Start {start} is not a multiple of 64")
+    lanes = -(-(stop - start) // 64)
+    words = (start >> 6) + np.arange(lanes, dtype=np.uint64)
+    pattern = np.arange(64, dtype=np.uint64)
+
+    def index(bit):
+        if bit < 6:
+            return np.full(lanes, np.bitwise_or.reduce((pattern >> np.uint64(bit) & np.uint64(1)) << pattern))
+        return ZERO - (words >> np.uint64(bit - 6) & np.uint64(1))
+
+    zeros, ones = np.zeros(lanes, dtype=np.uint64), np.full(lanes, ONES)
+    divisor_bits = operand_bits if signed_divisor else operand_bits - 1
+    x = [index(divisor_bits + i) for i in range(operand_bits - 1)] + [ones, zeros]
+    negative = index(operand_bits - 1) if signed_divisor else zeros
+    d = [index(i) ^ negative for i in range(operand_bits - 1)] + [~negative, negative]
+    return np.stack(x), np.stack(d)
+
+
+def _flags(plane, count):
+    return np.unpackbits(plane.view(np.uint8), bitorder="little")[:count].astype(bool)
+
+
+def _carries(generate, propagate, carry):
+    """Carries into every position of a ripple chain, and the carry out of it."""
+    carries = np.empty_like(generate)
+    for i in range(generate.shape[0]):
+        carries[i] = carry
+        carry = generate[i] | (carry & propagate[i])
+    return carries, carry
+
+
+def _add(a, b, carry=None):
+    """Ripple-carry sum of two equally wide plane stacks, modulo ``2**width``."""
+    half = a ^ b
+    carries, _ = _carries(a & b, half, np.zeros_like(a[0]) if carry is None else carry)
+    return half ^ carries
+
+
+def _negative(a, b):
+    """Sign plane of ``a + b``, from the carry chain alone."""
+    half = a ^ b
+    _, carry = _carries((a & b)[:-1], half[:-1], np.zeros_like(a[0]))
+    return half[-1] ^ carry
+
+
+def _increment(a, carry):
+    carries = np.empty_like(a)
+    for i in range(a.shape[0]):
+        carries[i] = carry
+        carry = carry & a[i]
+    return a ^ carries
+
+
+def _constant(value, width, lanes):
+    return np.array([ONES if value >> i & 1 else ZERO for i in range(width)])[:, None].repeat(lanes, axis=1)
+
+
+def _resize(a, width):
+    """Sign-extends or truncates a plane stack to ``width`` planes."""
+    if width <= a.shape[0]:
+        return a[:width]
+    return np.concatenate([a, np.repeat(a[-1:], width - a.shape[0], axis=0)])
+
+
+def _shift(a, k):
+    return np.concatenate([np.zeros((k, a.shape[1]), dtype=np.uint64), a[:-k]]) if k else a
+
+
+def selector_functions(lut, a):
+    """Minimized selector outputs ``valid``, ``pos``, ``neg`` and ``mag1..mag<a>`` of a ``DigitLUT``.
+
+    Inputs are the estimate bits (the low ``t_bits``) and the column offset bits above them.
+    ``valid`` is off at holes and outside the table; elsewhere a hole is a don't-care.
+    """
+    n = max(1, (lut.columns - 1).bit_length()) + lut.t_bits
+    digits = np.asarray(lut.table).astype(int)
+    minterms = np.arange(digits.size)
+    assigned = digits != HOLE
+    unused = np.arange(digits.size, 1 << n)
+    dc = np.concatenate([minterms[~assigned], unused]).tolist()
+    functions = {
+        "valid": minimize(minterms[assigned].tolist(), unused.tolist(), n),
+        "pos": minimize(minterms[digits > 0].tolist(), dc, n),
+        "neg": minimize(minterms[assigned & (digits < 0)].tolist(), dc, n),
+    }
+    for k in range(1, a + 1):
+        functions[f"mag{k}"] = minimize(minterms[np.abs(digits) == k].tolist(), dc, n)
+    return functions
+
+
+def cached_selector_functions(lut, a, cache_dir):
+    """``selector_functions`` stored under ``cache_dir``, keyed by the table and the package sources."""
+    from .tasks import source_fingerprint
+
+    digest = hashlib.sha256(f"{lut.first_column}:{lut.columns}:{lut.t_bits}:{a}".encode())
+    digest.update(np.ascontiguousarray(lut.table).tobytes())
+    digest.update(source_fingerprint(("drtools",)).encode())
+    path = os.path.join(cache_dir, "selectors", f"{digest.hexdigest()}.pkl")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    functions = selector_functions(lut, a)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        pickle.dump(functions, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+    return functions
+
+
+def _product_plan(keys):
+    """Orders the products of ``(value, mask)`` keys as ``(key, parent, bit, polarity)``, upper literals first.
+
+    Keys sharing their upper literals share the planes of those partial products.
+    """
+    plan, known = [], {(0, 0)}
+    for value, mask in keys:
+        parent = (0, 0)
+        for bit in reversed(range(mask.bit_length())):
+            if mask >> bit & 1:
+                key = (parent[0] | value & 1 << bit, parent[1] | 1 << bit)
+                if key not in known:
+                    known.add(key)
+                    plan.append((key, parent, bit, value >> bit & 1))
+                parent = key
+    return plan
+
+
+def _products(inputs, plan):
+    """Executes a ``_product_plan`` on input planes; the empty product is ``None``."""
+    complements = [~plane for plane in inputs]
+    products = {(0, 0): None}
+    for key, parent, bit, polarity in plan:
+        literal = inputs[bit] if polarity else complements[bit]
+        products[key] = literal if products[parent] is None else products[parent] & literal
+    return products
+
+
+def _selector_plan(functions, names, t_bits):
+    """Splits every cube into its column and estimate halves.
+
+    Returns the product plans of both halves and, per output, ``{estimate_key: [column_key, ...]}``.
+    """
+    t_mask = (1 << t_bits) - 1
+    groups = {name: {} for name in names}
+    for name in names:
+        for value, mask in functions[name]:
+            key = (value & t_mask, mask & t_mask)
+            groups[name].setdefault(key, []).append((value >> t_bits, mask >> t_bits))
+    column_keys = {key for output in groups.values() for keys in output.values() for key in keys}
+    estimate_keys = {key for output in groups.values() for key in output}
+    return _product_plan(sorted(column_keys)), _product_plan(sorted(estimate_keys)), groups
+
+
+def _column_terms(groups, columns):
+    """ORs the column halves sharing an estimate half; ``None`` stands for a constant one."""
+    terms = {}
+    for key, column_keys in groups.items():
+        planes = [columns[column_key] for column_key in column_keys]
+        terms[key] = None if any(plane is None for plane in planes) else np.bitwise_or.reduce(planes)
+    return terms
+
+
+def _evaluate(terms, estimates, like):
+    result = np.zeros_like(like)
+    for key, column in terms.items():
+        estimate = estimates[key]
+        if column is None and estimate is None:
+            result[...] = ONES
+        elif column is None or estimate is None:
+            result |= estimate if column is None else column
+        else:
+            result |= column & estimate
+    return result
+
+
+def simulate_division(lut, spec, x, d, iterations, operand_bits, functions=None):
+    """Bit-sliced ``drtools.simulate.simulate_division`` of operand arrays."""
+    return simulate_planes(
+        lut, spec, pack(x, operand_bits + 1), pack(d, operand_bits + 1), np.size(x), iterations, operand_bits, functions
+    )
+
+
+def check_spec(spec, operand_bits):
+    """The datapath of a bit-sliced division of ``spec``; raises ``ValueError`` for what it does not model."""
+    if spec.operation != "division":
+        raise ValueError("The bit-sliced simulator covers division only")
+    if spec.estimate != "carry_save" or not spec.wrap:
+        raise ValueError("The bit-sliced simulator models the wrapping carry-save estimate only")
+    if spec.digit_bound > 2:
+        raise ValueError("The bit-sliced simulator forms the multiples d and 2d only")
+    path = datapath(spec, operand_bits, 0)
+    # The residual is formed in W bits: with three integer bits, one that does not fit is out of
+    # bounds before and after the wrap.  (r - 1) times it is compared with a |d| in W + 2 bits.
+    if path.width - path.fractional_bits < 3:
+        raise ValueError("The bit-sliced simulator needs an estimate with at least three integer bits")
+    return path
+
+
+def simulate_planes(lut, spec, x, d, count, iterations, operand_bits, functions=None, block=BLOCK_LANES):
+    """Simulates ``count`` operands given as ``operand_bits + 1``-bit planes.
+
+    ``functions`` are from ``selector_functions``.  Returns a ``BitSlicedResult`` with ``ok`` and
+    ``failed_at`` as in ``SimulationResult`` and the quotient as planes, unpacked by ``result``.
+    The lanes are simulated ``block`` words at a time, so that a block's planes stay in cache.
+    """
+    path = check_spec(spec, operand_bits)
+    functions = functions or selector_functions(lut, spec.digit_bound)
+    names = ["valid", "pos", "neg"] + [f"mag{k}" for k in range(1, spec.digit_bound + 1)]
+    plans = _selector_plan(functions, names, lut.t_bits)
+
+    failures, quotients = [], []
+    for first in range(0, x.shape[1], block):
+        lanes = slice(first, first + block)
+        failure, quotient = _simulate_block(lut, spec, path, plans, x[:, lanes], d[:, lanes], iterations, operand_bits)
+        failures.append(failure)
+        quotients.append(quotient)
+    failures = np.concatenate(failures, axis=1)
+    failed_at = np.full(count, -1, dtype=np.int32)
+    for j, failure in enumerate(failures):
+        failed_at[_flags(failure, count)] = j
+    return BitSlicedResult(failed_at < 0, failed_at, np.concatenate(quotients, axis=1))
+
+
+def _simulate_block(lut, spec, path, plans, x, d, iterations, operand_bits):
+    """Returns the planes of the operands failing at each step and the quotient planes."""
+    a, r = spec.digit_bound, spec.radix
+    log_radix = r.bit_length() - 1
+    lanes = x.shape[1]
+    width, shift = path.width, int(path.t_shift)
+    wide = width + 2
+    scale = path.fractional_bits - operand_bits
+
+    # The column offset d >> (operand_bits - xf) - first_column, with room to compare it with the columns.
+    column_width = spec.x_fractional_bits + 3
+    offset = _add(
+        _resize(d[operand_bits - spec.x_fractional_bits :], column_width),
+        _constant(-lut.first_column, column_width, lanes),
+    )
+    inside = ~offset[-1] & _negative(offset, _constant(-lut.columns, column_width, lanes))
+    column_plan, estimate_plan, groups = plans
+    columns = _products(list(offset[: max(1, (lut.columns - 1).bit_length())]), column_plan)
+    terms = {name: _column_terms(output, columns) for name, output in groups.items()}
+
+    divisor = _resize(_shift(d, scale), wide)
+    multiples = [divisor[:width], _shift(divisor, 1)[:width]][:a]
+    limit = _shift(_increment(divisor ^ divisor[-1], divisor[-1]), a - 1)
+    complement_limit = ~limit
+
+    total, carry = _resize(_shift(x, scale), width), np.zeros((width, lanes), dtype=np.uint64)
+    quotient = np.zeros((0, lanes), dtype=np.uint64)
+    quotient_minus = np.zeros((0, lanes), dtype=np.uint64)
+    failed = np.zeros(lanes, dtype=np.uint64)
+    failures = np.zeros((iterations, lanes), dtype=np.uint64)
+    for j in range(iterations):
+        estimates = _products(list(_add(total[shift:], carry[shift:])), estimate_plan)
+        selected = {name: _evaluate(output, estimates, inside) for name, output in terms.items()}
+        valid = selected["valid"] & inside
+        pos, neg = selected["pos"] & valid, selected["neg"] & valid
+        magnitudes = [selected[f"mag{k}"] & valid for k in range(1, a + 1)]
+
+        # -q d: the selected multiple, complemented and incremented for a positive digit.
+        product = multiples[0] & magnitudes[0]
+        if a == 2:
+            product |= multiples[1] & magnitudes[1]
+        addend = _increment(product ^ pos, pos)
+        total, carry = total ^ carry ^ addend, _shift((total & carry) | (addend & (total ^ carry)), 1)
+
+        # Out of bounds when (r - 1) w - a |d| - 1 is not negative or (r - 1) w + a |d| is.
+        scaled = _resize(_add(total, carry), wide)
+        if r == 4:
+            scaled = _add(scaled, _shift(scaled, 1))
+        over, under = ~_negative(scaled, complement_limit), _negative(scaled, limit)
+        failures[j] = (~valid | over | under) & ~failed
+        failed |= failures[j]
+        total, carry = _shift(total, log_radix), _shift(carry, log_radix)
+
+        # On-the-fly conversion: Q' is Q (q >= 0) or QM with q mod r appended, QM' is Q (q > 0) or
+        # QM with (q - 1) mod r appended.  QM starts as -1, so its first selection is never taken.
+        low = np.zeros((log_radix, lanes), dtype=np.uint64)
+        low_minus = np.zeros_like(low)
+        for q in range(-a, a + 1):
+            planes = ~(pos | neg) if q == 0 else (pos if q > 0 else neg) & magnitudes[abs(q) - 1]
+            for i in range(log_radix):
+                if q % r >> i & 1:
+                    low[i] |= planes
+                if (q - 1) % r >> i & 1:
+                    low_minus[i] |= planes
+        difference = quotient ^ quotient_minus
+        quotient, quotient_minus = (
+            np.concatenate([low, quotient ^ (difference & neg)]),
+            np.concatenate([low_minus, quotient_minus ^ (difference & pos)]),
+        )
+    return failures, quotient
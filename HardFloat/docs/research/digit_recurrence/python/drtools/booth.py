@@ -0,0 +1,326 @@
+"""Bit-sliced model of ``Radix4BoothMultiplier``: Booth recoding, partial-product columns and reduction.
+
+``partial_product_columns`` builds the columns ``MultiplierStage1`` builds, bit for bit and in the
+same order, on the bit planes of ``drtools.bitslice`` (64 operations per uint64): ``width // 2 + 1``
+radix-4 Booth digits of the sign-extended multiplier, each selecting ``0``, ``±m`` or ``±2m`` as a
+``width + 1``-bit row inverted for a negative digit, the sign-extension prefix (``~s s s`` on the
+first row, ``1 ~s`` on the others) and the ``isNeg`` bit in the row's lowest column.
+``multiply_planes`` then runs the carry-chain Dadda reducers of ``drtools.compressor`` on those
+planes -- ``MultiplierStage1`` down to ``initHeight``, ``MultiplierStage2`` down to two rows -- and
+the ``FinalAdder``, so the products are the RTL's, not merely the right ones.
+
+``product`` packs uint64 operands of up to 64 bits, multiplies them block by block and returns the
+``2 * width``-bit products as ``(lo, hi)`` uint64 arrays; ``reference_product`` computes the same
+from 32-bit limbs without any recoding.  ``riscv_multiply`` adds the result selection of
+``PreMultiplierStage``/``PostMultiplierStage``: ``mul``, ``mulh``, ``mulhsu``, ``mulhu`` and, with
+``half_width``, the sign-extended low word of ``mulw``; ``main`` checks every one against
+``reference_riscv`` on the corner operands and random ones.  The products per second ``main``
+prints are the model's alone, on one core; the rate with the reference is printed next to it.  ``column_heights`` and ``column_sizes``
+are the reducer's input profile and what ``MultiplierStage1.getColumnSizes`` returns.
+
+    python -m drtools.booth --width 64 --count 4000000
+    python -m drtools.booth --width 32 --init-height 3 --columns
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from . import bitslice
+from .bitslice import _add as _add_planes
+from .compressor import LOGIC, CounterUsage, dadda_height_schedule_carry_chain, dadda_reducer_carry_chain
+
+OPS = {
+    # (high word, multiplicand signed, multiplier signed), as PreMultiplierStage decodes them.
+    "mul": (False, False, False),
+    "mulh": (True, True, True),
+    "mulhsu": (True, True, False),
+    "mulhu": (True, False, False),
+}
+BLOCK_LANES = 4096
+CHUNK = 1 << 20
+RISCV_COUNT = 1 << 16
+
+
+def _mask(bits):
+    """``(lo, hi)`` masks of the low ``bits`` of a 128-bit value."""
+    return np.uint64((1 << min(bits, 64)) - 1), np.uint64((1 << max(bits - 64, 0)) - 1)
+
+
+def _shl(value, shift):
+    lo, hi = value
+    if shift == 0:
+        return lo, hi
+    if shift >= 64:
+        return np.zeros_like(lo), lo << np.uint64(shift - 64)
+    return lo << np.uint64(shift), (hi << np.uint64(shift)) | (lo >> np.uint64(64 - shift))
+
+
+def _shr(value, shift):
+    lo, hi = value
+    if shift == 0:
+        return lo, hi
+    if shift >= 64:
+        return hi >> np.uint64(shift - 64), np.zeros_like(hi)
+    return (lo >> np.uint64(shift)) | (hi << np.uint64(64 - shift)), hi >> np.uint64(shift)
+
+
+def _add(a, b):
+    lo = a[0] + b[0]
+    return lo, a[1] + b[1] + (lo < a[0]).astype(np.uint64)
+
+
+def _and(value, mask):
+    return value[0] & mask[0], value[1] & mask[1]
+
+
+def partial_product_columns(multiplicand, multiplier, multiplicand_signed, multiplier_signed, width):
+    """The ``2 * width`` columns of ``MultiplierStage1`` from ``width`` planes per operand.
+
+    The signedness inputs are single planes (all ones for a signed operand).  Constant bits are
+    planes too, so every column holds as many entries as the RTL's.
+    """
+    zeros = np.zeros_like(multiplicand[0])
+    ones = ~zeros
+    multiplicand_sign = multiplicand_signed & multiplicand[width - 1]
+    multiplier_sign = multiplier_signed & multiplier[width - 1]
+    groups = (width >> 1) + 1
+    extended = [zeros] + list(multiplier) + [multiplier_sign] * (2 * groups - width)
+    columns = [[] for _ in range(2 * width)]
+    for i in range(groups):
+        low, middle, high = extended[2 * i : 2 * i + 3]
+        # The QMC-minimised Booth table: 001/010 -> +1, 011 -> +2, 100 -> -2, 101/110 -> -1, 111 -> -0.
+        is_neg = high
+        is_mag1 = low ^ middle
+        is_mag2 = (high & ~middle & ~low) | (~high & middle & low)
+        row = [(multiplicand[0] & is_mag1) ^ is_neg]
+        row += [((multiplicand[j] & is_mag1) | (multiplicand[j - 1] & is_mag2)) ^ is_neg for j in range(1, width)]
+        row.append(((multiplicand_sign & is_mag1) | (multiplicand[width - 1] & is_mag2)) ^ is_neg)
+        row_sign = (multiplicand_sign & (is_mag1 | is_mag2)) ^ is_neg
+        row += [row_sign, row_sign, ~row_sign] if i == 0 else [~row_sign, ones]
+        for j, bit in enumerate(row):
+            if 2 * i + j < len(columns):
+                columns[2 * i + j].append(bit)
+        columns[2 * i].append(is_neg)
+    return columns
+
+
+def _reduce(columns, target_height, usage):
+    height = max(len(column) for column in columns)
+    if height <= target_height:
+        return columns, 0
+    schedule = dadda_height_schedule_carry_chain(height, target_height)
+    for limit in schedule:
+        columns = dadda_reducer_carry_chain(columns, limit, usage, LOGIC)
+    return columns, len(schedule)
+
+
+def final_adder(columns):
+    """``FinalAdder``: passes the single-bit low columns through and adds the two rows above them."""
+    zeros = np.zeros_like(next(bit for column in columns for bit in column))
+    split = next((i for i, column in enumerate(columns) if len(column) > 1), len(columns))
+    lower = [column[0] if column else zeros for column in columns[:split]]
+    if split == len(columns):
+        return np.stack(lower)
+    rows = [np.stack([column[k] if len(column) > k else zeros for column in columns[split:]]) for k in (0, 1)]
+    return np.stack(lower + list(_add_planes(*rows)))
+
+
+def multiply_planes(multiplicand, multiplier, multiplicand_signed, multiplier_signed, width, init_height=3):
+    """``2 * width`` product planes through both multiplier stages."""
+    columns = partial_product_columns(multiplicand, multiplier, multiplicand_signed, multiplier_signed, width)
+    columns, _ = _reduce(columns, init_height, CounterUsage())
+    columns, _ = _reduce(columns, 2, CounterUsage())
+    return final_adder(columns)
+
+
+def _flag_planes(flags, count):
+    flags = np.broadcast_to(np.asarray(flags, dtype=bool), (count,))
+    return bitslice.pack(flags.astype(np.int64), 1)[0]
+
+
+def product(multiplicand, multiplier, width, multiplicand_signed=False, multiplier_signed=False, init_height=3):
+    """The ``2 * width``-bit products of uint64 operand arrays as ``(lo, hi)``.
+
+    The signedness flags are scalars or boolean arrays, like the per-operation inputs of the RTL.
+    """
+    multiplicand = np.asarray(multiplicand, dtype=np.uint64) & _mask(width)[0]
+    multiplier = np.asarray(multiplier, dtype=np.uint64) & _mask(width)[0]
+    count = multiplicand.size
+    lo, hi = np.empty(count, dtype=np.uint64), np.empty(count, dtype=np.uint64)
+    a_planes = bitslice.pack(multiplicand.view(np.int64), width)
+    b_planes = bitslice.pack(multiplier.view(np.int64), width)
+    a_signed, b_signed = _flag_planes(multiplicand_signed, count), _flag_planes(multiplier_signed, count)
+    for start in range(0, a_planes.shape[1], BLOCK_LANES):
+        block = slice(start, start + BLOCK_LANES)
+        planes = multiply_planes(
+            a_planes[:, block], b_planes[:, block], a_signed[block], b_signed[block], width, init_height
+        )
+        operations = slice(64 * start, min(64 * (start + BLOCK_LANES), count))
+        size = operations.stop - operations.start
+        lo[operations] = bitslice.unpack(planes[:64], size, signed=False).view(np.uint64)
+        if 2 * width > 64:
+            hi[operations] = bitslice.unpack(planes[64:], size, signed=False).view(np.uint64)
+        else:
+            hi[operations] = 0
+    return lo, hi
+
+
+def reference_product(multiplicand, multiplier, width, multiplicand_signed=False, multiplier_signed=False):
+    """The same product from 32-bit limbs, with the signed operands corrected afterwards."""
+    a = np.asarray(multiplicand, dtype=np.uint64) & _mask(width)[0]
+    b = np.asarray(multiplier, dtype=np.uint64) & _mask(width)[0]
+    low32 = np.uint64(0xFFFFFFFF)
+    a0, a1, b0, b1 = a & low32, a >> np.uint64(32), b & low32, b >> np.uint64(32)
+    total = (a0 * b0, np.zeros_like(a))
+    for partial, shift in ((a0 * b1, 32), (a1 * b0, 32), (a1 * b1, 64)):
+        total = _add(total, _shl((partial, np.zeros_like(partial)), shift))
+    # A negative operand x stands for x - 2**width: subtract the other operand shifted by width.
+    for x, y, signed in ((a, b, multiplicand_signed), (b, a, multiplier_signed)):
+        negative = np.asarray(signed, dtype=bool) & ((x >> np.uint64(width - 1)) & np.uint64(1)).astype(bool)
+        shifted = _shl((y, np.zeros_like(y)), width)
+        negated = _add((~shifted[0], ~shifted[1]), (np.ones_like(y), np.zeros_like(y)))
+        total = _add(total, tuple(np.where(negative, n, np.uint64(0)) for n in negated))
+    return _and(total, _mask(2 * width))
+
+
+def riscv_multiply(op, in1, in2, width=64, half_width=False, init_height=3):
+    """The ``RISCVMultiplier`` result of ``op`` as a uint64 array; ``half_width`` is ``mulw`` on 64 bits."""
+    high, multiplicand_signed, multiplier_signed = OPS[op]
+    lo, hi = product(in1, in2, width, multiplicand_signed, multiplier_signed, init_height)
+    if high:
+        return _shr((lo, hi), width)[0] & _mask(width)[0]
+    result = lo & _mask(width)[0]
+    if half_width:
+        half = width >> 1
+        low = result & _mask(half)[0]
+        negative = ((low >> np.uint64(half - 1)) & np.uint64(1)).astype(bool)
+        result = np.where(negative, low | (~_mask(half)[0] & _mask(width)[0]), low)
+    return result
+
+
+def reference_riscv(op, in1, in2, width=64, half_width=False):
+    """``riscv_multiply`` from Python integers and the RISC-V definition of ``op``, one pair at a time."""
+    high, in1_signed, in2_signed = OPS[op]
+    bits = width >> 1 if half_width else width
+    mask = (1 << bits) - 1
+
+    def value(x, signed):
+        x &= mask
+        return x - (1 << bits) if signed and x >> (bits - 1) else x
+
+    results = []
+    for x, y in zip(np.asarray(in1).tolist(), np.asarray(in2).tolist()):
+        result = value(x, in1_signed) * value(y, in2_signed)
+        result = result >> bits & mask if high else result & mask
+        if half_width:
+            # mulw sign-extends the low word of the product of the low words.
+            result = value(result, True) & ((1 << width) - 1)
+        results.append(result)
+    return np.array(results, dtype=np.uint64)
+
+
+def corner_operands(width):
+    """Every pair of zero, one, minus one, the extremes, alternating patterns and single set or clear bits."""
+    mask = (1 << width) - 1
+    values = {0, 1, 2, 3, mask, mask - 1, 1 << (width - 1), (1 << (width - 1)) - 1, (1 << (width - 1)) + 1}
+    values |= {int("01" * width, 2) & mask, int("10" * width, 2) & mask, int("0011" * width, 2) & mask}
+    values |= {1 << i for i in range(width)} | {mask ^ (1 << i) for i in range(width)}
+    values = np.array(sorted(values), dtype=np.uint64)
+    a, b = np.meshgrid(values, values)
+    return a.ravel(), b.ravel()
+
+
+def random_operands(width, count, seed=0):
+    rng = np.random.default_rng(seed)
+    mask = _mask(width)[0]
+    return tuple(rng.integers(0, 1 << 64, count, dtype=np.uint64) & mask for _ in range(2))
+
+
+def column_heights(width):
+    """Bits per column of ``MultiplierStage1`` before its reduction."""
+    planes = np.zeros((width, 1), dtype=np.uint64)
+    columns = partial_product_columns(planes, planes, planes[0], planes[0], width)
+    return [len(column) for column in columns]
+
+
+def column_sizes(width, init_height=3):
+    """``MultiplierStage1.getColumnSizes``, with the ``CounterUsage`` and stage count of its reduction."""
+    planes = np.zeros((width, 1), dtype=np.uint64)
+    usage = CounterUsage()
+    columns, stages = _reduce(partial_product_columns(planes, planes, planes[0], planes[0], width), init_height, usage)
+    return [len(column) for column in columns], usage, stages
+
+
+def check(width, operands, seed=0, init_height=3):
+    """Indices where ``product`` and ``reference_product`` differ, over random signedness flags."""
+    a, b = operands
+    rng = np.random.default_rng(seed + 1)
+    a_signed, b_signed = (rng.integers(0, 2, a.size).astype(bool) for _ in range(2))
+    expected = reference_product(a, b, width, a_signed, b_signed)
+    actual = product(a, b, width, a_signed, b_signed, init_height)
+    return np.flatnonzero((expected[0] != actual[0]) | (expected[1] != actual[1]))
+
+
+def _usage_text(usage):
+    return (
+        f"5:3 counter = {usage.num5to3}, 4:3 counter = {usage.num4to3}, "
+        f"3:2 counter = {usage.num3to2}, 2:2 counter = {usage.num2to2}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bit-sliced Radix4BoothMultiplier model.")
+    parser.add_argument("--width", type=int, default=64, help="operand width in bits, 2 to 64")
+    parser.add_argument("--count", type=int, default=1 << 22, help="random operand pairs (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--init-height", type=int, default=3, help="MultiplierStage1 target height")
+    parser.add_argument("--columns", action="store_true", help="print the column profile and reductions")
+    args = parser.parse_args(argv)
+    if not 2 <= args.width <= 64:
+        parser.error("--width must be between 2 and 64")
+
+    if args.columns:
+        sizes, usage, stages = column_sizes(args.width, args.init_height)
+        columns = [[0] * size for size in sizes]
+        final_usage = CounterUsage()
+        _, final_stages = _reduce(columns, 2, final_usage)
+        print(f"column heights: {column_heights(args.width)}")
+        print(f"column sizes:   {sizes}")
+        print(f"Dadda Reduction (Initial) - steps = {stages}, {_usage_text(usage)}")
+        print(f"Dadda Reduction (Final) - steps = {final_stages}, {_usage_text(final_usage)}")
+
+    corners = corner_operands(args.width)
+    failures = check(args.width, corners, args.seed, args.init_height).size
+    print(f"corner cases: {corners[0].size} pairs, {failures} mismatches")
+    elapsed = 0.0
+    begun = time.perf_counter()
+    for start in range(0, args.count, CHUNK):
+        a, b = random_operands(args.width, min(CHUNK, args.count - start), args.seed + start // CHUNK)
+        expected = reference_product(a, b, args.width)
+        started = time.perf_counter()
+        actual = product(a, b, args.width, init_height=args.init_height)
+        elapsed += time.perf_counter() - started
+        failures += int(((expected[0] != actual[0]) | (expected[1] != actual[1])).sum())
+        failures += check(args.width, (a[:4096], b[:4096]), args.seed + start, args.init_height).size
+    print(
+        f"random: {args.count} pairs, {failures} mismatches in total, {args.count / elapsed / 1e6:.2f} M products/s "
+        f"({args.count / (time.perf_counter() - begun) / 1e6:.2f} M/s with operand generation and the reference)"
+    )
+    random = random_operands(args.width, RISCV_COUNT, args.seed)
+    a, b = (np.concatenate(pair) for pair in zip(corners, random))
+    for op in OPS:
+        for half_width in (False, True) if op == "mul" and args.width == 64 else (False,):
+            started = time.perf_counter()
+            actual = riscv_multiply(op, a, b, args.width, half_width, args.init_height)
+            rate = a.size / (time.perf_counter() - started) / 1e6
+            mismatches = int((actual != reference_riscv(op, a, b, args.width, half_width)).sum())
+            failures += mismatches
+            print(f"  {op + ('w' if half_width else ''):<7} {rate:6.2f} M ops/s, {mismatches} mismatches in {a.size}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
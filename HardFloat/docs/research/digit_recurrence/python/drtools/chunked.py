@@ -0,0 +1,320 @@
+"""Bounded-memory generation, overlap detection, resolution and lint of large truncation grids.
+
+The dense pipeline builds the whole ``(X, T)`` meshgrid, its float masks and a float digit grid at
+once, several hundred MB at ``x_bits=10, t_bits=16``.  Here the grid is only ever built a chunk of
+whole columns at a time, sized so that the chunk's working set stays under ``memory_limit`` bytes:
+
+* ``generate`` writes the ``apply_conditions`` digits into an int8 grid (``drtools.lut.HOLE`` where
+  no digit applies), counts the overlap cells of every adjacent digit pair per column and streams
+  the per-column ``min_t``/``max_t`` of every digit into ``(columns,)`` arrays;
+* ``resolve`` runs ``drtools.tables.overlap_policy`` on those bounds without evaluating a mask;
+* ``lint`` applies ``drtools.lint.lint_table`` chunk by chunk.
+
+The bytes a cell needs are measured on a probe of columns the conditions list, one from every case,
+because they depend on the conditions.  The limit covers everything ``run`` allocates after the
+scripts are loaded: the conditions it builds, the grid-sized working set of ``resolve`` (the resolved
+int8 grid and its intervals), which is still alive while lint runs, plus a chunk of the larger of the
+generate and lint working sets, with ``HEADROOM`` to spare.  A limit that cannot hold that and a
+single column is rejected.
+
+    python -m drtools.chunked --spec x_bits=10 t_bits=16 --memory-limit 256
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+import numpy as np
+
+from . import tables
+from .instrument import Profile, phase
+from .lint import lint_table
+from .lut import HOLE
+
+DEFAULT_MEMORY_LIMIT = 256 << 20
+# The share of the limit the plan leaves free for what does not scale with the probe's cells.
+HEADROOM = 1 / 16
+PROBE_COLUMNS = 4
+
+
+def target_axes(target):
+    """Returns ``(operation, spec, x_values, t_values, conditions)`` without building a spec's grid."""
+    from .pipeline import load_target, target_spec
+    from .regions import TableSpec
+
+    if isinstance(target, str):
+        operation, X, T, conditions = load_target(target)
+        return operation, target_spec(target), X[0].copy(), T[:, 0].copy(), conditions
+    spec = TableSpec(**target)
+    return spec.operation, spec, spec.x_range, spec.t_range, spec.conditions()
+
+
+def _chunk_masks(x_values, t_values, conditions, columns):
+    """Yields ``(case_values, [(digit, mask), ...])`` for the cases with columns in the chunk."""
+    X, T = np.meshgrid(x_values[columns], t_values)
+    for case in conditions.values():
+        values, digit_conditions = tables.case_fields(case)
+        x_mask = np.isin(X[0], values)
+        if x_mask.any():
+            yield values, [(digit, x_mask & condition(X, T)) for digit, condition in digit_conditions]
+
+
+def probe_columns(x_values, conditions):
+    """Indices of listed columns to measure: the first of every case, then evenly spread ones.
+
+    A chunk holds the masks of every case it reaches, so a probe reaching all of them is the most
+    expensive chunk per cell.
+    """
+    cases = [np.flatnonzero(np.isin(x_values, tables.case_fields(case)[0])) for case in conditions.values()]
+    cases = [columns for columns in cases if columns.size]
+    if not cases:
+        return np.arange(min(PROBE_COLUMNS, x_values.size))
+    listed = np.unique(np.concatenate(cases))
+    spread = listed[np.linspace(0, listed.size - 1, min(PROBE_COLUMNS, listed.size)).astype(int)]
+    return np.unique(np.concatenate([[columns[0] for columns in cases], spread]))
+
+
+def _traced(function):
+    """``(result, peak, held)``: the traced bytes ``function()`` allocated at its peak and still holds."""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    result = function()
+    held, peak = (value - base for value in tracemalloc.get_traced_memory())
+    if not tracing:
+        tracemalloc.stop()
+    return result, peak, held
+
+
+def working_set(x_values, t_values, conditions, spec=None, remove_overlaps=None):
+    """``(chunk_cell_bytes, column_bytes)`` measured on ``probe_columns``.
+
+    ``chunk_cell_bytes`` is the peak per cell of generating (and with ``spec`` linting) a chunk;
+    ``column_bytes`` is what ``resolve`` keeps per column of the whole grid, measured with
+    ``remove_overlaps``.
+    """
+    x_probe = x_values[probe_columns(x_values, conditions)]
+    cells = x_probe.size * t_values.size
+    (digits, _, bounds), peak, _ = _traced(lambda: generate(x_probe, t_values, conditions, [slice(None)]))
+    column_bytes = 0
+    if remove_overlaps is not None:
+        (resolved, intervals, unresolved), column_bytes, _ = _traced(
+            lambda: resolve(x_probe, t_values, conditions, bounds, remove_overlaps, log=None)
+        )
+        column_bytes = -(-column_bytes // x_probe.size)
+        digits = resolved
+    del bounds
+    if spec is not None:
+        _, lint_peak, _ = _traced(lambda: lint(spec, x_probe, t_values, conditions, digits, [slice(None)]))
+        peak = max(peak, lint_peak)
+    return max(1, -(-peak // cells)), column_bytes
+
+
+def column_chunks(x_values, t_values, conditions, memory_limit=DEFAULT_MEMORY_LIMIT, spec=None, remove_overlaps=None):
+    """Splits the columns into slices whose working set, next to ``resolve``'s, fits ``memory_limit``.
+
+    ``HEADROOM`` of the limit is kept free.
+    """
+    cell_bytes, column_bytes = working_set(x_values, t_values, conditions, spec, remove_overlaps)
+    budget = int(memory_limit * (1 - HEADROOM)) - column_bytes * x_values.size
+    if budget < cell_bytes * t_values.size:
+        needed = int((column_bytes * x_values.size + cell_bytes * t_values.size) / (1 - HEADROOM))
+        raise ValueError(f"A memory limit of {memory_limit} bytes is below the {needed} bytes of a one-column chunk")
+    width = budget // (cell_bytes * t_values.size)
+    return [slice(start, min(start + width, x_values.size)) for start in range(0, x_values.size, width)]
+
+
+def generate(x_values, t_values, conditions, chunks, stats=None):
+    """Returns ``(digits, overlaps, bounds)``.
+
+    ``digits`` is the int8 ``apply_conditions`` grid, ``overlaps`` the ``(pairs, columns)`` overlap
+    cell counts of adjacent digits in the order the conditions list them, and ``bounds`` maps every
+    digit to ``(min_t, max_t)`` column arrays, ``min_t > max_t`` where the digit never applies.
+    """
+    digits = np.full((t_values.size, x_values.size), HOLE, dtype=np.int8)
+    overlaps = None
+    bounds = {}
+    rows = np.arange(t_values.size)
+    for columns in chunks:
+        with phase(stats, "chunk_masks"):
+            chunk = list(_chunk_masks(x_values, t_values, conditions, columns))
+        with phase(stats, "chunk_reduce"):
+            for _, masks in chunk:
+                if overlaps is None:
+                    overlaps = np.zeros((len(masks) - 1, x_values.size), dtype=np.int64)
+                for index, (upper, lower) in enumerate(zip(masks, masks[1:])):
+                    overlaps[index, columns] += (upper[1] & lower[1]).sum(axis=0)
+                for digit, mask in masks:
+                    digits[:, columns][mask] = digit
+                    low, high = bounds.setdefault(
+                        digit,
+                        (
+                            np.full(x_values.size, t_values.size, dtype=np.int64),
+                            np.full(x_values.size, -1, dtype=np.int64),
+                        ),
+                    )
+                    # Row indices, converted to estimates at the end; the grid rows are ascending in t.
+                    low[columns] = np.minimum(low[columns], np.where(mask, rows[:, None], t_values.size).min(axis=0))
+                    high[columns] = np.maximum(high[columns], np.where(mask, rows[:, None], -1).max(axis=0))
+                if stats is not None:
+                    stats.count("mask_evaluations", len(masks))
+    for digit, (low, high) in bounds.items():
+        present = low <= high
+        bounds[digit] = (
+            np.where(present, t_values[np.minimum(low, t_values.size - 1)], 1),
+            np.where(present, t_values[np.maximum(high, 0)], 0),
+        )
+    return digits, overlaps, bounds
+
+
+def resolve(x_values, t_values, conditions, bounds, remove_overlaps, stats=None, log=print):
+    """The ``resolve_overlaps`` result computed from streamed bounds, with an int8 digit grid.
+
+    Listed columns outside ``x_values`` and digits without bounds are skipped; ``log`` is the
+    ``tables.resolve_column`` one.
+    """
+    resolved = np.full((t_values.size, x_values.size), HOLE, dtype=np.int8)
+    intervals = []
+    unresolved = []
+    columns = {x: column for column, x in enumerate(x_values.tolist())}
+    for case in conditions.values():
+        values, digit_conditions = tables.case_fields(case)
+        for x in values:
+            if x not in columns:
+                continue
+            column = columns[x]
+            column_bounds = {}
+            for digit, _ in digit_conditions:
+                if digit not in bounds:
+                    continue
+                low, high = bounds[digit][0][column], bounds[digit][1][column]
+                if low <= high:
+                    column_bounds[digit] = (int(low), int(high))
+            column_intervals, pairs = tables.resolve_column(x, column_bounds, remove_overlaps, stats, log)
+            unresolved += [(int(x), upper, lower) for upper, lower in pairs]
+            with phase(stats, "assign"):
+                for digit, min_t, max_t in column_intervals:
+                    first, last = np.searchsorted(t_values, [min_t, max_t + 1])
+                    resolved[first:last, column] = digit
+                    intervals.append((int(x), digit, min_t, max_t))
+    return resolved, intervals, unresolved
+
+
+def lint(spec, x_values, t_values, conditions, digits, chunks, intervals=(), unresolved=()):
+    """``lint_table`` of an int8 digit grid, evaluated chunk by chunk."""
+    violations = []
+    for index, columns in enumerate(chunks):
+        X, T = np.meshgrid(x_values[columns], t_values)
+        chunk = digits[:, columns]
+        chunk = np.where(chunk == HOLE, np.nan, chunk.astype(float))
+        values = set(x_values[columns].tolist())
+        violations += lint_table(
+            spec,
+            X,
+            T,
+            chunk,
+            conditions,
+            [interval for interval in intervals if interval[0] in values],
+            [pair for pair in unresolved if pair[0] in values],
+            overflow=index == 0,
+        )
+    return violations
+
+
+def run(target, memory_limit=DEFAULT_MEMORY_LIMIT, stats=None):
+    """Generates, resolves and lints ``target`` chunk by chunk; returns a summary and the resolved grid.
+
+    While ``tracemalloc`` traces, the summary's ``peak_bytes`` is the traced peak of the run after the
+    scripts are loaded, the figure ``memory_limit`` bounds.  It includes building the conditions, whose
+    share is taken off the limit before the chunks are planned.
+    """
+    from .pipeline import target_spec
+
+    # Both load the scripts they need, whose own grids are not the run's.
+    remove_overlaps = tables.overlap_policy(target_spec(target))
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    with phase(stats, "conditions"):
+        (_, spec, x_values, t_values, conditions), peak, held = _traced(lambda: target_axes(target))
+    if peak > memory_limit:
+        raise ValueError(f"A memory limit of {memory_limit} bytes is below the {peak} bytes of building the conditions")
+    with phase(stats, "plan"):
+        chunks = column_chunks(x_values, t_values, conditions, memory_limit - held, spec, remove_overlaps)
+    with phase(stats, "generate"):
+        digits, overlaps, bounds = generate(x_values, t_values, conditions, chunks, stats)
+    # Counted a chunk at a time, a grid-sized mask next to the digits would double them.
+    assigned = sum(int(np.count_nonzero(digits[:, columns] != HOLE)) for columns in chunks)
+    # Only the resolved grid is kept, so at most one int8 grid is alive next to a chunk.
+    del digits
+    with phase(stats, "resolve"):
+        resolved, intervals, unresolved = resolve(
+            x_values, t_values, conditions, bounds, remove_overlaps, stats, log=None
+        )
+    with phase(stats, "lint"):
+        violations = lint(spec, x_values, t_values, conditions, resolved, chunks, intervals, unresolved)
+    summary = {
+        "cells": int(x_values.size * t_values.size),
+        "chunks": len(chunks),
+        "chunk_columns": chunks[0].stop - chunks[0].start,
+        "assigned": assigned,
+        "overlap_cells": int(overlaps.sum()) if overlaps is not None else 0,
+        "unresolved": len(unresolved),
+        "violations": len(violations),
+    }
+    if tracing:
+        summary["peak_bytes"] = tracemalloc.get_traced_memory()[1] - base
+    return summary, resolved, violations
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .pipeline import target_name
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Chunked generation, resolution and lint of large grids.")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--memory-limit", type=float, default=DEFAULT_MEMORY_LIMIT >> 20, help="MiB per chunk")
+    parser.add_argument("--trace-memory", action="store_true", help="report the peak traced memory")
+    parser.add_argument("--save", metavar="DIR", help="write the resolved int8 grids as <target>.npy")
+    args = parser.parse_args(argv)
+
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    failed = False
+    for target in targets or list(FIGURE_SCRIPTS):
+        name = target_name(target)
+        profile = Profile(track_memory=args.trace_memory)
+        try:
+            summary, resolved, violations = run(target, int(args.memory_limit * (1 << 20)), profile)
+        except ValueError as error:
+            print(f"{name}: {error}")
+            failed = True
+            continue
+        finally:
+            report = profile.summary()
+            profile.close()
+        print(
+            f"{name}: {summary['cells']} cells in {summary['chunks']} chunks of {summary['chunk_columns']} columns, "
+            f"{summary['assigned']} assigned, {summary['overlap_cells']} overlap cells, "
+            f"{summary['unresolved']} unresolved, {summary['violations']} lint violations, {report['seconds']:.1f}s"
+        )
+        if "peak_bytes" in summary:
+            print(f"  peak traced memory {summary['peak_bytes'] / (1 << 20):.1f} MiB of {args.memory_limit:g} MiB")
+            if summary["peak_bytes"] > args.memory_limit * (1 << 20):
+                print(f"  {name}: peak traced memory exceeds the limit")
+                failed = True
+        if args.save:
+            import os
+
+            os.makedirs(args.save, exist_ok=True)
+            np.save(os.path.join(args.save, f"{name}.npy"), resolved)
+        failed |= summary["violations"] > 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
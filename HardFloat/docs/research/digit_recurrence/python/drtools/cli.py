@@ -0,0 +1,146 @@
+"""Command-line driver for the whole research flow.
+
+    python -m drtools generate          [options]   digit tables and overlap masks
+    python -m drtools resolve-overlaps  [options]   deterministic overlap-free tables
+    python -m drtools verify            [options]   resolved tables checked against the regions
+    python -m drtools plot              [options]   scatter figures of the script targets
+    python -m drtools export            [options]   polygon figures (pgfplots or PDF)
+    python -m drtools sweep             [options]   generate, resolve and verify a parameter grid
+    python -m drtools run               [options]   everything except the sweep
+
+Each subcommand builds a task graph (see ``drtools.tasks``) that runs in parallel and reuses cached
+results whose inputs are unchanged.  Options come from ``--config FILE`` (see ``drtools.config``)
+and are overridden by flags, e.g. ``--spec radix=4 x_bits=6 t_bits=9`` adds a table target and
+``--sweep x_bits=5,6,7 t_bits=8,9`` replaces the sweep grid.
+
+``--profile run.json`` runs every task under ``drtools.instrument`` and writes the per-task phase
+times, counters (mask evaluations, cells assigned, overlaps resolved, unsupported widths) and peak
+memory, together with the verification reports, as one JSON summary.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from .config import load_config, parse_assignments
+from .margins import rank_key
+from .pipeline import build_graph
+from .scripts import FIGURE_SCRIPTS
+from .tasks import run_tasks
+
+COMMANDS = ("generate", "resolve-overlaps", "verify", "plot", "export", "sweep", "run")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m drtools", description="Digit-recurrence selector tooling.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in COMMANDS:
+        sub = subparsers.add_parser(command)
+        sub.add_argument("--config", help="JSON configuration file")
+        sub.add_argument("--jobs", "-j", type=int, help="worker processes (default: CPU count)")
+        sub.add_argument("--figures-dir", help="output root for figures")
+        sub.add_argument("--cache-dir", help="task result cache")
+        sub.add_argument("--no-cache", action="store_true", help="neither read nor write cached results")
+        sub.add_argument("--force", action="store_true", default=None, help="rerun tasks even if cached")
+        sub.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets to use")
+        sub.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+        sub.add_argument("--profile", metavar="PATH", help="write a JSON run summary with per-task profiles")
+        sub.add_argument("--trace-memory", action="store_true", help="record peak traced memory in the profile")
+        if command in ("export", "run"):
+            sub.add_argument("--format", choices=("tikz", "pdf"))
+        if command == "sweep":
+            sub.add_argument("--sweep", nargs="+", metavar="FIELD=V1,V2", help="sweep grid")
+    return parser
+
+
+def config_from_args(args):
+    overrides = {
+        "jobs": args.jobs,
+        "figures_dir": args.figures_dir,
+        "cache_dir": args.cache_dir,
+        "force": args.force,
+        "format": getattr(args, "format", None),
+    }
+    if args.only or args.spec:
+        overrides["targets"] = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    if getattr(args, "sweep", None):
+        overrides["sweep"] = parse_assignments(args.sweep, multiple=True)
+    config = load_config(args.config, overrides)
+    if args.no_cache:
+        config["cache_dir"] = None
+    return config
+
+
+def print_reports(results, ranked=False):
+    """Prints the verification reports, by name or, when ``ranked``, most robust resolved table first."""
+    reports = [(key.split(":", 1)[1], result) for key, result in results.items() if key.startswith("verify:")]
+    if not reports:
+        return True
+    if ranked:
+        reports.sort(key=lambda item: (not item[1]["ok"], rank_key(item[1]["robustness"]), item[0]))
+    else:
+        reports.sort()
+    width = max(len(name) for name, _ in reports)
+    print(
+        f"{'target':<{width}}  {'cells':>6}  {'overlap':>7}  {'holes':>5}  {'invalid':>7}  {'unres.':>6}  "
+        f"{'gaps':>4}  {'range':>5}  {'lint':>4}  {'margin':>6}"
+    )
+    for name, report in reports:
+        margin = report["robustness"]["p05"]
+        print(
+            f"{name:<{width}}  {report['cells']:>6}  {report['overlap_cells']:>7}  {report['holes']:>5}  "
+            f"{report['invalid']:>7}  {report['unresolved']:>6}  {report.get('gaps', '-'):>4}  "
+            f"{report.get('overflow', '-'):>5}  {report.get('lint', '-'):>4}  "
+            f"{'-' if margin is None else f'{margin:6.4f}':>6}  "
+            f"{'ok' if report['ok'] else 'FAIL'}"
+        )
+    return all(report["ok"] for _, report in reports)
+
+
+def write_profile(path, command, seconds, ok, statuses, profiles, results):
+    tasks = {key: dict(status, profile=profiles.get(key)) for key, status in statuses.items()}
+    summary = {
+        "command": command,
+        "seconds": seconds,
+        "ok": ok,
+        "tasks": tasks,
+        "reports": {key.split(":", 1)[1]: result for key, result in results.items() if key.startswith("verify:")},
+    }
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config = config_from_args(args)
+    graph = build_graph(args.command, config)
+
+    statuses = {}
+
+    def log(key, status, seconds):
+        statuses[key] = {"status": status, "seconds": seconds}
+        print(f"{status:>6}  {seconds:6.2f}s  {key}")
+
+    start = time.perf_counter()
+    profiles = {}
+    results = run_tasks(
+        graph,
+        jobs=config["jobs"],
+        cache_dir=config["cache_dir"],
+        force=config["force"],
+        log=log,
+        profile=("memory" if args.trace_memory else "time") if args.profile else None,
+        profiles=profiles,
+    )
+    seconds = time.perf_counter() - start
+    print(f"{len(results)} tasks in {seconds:.2f}s")
+    ok = print_reports(results, ranked=args.command == "sweep")
+    if args.profile:
+        write_profile(args.profile, args.command, seconds, ok, statuses, profiles, results)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""Model of the HardUtils compressor trees: reducers, Dadda height schedules and counter usage.
+
+The functions mirror ``WallaceReducerCarrySave``, ``DaddaReducerCarrySave``, their ``CarryChain``
+variants and ``DaddaHeightScheduleCarrySave``/``DaddaHeightScheduleCarryChain`` counter for
+counter, in the same bit order (``ConcatOrder.Default``), so stage counts and ``CounterUsage``
+tallies match what the elaborated RTL prints.  A column is a list of arrival times, least
+significant column first; a plain column-height profile means every bit arrives at 0.  Counters
+are timed as the Scala composes them, in two-input XOR levels like ``drtools.overlap``: a 2:2
+counter is one level, a 3:2 counter two, and the 4:3 and 5:3 counters chain a 3:2 into a 2:2 or
+3:2, so a carry-in fed as their last input only sees the second counter.  The ``LOGIC`` counter
+model runs the same reducers on bit values instead, which ``drtools.booth`` uses on bit planes.
+
+``residual_columns`` builds the profile of the ``DividerStage3`` residual update (sum, carry, the
+digit-multiple addend rows and their negation bits, at the RTL's column offsets) and ``iteration_loop`` times a whole iteration: the estimate
+adder, the selector-to-addend-select depth of the encoding explorer, the addend select and the
+reduction of the addend to two rows, ``WallaceReducerCarrySave`` as ``DividerStage3`` uses it::
+
+    python -m drtools.compressor --heights 3,3,3,3,4,4
+    python -m drtools.compressor --widths 32 64 --only radix4_qds_optimized radix2_qds_basic
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass, field
+from typing import Callable
+
+HALF_ADDER_DEPTH = 1
+FULL_ADDER_DEPTH = 2
+SCHEMES = ("wallace_carry_save", "dadda_carry_save", "wallace_carry_chain", "dadda_carry_chain")
+
+
+@dataclass
+class CounterUsage:
+    num2to2: int = 0
+    num3to2: int = 0
+    num4to3: int = 0
+    num5to3: int = 0
+
+    def __iadd__(self, other):
+        self.num2to2 += other.num2to2
+        self.num3to2 += other.num3to2
+        self.num4to3 += other.num4to3
+        self.num5to3 += other.num5to3
+        return self
+
+    @property
+    def full_adders(self):
+        """3:2-counter equivalents: a 4:3 counter is a 3:2 and a 2:2, a 5:3 counter two 3:2s."""
+        return self.num3to2 + self.num4to3 + 2 * self.num5to3
+
+
+@dataclass
+class Reduction:
+    columns: list
+    stages: int
+    usage: CounterUsage = field(default_factory=CounterUsage)
+
+    @property
+    def heights(self):
+        return [len(column) for column in self.columns]
+
+    @property
+    def delay(self):
+        return max((max(column) for column in self.columns if column), default=0)
+
+
+@dataclass(frozen=True)
+class CounterModel:
+    """What a bit is: the 2:2 and 3:2 counters, from which the 4:3 and 5:3 counters are composed."""
+
+    counter22: Callable
+    counter32: Callable
+
+    def counter43(self, a, b, c, d):
+        partial_sum, carry_out = self.counter32(a, b, c)
+        return (*self.counter22(partial_sum, d), carry_out)
+
+    def counter53(self, a, b, c, d, e):
+        partial_sum, carry_out = self.counter32(a, b, c)
+        return (*self.counter32(partial_sum, d, e), carry_out)
+
+
+def _time22(a, b):
+    t = max(a, b) + HALF_ADDER_DEPTH
+    return t, t
+
+
+def _time32(a, b, c):
+    t = max(a, b, c) + FULL_ADDER_DEPTH
+    return t, t
+
+
+# Bits as arrival times, and bits as values (bools, or bit planes as in ``drtools.bitslice``).
+TIMING = CounterModel(_time22, _time32)
+LOGIC = CounterModel(lambda a, b: (a ^ b, a & b), lambda a, b, c: (a ^ b ^ c, (a & b) | (b & c) | (c & a)))
+
+
+def _assemble(col_bits, carry_ins, carry_cols, out_cols):
+    return col_bits + carry_ins + carry_cols + out_cols
+
+
+def _columns(profile):
+    return [[0] * column if isinstance(column, int) else list(column) for column in profile]
+
+
+def dadda_height_schedule_carry_save(max_input_height, target_height=2):
+    """Per-stage height limits, largest first, growing by 3/2 from ``target_height``."""
+    if not 2 <= target_height <= max_input_height:
+        raise ValueError(f"Need 2 <= target height <= {max_input_height}, got {target_height}")
+    limits, next_limit = [], target_height
+    while next_limit < max_input_height:
+        limits.insert(0, next_limit)
+        next_limit = (next_limit * 3) >> 1
+    return limits
+
+
+def dadda_height_schedule_carry_chain(max_input_height, target_height=2):
+    """Per-stage height limits doubling above 4, where the chained 5:3 counters take over."""
+    if not 2 <= target_height <= max_input_height:
+        raise ValueError(f"Need 2 <= target height <= {max_input_height}, got {target_height}")
+    if max_input_height <= 4:
+        return dadda_height_schedule_carry_save(max_input_height, target_height)
+    if target_height < 4:
+        limits, next_limit = dadda_height_schedule_carry_save(4, target_height), 4
+    else:
+        limits, next_limit = [], target_height
+    while next_limit < max_input_height:
+        limits.insert(0, next_limit)
+        next_limit <<= 1
+    return limits
+
+
+def wallace_reducer_carry_save(columns, usage, model=TIMING):
+    """One stage of ``WallaceReducerCarrySave``: every column as many 3:2, then 2:2 counters as fit."""
+    outputs = [[] for _ in columns]
+    carries = [[] for _ in range(len(columns) + 1)]
+    for i, column in enumerate(columns):
+        bits = list(column)
+        count = len(bits) // 3
+        for _ in range(count):
+            total, carry = model.counter32(*bits[:3])
+            outputs[i].append(total)
+            carries[i + 1].append(carry)
+            bits = bits[3:]
+        usage.num3to2 += count
+        count = len(bits) // 2
+        for _ in range(count):
+            total, carry = model.counter22(*bits[:2])
+            outputs[i].append(total)
+            carries[i + 1].append(carry)
+            bits = bits[2:]
+        usage.num2to2 += count
+        outputs[i] = _assemble(bits, [], carries[i], outputs[i])
+    return outputs
+
+
+def dadda_reducer_carry_save(columns, target_height, usage, model=TIMING):
+    """One stage of ``DaddaReducerCarrySave``: only as many counters as bring a column to ``target_height``."""
+    outputs = [[] for _ in columns]
+    carries = [[] for _ in range(len(columns) + 1)]
+    for i, column in enumerate(columns):
+        bits = list(column)
+        excess = len(bits) + len(carries[i]) - target_height
+        if excess > 0:
+            count = min(len(bits) // 3, excess // 2)
+            for _ in range(count):
+                total, carry = model.counter32(*bits[:3])
+                outputs[i].append(total)
+                carries[i + 1].append(carry)
+                bits = bits[3:]
+            excess -= 2 * count
+            usage.num3to2 += count
+            count = min(len(bits) // 2, excess)
+            for _ in range(count):
+                total, carry = model.counter22(*bits[:2])
+                outputs[i].append(total)
+                carries[i + 1].append(carry)
+                bits = bits[2:]
+            usage.num2to2 += count
+        outputs[i] = _assemble(bits, [], carries[i], outputs[i])
+    return outputs
+
+
+def _chain_stage(columns, target_height, usage, model):
+    """One stage of the carry-chain reducers; ``target_height=None`` is the Wallace variant."""
+    outputs = [[] for _ in columns]
+    carries = [[] for _ in range(len(columns) + 1)]
+    carry_outs = [[] for _ in range(len(columns) + 1)]
+    # (bits taken, with a carry-in, reduction, counter): the priority order of the Scala reducers.
+    counters = (
+        (4, True, 4, "num5to3"),
+        (3, True, 3, "num4to3"),
+        (2, True, 2, "num3to2"),
+        (1, True, 1, "num2to2"),
+        (5, False, 4, "num5to3"),
+        (4, False, 3, "num4to3"),
+        (3, False, 2, "num3to2"),
+        (2, False, 1, "num2to2"),
+    )
+    for i, column in enumerate(columns):
+        bits, carry_ins = list(column), carry_outs[i]
+        excess = len(bits) + len(carries[i]) + len(carry_ins) - (target_height or 0)
+        while excess > 0 or target_height is None:
+            for taken, chained, reduction, name in counters:
+                if (target_height is None or excess >= reduction) and len(bits) >= taken and (carry_ins or not chained):
+                    break
+            else:
+                break
+            inputs = bits[:taken] + (carry_ins[:1] if chained else [])
+            bits = bits[taken:]
+            if chained:
+                carry_ins = carry_ins[1:]
+            counter = {2: model.counter22, 3: model.counter32, 4: model.counter43, 5: model.counter53}[len(inputs)]
+            result = counter(*inputs)
+            outputs[i].append(result[0])
+            if len(result) == 3:
+                carries[i + 1].append(result[1])
+                carry_outs[i + 1].append(result[2])
+            elif chained:
+                carries[i + 1].append(result[1])
+            else:
+                carry_outs[i + 1].append(result[1])
+            excess -= reduction
+            setattr(usage, name, getattr(usage, name) + 1)
+        outputs[i] = _assemble(bits, carry_ins, carries[i], outputs[i])
+    return outputs
+
+
+def wallace_reducer_carry_chain(columns, usage, model=TIMING):
+    """One stage of ``WallaceReducerCarryChain``, the carry-save stage for columns of at most 4 bits."""
+    if max(len(column) for column in columns) <= 4:
+        return wallace_reducer_carry_save(columns, usage, model)
+    return _chain_stage(columns, None, usage, model)
+
+
+def dadda_reducer_carry_chain(columns, target_height, usage, model=TIMING):
+    """One stage of ``DaddaReducerCarryChain``, the carry-save stage for columns of at most 4 bits."""
+    if max(len(column) for column in columns) <= 4:
+        return dadda_reducer_carry_save(columns, target_height, usage, model)
+    return _chain_stage(columns, target_height, usage, model)
+
+
+def reduce_columns(profile, scheme="wallace_carry_save", target_height=2, model=TIMING):
+    """Reduces a column profile to ``target_height`` rows the way the RTL instantiates ``scheme``.
+
+    The Wallace reducers are repeated until no column is taller than ``target_height``, as in
+    ``DividerStage3``; the Dadda reducers run one stage per limit of their height schedule, as in
+    the Booth multipliers.  With ``model=LOGIC`` the columns hold bit values and the result
+    columns their reduced bits; ``Reduction.delay`` only means something for ``TIMING``.
+    """
+    columns = _columns(profile)
+    usage = CounterUsage()
+    stages = 0
+    if scheme.startswith("wallace"):
+        reducer = wallace_reducer_carry_save if scheme == "wallace_carry_save" else wallace_reducer_carry_chain
+        while max(len(column) for column in columns) > target_height:
+            columns = reducer(columns, usage, model)
+            stages += 1
+    elif scheme.startswith("dadda"):
+        height = max(len(column) for column in columns)
+        if height > target_height:
+            if scheme == "dadda_carry_save":
+                schedule, reducer = dadda_height_schedule_carry_save(height, target_height), dadda_reducer_carry_save
+            else:
+                schedule, reducer = dadda_height_schedule_carry_chain(height, target_height), dadda_reducer_carry_chain
+            for limit in schedule:
+                columns = reducer(columns, limit, usage, model)
+                stages += 1
+    else:
+        raise ValueError(f"Unknown reduction scheme {scheme!r}, expected one of {', '.join(SCHEMES)}")
+    return Reduction(columns, stages, usage)
+
+
+def addend_rows(radix, digit_bound=None):
+    """Signed power-of-two multiples of the divisor the largest digit needs, e.g. 1 for radix 4, 2 for radix 8."""
+    digit_bound = digit_bound or radix // 2
+    rows = 1
+    for digit in range(1, digit_bound + 1):
+        # Nonzero digits of the non-adjacent form.
+        weight = 0
+        while digit:
+            if digit & 1:
+                digit -= 2 - (digit & 3)
+                weight += 1
+            digit >>= 1
+        rows = max(rows, weight)
+    return rows
+
+
+def residual_columns(width, addends=1, addend_arrival=0):
+    """Column profile of the residual update of ``DividerStage3`` with ``dataWidth = width``.
+
+    Columns ``0 .. width + 1`` take the sum word in every column, the carry word from column 4 on
+    (it is stored four bits short), the ``width + 1``-bit addend from column 1 and its ``isNeg`` in
+    column 1, so columns 0 to 3 are shorter than the rest.  ``addends`` above the RTL's one add
+    further addend rows, each with its ``isNeg``, in the same columns.
+    """
+    columns = [[0] + [0] * (i >= 4) for i in range(width + 2)]
+    for column in columns[1:]:
+        column += [addend_arrival] * addends
+    columns[1] += [addend_arrival] * addends
+    return columns
+
+
+def iteration_loop(target, width, scheme="wallace_carry_save", report=None):
+    """Times one iteration of ``target`` for a ``width``-bit divider; ``report`` is its encoding report."""
+    from .overlap import SELECT_DEPTH, adder_depth
+    from .pipeline import target_spec
+    from .prescale import baseline
+
+    if report is None:
+        _, _, report = baseline(target)
+    spec = target_spec(target)
+    if report is None:
+        raise ValueError(f"No feasible encoding for {target}")
+    select = adder_depth(spec.t_bits) + report["loop_depth"] + SELECT_DEPTH
+    reduction = reduce_columns(residual_columns(width, addend_rows(spec.radix, spec.digit_bound), select), scheme)
+    return {
+        "spec": spec,
+        "select": select,
+        "reduction": reduction,
+        "update": reduction.delay - select,
+        "cycle": reduction.delay,
+    }
+
+
+def _usage_text(usage):
+    return (
+        f"5:3 counter = {usage.num5to3}, 4:3 counter = {usage.num4to3}, "
+        f"3:2 counter = {usage.num3to2}, 2:2 counter = {usage.num2to2}"
+    )
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .pipeline import target_name
+    from .prescale import baseline
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Stage counts, counter usage and delay of compressor trees.")
+    parser.add_argument("--heights", help="comma-separated column heights, least significant first")
+    parser.add_argument("--target-height", type=int, default=2)
+    parser.add_argument("--scheme", nargs="+", choices=SCHEMES, help="reducers to compare (default: all)")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--widths", nargs="+", type=int, default=[32, 64], help="divider dataWidth in bits")
+    args = parser.parse_args(argv)
+
+    if args.heights:
+        profile = [int(height) for height in args.heights.split(",")]
+        for scheme in args.scheme or SCHEMES:
+            reduction = reduce_columns(profile, scheme, args.target_height)
+            print(
+                f"{scheme:<20} stages = {reduction.stages}, delay = {reduction.delay}, {_usage_text(reduction.usage)}"
+            )
+        return 0
+
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    print(
+        f"{'target':<28} {'scheme':<20} {'width':>5} {'select':>6} {'update':>6} {'cycle':>5} {'stages':>6}  counters"
+    )
+    for target in targets or ["radix2_qds_basic", "radix4_qds_optimized", "radix2_rds_basic", "radix4_rds_optimized"]:
+        _, _, report = baseline(target)
+        if report is None:
+            print(f"{target_name(target):<28} no feasible encoding")
+            continue
+        for width in args.widths:
+            for scheme in args.scheme or ["wallace_carry_save"]:
+                loop = iteration_loop(target, width, scheme, report)
+                reduction = loop["reduction"]
+                print(
+                    f"{target_name(target):<28} {scheme:<20} {width:>5} {loop['select']:>6} {loop['update']:>6} "
+                    f"{loop['cycle']:>5} {reduction.stages:>6}  {_usage_text(reduction.usage)}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Driver configuration: built-in defaults, overridden by a JSON file, overridden by flags.
+
+A configuration file holds any subset of ``DEFAULTS``, for example::
+
+    {
+        "targets": ["radix4_qds_optimized", {"radix": 4, "x_bits": 6, "t_bits": 9}],
+        "sweep": {"operation": "division", "radix": [2, 4], "x_bits": [5, 6], "t_bits": [8, 9]},
+        "jobs": 4,
+        "format": "pdf"
+    }
+
+String targets name a figure script; dict targets are ``TableSpec`` fields.
+"""
+
+import copy
+import json
+import os
+
+from .regions import TableSpec
+from .scripts import FIGURE_SCRIPTS, FIGURES_DIR, PYTHON_DIR
+
+DEFAULTS = {
+    "targets": list(FIGURE_SCRIPTS),
+    "sweep": {"operation": "division", "radix": [4], "x_bits": [5, 6, 7], "t_bits": [8, 9]},
+    "jobs": None,
+    "figures_dir": FIGURES_DIR,
+    "cache_dir": os.path.join(PYTHON_DIR, ".drtools_cache"),
+    "format": "tikz",
+    "force": False,
+}
+
+SPEC_FIELDS = tuple(TableSpec.__dataclass_fields__)
+
+
+def parse_value(text):
+    if text in ("true", "false"):
+        return text == "true"
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def parse_assignments(assignments, multiple=False):
+    """Parses ``field=value`` (or ``field=v1,v2`` when ``multiple``) flags into a dict."""
+    result = {}
+    for assignment in assignments:
+        name, sep, value = assignment.partition("=")
+        if not sep or name not in SPEC_FIELDS:
+            raise ValueError(f"Expected FIELD=VALUE with FIELD in {', '.join(SPEC_FIELDS)}, got {assignment!r}")
+        values = [parse_value(item) for item in value.split(",")]
+        result[name] = values if multiple else values[0]
+    return result
+
+
+def validate(config):
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown configuration keys: {', '.join(sorted(unknown))}")
+    for target in config["targets"]:
+        if isinstance(target, str):
+            if target not in FIGURE_SCRIPTS:
+                raise ValueError(f"Unknown script target {target!r}")
+        else:
+            TableSpec(**target)
+    for name in config["sweep"]:
+        if name not in SPEC_FIELDS:
+            raise ValueError(f"Unknown sweep field {name!r}")
+    if config["format"] not in ("tikz", "pdf"):
+        raise ValueError(f"Unknown export format {config['format']!r}")
+    return config
+
+
+def load_config(path=None, overrides=None):
+    config = copy.deepcopy(DEFAULTS)
+    if path is not None:
+        with open(path) as f:
+            config.update(json.load(f))
+    for name, value in (overrides or {}).items():
+        if value is not None:
+            config[name] = value
+    for name in ("figures_dir", "cache_dir"):
+        if config[name] is not None:
+            config[name] = os.path.abspath(config[name])
+    return validate(config)
@@ -0,0 +1,202 @@
+"""Per-cell visit histograms of a selector table, gathered from recurrence simulation.
+
+``simulate_coverage`` runs ``simulate_division``/``simulate_sqrt`` over batches of random (or all)
+operands and counts, for every cell of the compiled ``drtools.lut.DigitLUT``, how many recurrence
+steps selected a digit there: one ``np.bincount`` over the ``encodeLutInput`` indices of a whole
+batch.  Steps after an operand's first convergence failure are not counted, nor is the first
+square-root digit, which comes from the initialization rather than the table.
+
+``summarize`` reports the hot cells, the assigned cells no simulated step reached and the
+estimate and column range the steps stayed within, i.e. how far the table could be narrowed
+without losing a visited cell.  That is an observation over the simulated operands, not a bound;
+``drtools.margins`` gives the analytic view of the same cells.  For script targets the counts are
+drawn as a layer on the polygon region figure of ``drtools.export``, with the assigned cells never
+reached hatched, as ``<figure>_coverage.pdf``.
+
+    python -m drtools.coverage --only radix4_qds_optimized --count 1000000
+    python -m drtools.coverage --only radix4_rds_optimized --operand-bits 12 --exhaustive --figures-dir /tmp/figures
+"""
+
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from . import simulate
+from .lut import HOLE, lookup_index
+
+DEFAULT_BATCH = 1 << 16
+HOT_CELLS = 8
+
+
+def accumulate(counts, lut, columns, estimates, visited=None):
+    """Adds one visit per ``(column, estimate)`` pair inside the table (and ``visited``) to ``counts``."""
+    index, inside = lookup_index(lut, columns, estimates)
+    if visited is not None:
+        inside &= visited
+    counts += np.bincount(index[inside], minlength=counts.size)
+    return counts
+
+
+def table_steps(result, operation):
+    """Mask of the ``(iterations, operands)`` steps of a simulation that selected from the table."""
+    steps = np.arange(result.digits.shape[0])[:, np.newaxis]
+    taken = result.ok | (steps <= result.failed_at)
+    if operation == "square_root":
+        taken &= steps > 0
+    return taken
+
+
+def simulate_coverage(
+    spec, lut, operand_bits, iterations=None, count=None, seed=0, batch=DEFAULT_BATCH, signed_divisor=True
+):
+    """Returns ``(counts, operations, failures)`` over ``count`` random operands, or all of them by default."""
+    from .exhaustive import default_iterations
+
+    iterations = iterations or default_iterations(spec, operand_bits)
+    total = count if count is not None else simulate.operand_count(spec.operation, operand_bits, signed_divisor)
+    counts = np.zeros(lut.table.size, dtype=np.int64)
+    failures = 0
+    for start in range(0, total, batch):
+        size = min(batch, total - start)
+        if count is None:
+            operands = simulate.exhaustive_operands(spec.operation, operand_bits, start, start + size, signed_divisor)
+        else:
+            operands = simulate.random_operands(
+                spec.operation, size, operand_bits, seed + start // batch, signed_divisor
+            )
+        if spec.operation == "division":
+            result = simulate.simulate_division(lut, spec, *operands, iterations, operand_bits)
+        else:
+            result = simulate.simulate_sqrt(lut, spec, *operands, iterations, operand_bits)
+        accumulate(counts, lut, result.columns, result.estimates, table_steps(result, spec.operation))
+        failures += int((~result.ok).sum())
+    return counts, total, failures
+
+
+def cell_of(lut, index):
+    """The ``(column, signed estimate)`` of table indices."""
+    index = np.asarray(index, dtype=np.int64)
+    estimate = index & lut.t_mask
+    estimate = np.where(estimate >= 1 << (lut.t_bits - 1), estimate - (1 << lut.t_bits), estimate)
+    return lut.first_column + (index >> lut.t_bits), estimate
+
+
+def coverage_grid(lut, counts, X, T):
+    """The counts laid out on the ``(t, x)`` grid of a table, zero outside the compiled table."""
+    index, inside = lookup_index(lut, X, T)
+    return np.where(inside, counts[index], 0)
+
+
+def summarize(lut, counts):
+    """Visited, never reached and hot cells, and the estimate and column span of the visits."""
+    assigned = lut.table != HOLE
+    visited = counts > 0
+    steps = int(counts.sum())
+    summary = {
+        "steps": steps,
+        "assigned": int(assigned.sum()),
+        "visited": int((assigned & visited).sum()),
+        "never_reached": int((assigned & ~visited).sum()),
+        "visited_holes": int((~assigned & visited).sum()),
+        "hot": [],
+        "columns": None,
+        "estimates": None,
+        "t_bits": None,
+    }
+    if not steps:
+        return summary
+    hot = np.argsort(counts, kind="stable")[::-1][:HOT_CELLS]
+    columns, estimates = cell_of(lut, hot)
+    summary["hot"] = [
+        (int(column), int(estimate), int(counts[index]) / steps)
+        for column, estimate, index in zip(columns, estimates, hot)
+        if counts[index]
+    ]
+    columns, estimates = cell_of(lut, np.flatnonzero(visited))
+    low, high = int(estimates.min()), int(estimates.max())
+    summary["columns"] = (int(columns.min()), int(columns.max()))
+    summary["estimates"] = (low, high)
+    # Two's complement bits covering every visited estimate.
+    summary["t_bits"] = max(math.ceil(math.log2(max(-low, high + 1, 1))) + 1, 1)
+    return summary
+
+
+def render_coverage(name, quadrants, grid, figures_dir, inputs=None):
+    """Draws the counts over the script's polygon region figure; returns the written path."""
+    from .export import axis_layout, figure_regions, render_polygon_pdf
+    from .scripts import FIGURE_SCRIPTS
+
+    script = FIGURE_SCRIPTS[name]
+    module = script.load()
+    if inputs is None:
+        inputs = script.compute(module)
+    layout = axis_layout(script, module)
+    layout["x_values"] = inputs[0][0]
+    layout["t_values"] = inputs[1][:, 0]
+    path = f"{os.path.splitext(script.figure_path(quadrants, figures_dir))[0]}_coverage.pdf"
+    regions = figure_regions(script, module, inputs, quadrants)
+    render_polygon_pdf(regions, layout, quadrants, path, coverage=(grid, ~np.isnan(inputs[2])))
+    return path
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .exhaustive import target_lut
+    from .pipeline import load_target, target_name
+    from .scripts import FIGURE_SCRIPTS, FIGURES_DIR
+
+    parser = argparse.ArgumentParser(description="Per-cell visit histograms of selector tables.")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--operand-bits", type=int, default=16)
+    parser.add_argument("--iterations", type=int, help="recurrence steps (default: operand bits plus a guard digit)")
+    operands = parser.add_mutually_exclusive_group()
+    operands.add_argument("--count", type=int, default=1 << 20, help="random operands (default: %(default)s)")
+    operands.add_argument("--exhaustive", action="store_true", help="every operand of --operand-bits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--figures-dir", default=FIGURES_DIR, help="output root (default: %(default)s)")
+    parser.add_argument("--no-plot", action="store_true", help="only print the summaries")
+    parser.add_argument("--out-dir", help="write the counts as <target>_coverage.npy here")
+    args = parser.parse_args(argv)
+
+    if not args.no_plot:
+        import matplotlib
+
+        matplotlib.use("Agg")
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    for target in targets or list(FIGURE_SCRIPTS):
+        name = target_name(target)
+        spec, lut = target_lut(target)
+        counts, operations, failures = simulate_coverage(
+            spec, lut, args.operand_bits, args.iterations, None if args.exhaustive else args.count, args.seed
+        )
+        summary = summarize(lut, counts)
+        print(
+            f"{name}: {operations} operations, {failures} failures, {summary['steps']} table steps, "
+            f"{summary['visited']}/{summary['assigned']} assigned cells visited, "
+            f"{summary['never_reached']} never reached, {summary['visited_holes']} holes visited"
+        )
+        if summary["steps"]:
+            low, high = summary["estimates"]
+            print(
+                f"  visited columns {spec.x_label(summary['columns'][0])}..{spec.x_label(summary['columns'][1])}, "
+                f"estimates {spec.t_label(low)}..{spec.t_label(high)} ({summary['t_bits']} of {spec.t_bits} bits)"
+            )
+            for column, estimate, share in summary["hot"]:
+                print(f"  hot  {spec.x_label(column):>12} {spec.t_label(estimate):>14}  {100 * share:6.2f}%")
+        if args.out_dir:
+            os.makedirs(args.out_dir, exist_ok=True)
+            np.save(os.path.join(args.out_dir, f"{name}_coverage.npy"), counts)
+        if not args.no_plot and isinstance(target, str):
+            _, X, T, _ = load_target(target)
+            grid = coverage_grid(lut, counts, X, T)
+            for quadrants in FIGURE_SCRIPTS[target].quadrants:
+                print(f"  {render_coverage(target, quadrants, grid, os.path.abspath(args.figures_dir))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""Cell-level diff of two selector tables, across configurations, revisions and the RTL.
+
+A table source is one of:
+
+* ``radix4_qds_optimized`` -- a script target, resolved as the script itself does: the optimized
+  scripts by their ``remove_overlaps``, the basic ones by ``apply_conditions``, where the digit
+  listed last wins an overlap;
+* ``spec:x_bits=6,t_bits=9`` -- a ``TableSpec`` target;
+* ``cache:radix4_qds_optimized`` -- the generate/resolve results the task cache holds for the
+  current sources, without regenerating them;
+* ``scala:QuotientDigitSelector`` / ``scala:ResultDigitSelector`` -- the selection range literals
+  of the RTL selectors, parsed from the Scala sources.
+
+Script and Scala sources take a git revision as ``@rev`` (``radix4_qds_optimized@HEAD~3``,
+``scala:QuotientDigitSelector@v1.2``); the file is then read with ``git show`` instead of from
+the working tree.
+
+Both tables are brought to a common lattice first: a table with fewer fractional bits is refined by
+repeating every cell over the finer cells it covers, so the RTL's 7-bit estimate compares with the
+8-bit estimate of ``radix4_qds_optimized``.  ``diff_tables`` then counts every digit transition,
+with ``-`` for a cell without a digit, and reports the new holes: cells without a digit between
+assigned cells of a column that were not holes before.  ``plot_diff`` draws the result in the
+coordinates and binary tick labels of the ``drtools.margins`` heat maps.
+
+    python -m drtools.diff radix4_qds_basic radix4_qds_optimized
+    python -m drtools.diff scala:QuotientDigitSelector radix4_qds_optimized --plot /tmp/qds_rtl.pdf
+    python -m drtools.diff radix4_rds_optimized@HEAD~5 radix4_rds_optimized
+"""
+
+import argparse
+import dataclasses
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+from .regions import TableSpec
+from .scripts import PYTHON_DIR
+
+MAX_EXAMPLES = 8
+MAX_LABELS = 400
+
+# Range literal, config class and digit lattice of each RTL selector.  The estimate is bits 7..1 of
+# the 8-bit carry-save sum, four fractional bits of the quotient residual and three of the root's;
+# rows are indexed by the three divisor or root bits after the leading one.
+SCALA_SELECTORS = {
+    "QuotientDigitSelector": {
+        "path": "HardInt/src/Radix4SRTDivider.scala",
+        "ranges": "quotientDigitSelectionRanges",
+        "config": "QuotientDigitSelectionRangeConfig",
+        "spec": TableSpec("division", 4, x_bits=5, t_bits=7, x_fractional_bits=4, t_fractional_bits=4),
+    },
+    "ResultDigitSelector": {
+        "path": "HardFloat/src/DivSqrtRecFN.scala",
+        "ranges": "resultDigitSelectionRangesJ2",
+        "config": "ResultDigitSelectionRangeConfig",
+        "spec": TableSpec("square_root", 4, x_bits=5, t_bits=7, x_fractional_bits=4, t_fractional_bits=3),
+    },
+}
+
+
+@dataclass
+class SelectorTable:
+    name: str
+    spec: TableSpec
+    X: np.ndarray
+    T: np.ndarray
+    digits: np.ndarray
+
+
+def _repository_root():
+    return subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"], cwd=PYTHON_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+def read_source(path, revision=None):
+    """The text of a repository file, from the working tree or from ``revision``."""
+    root = _repository_root()
+    if revision is None:
+        with open(os.path.join(root, path)) as f:
+            return f.read()
+    return subprocess.run(
+        ["git", "show", f"{revision}:{path}"], cwd=root, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def _balanced(text, start):
+    """The text between the parenthesis at ``start`` and its match."""
+    depth = 0
+    for index in range(start, len(text)):
+        depth += {"(": 1, ")": -1}.get(text[index], 0)
+        if depth == 0:
+            return text[start + 1 : index]
+    raise ValueError("Unbalanced parentheses in the Scala source")
+
+
+def _field_digit(field):
+    match = re.fullmatch(r"(pos|neg)(\d+)Range|zeroRange", field)
+    if match is None:
+        raise ValueError(f"Cannot tell the digit of range field {field!r}")
+    if match.group(1) is None:
+        return 0
+    return int(match.group(2)) * (1 if match.group(1) == "pos" else -1)
+
+
+def parse_ranges(text, ranges, config):
+    """``[{digit: (low, high)}, ...]`` per row of the ``ranges`` literal in a Scala source."""
+    match = re.search(rf"case class {config}\s*\(", text)
+    if match is None:
+        raise ValueError(f"No case class {config} in the Scala source")
+    fields = re.findall(r"(\w+)\s*:", _balanced(text, match.end() - 1))
+    match = re.search(rf"val {ranges}\s*:\s*Seq\[{config}\]\s*=\s*Seq\s*\(", text)
+    if match is None:
+        raise ValueError(f"No Seq[{config}] literal {ranges} in the Scala source")
+    body = _balanced(text, match.end() - 1)
+    rows = []
+    for row in re.finditer(rf"{config}\s*\(", body):
+        pairs = re.findall(r"\(\s*(-?\d+)\s*,\s*(-?\d+)\s*\)", _balanced(body, row.end() - 1))
+        if len(pairs) != len(fields):
+            raise ValueError(f"Expected {len(fields)} ranges per {config}, got {len(pairs)}")
+        rows.append({_field_digit(field): (int(low), int(high)) for field, (low, high) in zip(fields, pairs)})
+    return rows
+
+
+def scala_table(selector, revision=None):
+    """The ``SelectorTable`` of an RTL selector's range literal.
+
+    The range fields only give the digit's magnitude encoding; the selector takes its sign from the
+    estimate's sign bit xor an inverted sign, the divisor's for ``QuotientDigitSelector`` and always
+    set for ``ResultDigitSelector``.  The RTL carries the partial remainder negated, so an estimate
+    ``t`` lands on the cell ``~t`` of the Python lattice.  Quotient rows serve both divisor signs,
+    indexed by the three divisor bits after the leading one, inverted for a positive divisor.
+    """
+    layout = SCALA_SELECTORS[selector]
+    spec = layout["spec"]
+    rows = parse_ranges(read_source(layout["path"], revision), layout["ranges"], layout["config"])
+    X, T = spec.grid()
+    digits = np.full(X.shape, np.nan)
+    half = 2 ** (spec.x_fractional_bits - 1)
+    for index, row in enumerate(rows):
+        if spec.operation == "division":
+            placements = ((2 * half - 1 - index, True), (index - 2 * half, False))
+        else:
+            placements = ((half + index, True),)
+        for column, inverted in placements:
+            for digit, (low, high) in row.items():
+                estimates = np.arange(low, high + 1)
+                negative = (estimates < 0) ^ inverted
+                rows_ = ~estimates - int(T[0, 0])
+                digits[rows_, int(np.flatnonzero(X[0] == column)[0])] = np.where(negative, -abs(digit), abs(digit))
+    name = selector if revision is None else f"{selector}@{revision}"
+    return SelectorTable(name, spec, X, T, digits)
+
+
+def _script_table(name, revision):
+    from . import tables
+    from .scripts import FIGURE_SCRIPTS, load_script
+
+    script = FIGURE_SCRIPTS[name]
+    if revision is None:
+        module = script.load()
+    else:
+        path = os.path.relpath(script.path, _repository_root())
+        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
+            f.write(read_source(path, revision))
+        try:
+            suffix = re.sub(r"\W", "_", revision)
+            module = load_script(f.name, f"drtools_{name}_{suffix}")
+        finally:
+            os.unlink(f.name)
+    X, T = (getattr(module, grid) for grid in script.grid_names)
+    conditions = getattr(module, script.conditions_name)
+    remove_overlaps = getattr(module, "remove_overlaps", None)
+    if remove_overlaps is None:
+        digits = tables.apply_conditions(X, T, conditions)
+    else:
+        digits, _, _ = tables.resolve_overlaps(X, T, conditions, remove_overlaps)
+    return SelectorTable(name if revision is None else f"{name}@{revision}", script.spec(module), X, T, digits)
+
+
+def _cached_table(target, cache_dir):
+    from .pipeline import build_graph, target_name, target_spec
+    from .tasks import cached_result
+
+    name = target_name(target)
+    graph = build_graph("resolve-overlaps", {"targets": [target], "figures_dir": None})
+    hits = [cached_result(graph, f"{stage}:{name}", cache_dir) for stage in ("generate", "resolve")]
+    if not all(hit for hit, _ in hits):
+        raise ValueError(f"{name} is not in the cache {cache_dir}; run `python -m drtools resolve-overlaps` first")
+    (_, generated), (_, resolved) = hits
+    return SelectorTable(f"cache:{name}", target_spec(target), generated["x"], generated["t"], resolved["digits"])
+
+
+def load_table(source, cache_dir=None):
+    """The ``SelectorTable`` of a source string, see the module docstring."""
+    from .config import DEFAULTS, parse_assignments
+    from .pipeline import load_target, target_name, target_spec
+
+    kind, sep, rest = source.partition(":")
+    if not sep:
+        kind, rest = "script", source
+    rest, _, revision = rest.partition("@")
+    revision = revision or None
+    if kind == "scala":
+        return scala_table(rest, revision)
+    if revision is not None and kind != "script":
+        raise ValueError(f"Only script and scala sources take a revision, got {source!r}")
+    if kind == "script":
+        return _script_table(rest, revision)
+    target = rest
+    if rest.startswith("spec:") or "=" in rest:
+        target = parse_assignments(rest.removeprefix("spec:").split(","))
+    if kind == "cache":
+        return _cached_table(target, cache_dir or DEFAULTS["cache_dir"])
+    if kind == "spec":
+        from . import tables
+
+        _, X, T, conditions = load_target(target)
+        spec = target_spec(target)
+        digits, _, _ = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec))
+        return SelectorTable(target_name(target), spec, X, T, digits)
+    raise ValueError(f"Unknown table source {source!r}")
+
+
+def refine(table, x_fractional_bits, t_fractional_bits):
+    """``(x, t, digit)`` arrays of the assigned cells on a lattice with at least as many fractional bits."""
+    x_factor = 2 ** (x_fractional_bits - table.spec.x_fractional_bits)
+    t_factor = 2 ** (t_fractional_bits - table.spec.t_fractional_bits)
+    if x_factor < 1 or t_factor < 1:
+        raise ValueError("A table can only be refined to a finer lattice")
+    assigned = ~np.isnan(table.digits)
+    x = (table.X[assigned].astype(np.int64) * x_factor)[:, None, None] + np.arange(x_factor)[None, :, None]
+    t = (table.T[assigned].astype(np.int64) * t_factor)[:, None, None] + np.arange(t_factor)[None, None, :]
+    digits = np.broadcast_to(table.digits[assigned][:, None, None], (assigned.sum(), x_factor, t_factor))
+    x, t = np.broadcast_arrays(x, t)
+    return x.ravel(), t.ravel(), digits.ravel()
+
+
+def column_holes(digits):
+    """Cells without a digit between the first and last assigned cell of their column."""
+    assigned = ~np.isnan(digits)
+    below = np.maximum.accumulate(assigned, axis=0)
+    above = np.maximum.accumulate(assigned[::-1], axis=0)[::-1]
+    return below & above & ~assigned
+
+
+def diff_tables(old, new):
+    """Aligns two tables on their common lattice and compares them cell by cell."""
+    if (old.spec.operation, old.spec.radix) != (new.spec.operation, new.spec.radix):
+        raise ValueError(f"Cannot compare {old.spec.name} with {new.spec.name}")
+    xf = max(old.spec.x_fractional_bits, new.spec.x_fractional_bits)
+    tf = max(old.spec.t_fractional_bits, new.spec.t_fractional_bits)
+    cells = [refine(table, xf, tf) for table in (old, new)]
+    x_values = np.concatenate([x for x, _, _ in cells])
+    t_values = np.concatenate([t for _, t, _ in cells])
+    x_low, t_low = int(x_values.min()), int(t_values.min())
+    shape = (int(t_values.max()) - t_low + 1, int(x_values.max()) - x_low + 1)
+    grids = []
+    for x, t, digits in cells:
+        grid = np.full(shape, np.nan)
+        grid[t - t_low, x - x_low] = digits
+        grids.append(grid)
+    before, after = grids
+    X, T = np.meshgrid(np.arange(shape[1]) + x_low, np.arange(shape[0]) + t_low)
+
+    # Column labels need the wider integer part of the two lattices.
+    x_bits = max(table.spec.x_bits - table.spec.x_fractional_bits for table in (old, new)) + xf
+    t_bits = max(table.spec.t_bits - table.spec.t_fractional_bits for table in (old, new)) + tf
+    spec = dataclasses.replace(new.spec, x_bits=x_bits, t_bits=t_bits, x_fractional_bits=xf, t_fractional_bits=tf)
+    was, now = ~np.isnan(before), ~np.isnan(after)
+    changed = was & now & (before != after)
+    new_holes = column_holes(after) & ~column_holes(before)
+    codes = [np.where(np.isnan(grid), np.iinfo(np.int64).min, grid).astype(np.int64) for grid in grids]
+    differs = (was | now) & (codes[0] != codes[1])
+    transitions = Counter(
+        zip(
+            (None if code == np.iinfo(np.int64).min else int(code) for code in codes[0][differs]),
+            (None if code == np.iinfo(np.int64).min else int(code) for code in codes[1][differs]),
+        )
+    )
+    return {
+        "old": old.name,
+        "new": new.name,
+        "spec": spec,
+        "X": X,
+        "T": T,
+        "before": before,
+        "after": after,
+        "unchanged": int((was & now & (before == after)).sum()),
+        "changed": changed,
+        "added": now & ~was,
+        "removed": was & ~now,
+        "new_holes": new_holes,
+        "transitions": dict(sorted(transitions.items(), key=lambda item: (-item[1], str(item[0])))),
+    }
+
+
+def _digit_text(digit):
+    return "-" if digit is None or np.isnan(digit) else f"{int(digit):+d}"
+
+
+def plot_diff(result, path, title=None):
+    """Draws the diff over the common lattice, changed cells labelled with their new digit."""
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import ListedColormap
+    from matplotlib.patches import Patch
+
+    spec, X, T = result["spec"], result["X"], result["T"]
+    before, after = result["before"], result["after"]
+    kinds = [
+        ("unchanged", "#d9d9d9", ~np.isnan(before) & ~np.isnan(after) & (before == after)),
+        ("changed", "#d62728", result["changed"]),
+        ("added", "#2ca02c", result["added"]),
+        ("removed", "#1f77b4", result["removed"]),
+    ]
+    classes = np.full(X.shape, np.nan)
+    for value, (_, _, mask) in enumerate(kinds):
+        classes[mask] = value
+    x_edges = np.append(X[0], X[0, -1] + 1) - 0.5
+    t_edges = np.append(T[:, 0], T[-1, 0] + 1) - 0.5
+
+    fig, ax = plt.subplots(figsize=(max(6, X.shape[1] * 0.35), max(8, X.shape[0] * 0.08)))
+    ax.pcolormesh(
+        x_edges,
+        t_edges,
+        np.ma.masked_invalid(classes),
+        cmap=ListedColormap([color for _, color, _ in kinds]),
+        vmin=-0.5,
+        vmax=len(kinds) - 0.5,
+    )
+    labelled = result["changed"] | result["added"]
+    if labelled.sum() <= MAX_LABELS:
+        for row, column in zip(*np.nonzero(labelled)):
+            ax.text(X[0, column], T[row, 0], _digit_text(after[row, column]), ha="center", va="center", fontsize=4)
+    holes = result["new_holes"]
+    ax.scatter(X[holes], T[holes], marker="x", color="k", s=12, linewidths=0.8)
+    handles = [Patch(color=color, label=f"{label} ({int(mask.sum())})") for label, color, mask in kinds]
+    if holes.any():
+        handles.append(plt.Line2D([], [], marker="x", color="k", linestyle="", label=f"new hole ({int(holes.sum())})"))
+    ax.legend(handles=handles, loc="upper left", fontsize=8)
+    x_ticks = X[0][:: max(1, X.shape[1] // 8)]
+    t_ticks = T[:, 0][:: max(1, X.shape[0] // 16)]
+    ax.set_xticks(x_ticks, [spec.x_label(x) for x in x_ticks], rotation=90)
+    ax.set_yticks(t_ticks, [spec.t_label(t) for t in t_ticks])
+    ax.set_xlabel(r"$\delta$" if spec.operation == "division" else r"$\sigma_j$")
+    ax.set_ylabel(r"$\tau_j$")
+    ax.set_title(title or f"{result['old']} -> {result['new']}")
+    ax.axhline(y=-0.5, color="k", linestyle="--", alpha=0.3)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fig.savefig(path, format="pdf", bbox_inches="tight")
+    plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cell-level diff of two selector tables.")
+    parser.add_argument("old", help="table source, e.g. radix4_qds_basic, cache:NAME, scala:QuotientDigitSelector@REV")
+    parser.add_argument("new", help="table source to compare against OLD")
+    parser.add_argument("--cache-dir", help="task result cache for cache: sources")
+    parser.add_argument("--plot", metavar="PATH", help="write the diff figure here")
+    parser.add_argument("--strict", action="store_true", help="fail on any changed cell, not only on new holes")
+    args = parser.parse_args(argv)
+
+    old, new = (load_table(source, args.cache_dir) for source in (args.old, args.new))
+    result = diff_tables(old, new)
+    spec, X, T = result["spec"], result["X"], result["T"]
+    counts = {kind: int(result[kind].sum()) for kind in ("changed", "added", "removed", "new_holes")}
+    print(
+        f"{old.name} -> {new.name} on x{spec.x_fractional_bits}/t{spec.t_fractional_bits} fractional bits: "
+        f"{result['unchanged']} unchanged, {counts['changed']} changed, {counts['added']} added, "
+        f"{counts['removed']} removed, {counts['new_holes']} new holes"
+    )
+    for (before, after), count in result["transitions"].items():
+        print(f"  {_digit_text(before):>2} -> {_digit_text(after):<2} {count:>6}")
+    for row, column in list(zip(*np.nonzero(result["new_holes"])))[:MAX_EXAMPLES]:
+        print(f"  new hole at {spec.x_label(X[0, column])} {spec.t_label(T[row, 0])}")
+    if args.plot:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        plot_diff(result, args.plot)
+        print(f"  {args.plot}")
+    if counts["new_holes"] or (args.strict and sum(counts.values())):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
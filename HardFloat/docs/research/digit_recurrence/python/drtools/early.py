@@ -0,0 +1,262 @@
+"""Zero-residual early-termination opportunity of the radix-4 dividers.
+
+Both dividers run a number of recurrence iterations fixed before the loop starts:
+
+* ``Radix4SRTDivider`` ``ceil(clzDiff / 2) + 1`` for a quotient of ``clzDiff + 1`` bits, none when
+  ``clzDiff`` is negative or the divisor zero;
+* ``DivSqrtStage1`` ``totalIterationsMinus2 + 2``, i.e. ``(sigWidth >> 1) + 1`` for division and
+  ``(sigWidth >> 1) - 1`` for square root, after the one (two) digits its first stage selects.
+
+Once the residual is exactly zero every later digit is zero and the result is exact, so a unit that
+detects a zero residual could leave the loop there.  ``estimate`` runs the operations of a workload
+through ``drtools.simulate`` with a selector table and counts, per operation, the loop iterations
+after ``SimulationResult.exact_at``: the cycles early termination would save.  The integer divider
+is modelled for unsigned operands, normalized and aligned as ``DividerStage2`` does, so that the last
+iteration ends on the integer quotient; the int64 datapath limits it to 32 bits.  Float operations
+take the significands of finite nonzero operands (positive ones for square root), as
+``drtools.floatref`` does.
+
+Workloads:
+
+* ``uniform`` -- uniform integers, or uniform significands;
+* ``log_uniform`` -- values with a uniformly drawn bit length; for the float units these are integers
+  converted to floating point, as integer code promoted to floats produces;
+* ``--trace FILE`` -- one operation per line, the operands in hexadecimal as ``testfloat_gen``
+  writes them (float units take IEEE bit patterns); further fields and ``#`` lines are ignored.
+
+    python -m drtools.early --unit int32 f32_div f32_sqrt --count 1000000
+    python -m drtools.floatref --format 32 --op div --count 100000 --out f32_div.txt
+    python -m drtools.early --unit f32_div --trace f32_div.txt --histogram
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from . import simulate
+
+DEFAULT_BATCH = 1 << 16
+WORKLOADS = ("uniform", "log_uniform")
+# The script RDS tables keep the hand-written S = 1/2 column, which fails for radicands below
+# (9/16)**2; the derived table of the same lattice does not.
+DEFAULT_TABLES = {
+    "division": "radix4_qds_optimized",
+    "sqrt": {"operation": "square_root", "radix": 4, "x_bits": 5, "t_bits": 8},
+}
+UNITS = {
+    "int8": ("integer", 8),
+    "int16": ("integer", 16),
+    "int32": ("integer", 32),
+    "f16_div": ("div", 16),
+    "f16_sqrt": ("sqrt", 16),
+    "f32_div": ("div", 32),
+    "f32_sqrt": ("sqrt", 32),
+}
+
+
+def _bit_length(values):
+    # frexp is exact below 2**53 and gives the bit length.
+    return np.frexp(np.asarray(values, dtype=np.int64).astype(np.float64))[1].astype(np.int64)
+
+
+def log_uniform(rng, count, bits):
+    """Positive integers below ``2**bits`` whose bit length is uniform in ``1..bits``."""
+    length = rng.integers(1, bits + 1, count)
+    return (1 << (length - 1)) + (rng.integers(0, 1 << 62, count) & ((1 << (length - 1)) - 1))
+
+
+def float_iterations(op, precision):
+    """``(setup, loop)``: the digits ``DivSqrtStage1`` selects before the loop and the loop iterations."""
+    if op == "div":
+        return 1, (precision >> 1) + 1
+    return 2, (precision >> 1) - 1
+
+
+def integer_case(lut, spec, dividend, divisor, width):
+    """Returns ``(iterations, exact_at, ok)`` of ``Radix4SRTDivider`` for unsigned operands.
+
+    The normalized dividend is shifted right by one more bit for an odd ``clzDiff``, so that the
+    ``ceil(clzDiff / 2) + 1`` digits of every operation end on the integer quotient.
+    """
+    dividend = np.asarray(dividend, dtype=np.int64)
+    divisor = np.asarray(divisor, dtype=np.int64)
+    dividend_clz = width - _bit_length(dividend)
+    divisor_clz = width - _bit_length(divisor)
+    clz_diff = divisor_clz - dividend_clz
+    run = (divisor != 0) & (dividend != 0) & (clz_diff >= 0)
+    iterations = np.where(run, (clz_diff + 1) // 2 + 1, 0)
+    exact_at = np.ones(dividend.size, dtype=np.int64)
+    ok = np.ones(dividend.size, dtype=bool)
+    if run.any():
+        x = (dividend[run] << dividend_clz[run]) << (1 - (clz_diff[run] & 1))
+        d = (divisor[run] << divisor_clz[run]) << 1
+        result = simulate.simulate_division(lut, spec, x, d, int(iterations.max()), width + 1)
+        exact_at[run], ok[run] = result.exact_at, result.ok
+    return iterations, exact_at, ok
+
+
+def float_case(lut, spec, op, operands, precision):
+    """Returns ``(iterations, exact_at, ok)`` of ``DivSqrtStage1`` for significands.
+
+    Both count loop iterations: a result already exact after the first stage's digits has
+    ``exact_at`` zero.
+    """
+    setup, loop = float_iterations(op, precision)
+    if op == "div":
+        result = simulate.simulate_division(lut, spec, *operands, setup + loop, precision)
+    else:
+        result = simulate.simulate_sqrt(lut, spec, *operands, setup + loop, precision + 1)
+    exact_at = np.maximum(result.exact_at, setup) - setup
+    return np.full(exact_at.size, loop), exact_at, result.ok
+
+
+def significands(op, bits, fmt):
+    """The significands of the finite nonzero operands (positive radicands) of IEEE bit patterns."""
+    from .floatref import _unpack
+
+    unpacked = [_unpack(operand, fmt) for operand in bits]
+    keep = np.ones(np.shape(bits[0]), dtype=bool)
+    for sign, classes, _, _ in unpacked:
+        keep &= ~(classes["nan"] | classes["inf"] | classes["zero"])
+        if op == "sqrt":
+            keep &= ~sign
+    if op == "div":
+        return tuple(significand[keep] for _, _, significand, _ in unpacked)
+    _, _, significand, exponent = unpacked[0]
+    return (significand[keep] << (exponent[keep] & 1),)
+
+
+def workload_operands(unit, workload, count, seed=0):
+    """Operands of ``count`` operations of ``unit``: integers, or significands for the float units."""
+    kind, width = UNITS[unit]
+    rng = np.random.default_rng(seed)
+    if kind == "integer":
+        if workload == "uniform":
+            return rng.integers(0, 1 << width, count), rng.integers(0, 1 << width, count)
+        return log_uniform(rng, count, width), log_uniform(rng, count, width)
+    from .floatref import FORMATS
+
+    precision = FORMATS[width][1]
+    if workload == "uniform":
+        return simulate.random_operands(
+            "division" if kind == "div" else "square_root", count, precision + (kind == "sqrt"), seed, False
+        )
+    values = [log_uniform(rng, count, precision) for _ in range(2 if kind == "div" else 1)]
+    lengths = [_bit_length(value) for value in values]
+    scaled = tuple(value << (precision - length) for value, length in zip(values, lengths))
+    if kind == "div":
+        return scaled
+    return (scaled[0] << ((lengths[0] - 1) & 1),)
+
+
+def read_trace(path, unit):
+    """The operands of the operations a trace file lists for ``unit``; see the module docstring."""
+    kind, width = UNITS[unit]
+    arity = 1 if kind == "sqrt" else 2
+    rows = []
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) < arity:
+                raise ValueError(f"{path}:{number}: expected {arity} operands, got {line.strip()!r}")
+            rows.append([int(field, 16) & ((1 << width) - 1) for field in fields[:arity]])
+    columns = tuple(np.array(column, dtype=np.int64) for column in zip(*rows)) or ((np.zeros(0, np.int64),) * arity)
+    if kind == "integer":
+        return columns
+    return significands(kind, columns, width)
+
+
+def tally(iterations, exact_at, ok, summary=None):
+    """Adds a batch to ``summary``; an operation saves the loop iterations after ``exact_at``."""
+    summary = summary or {
+        "operations": 0,
+        "unconverged": 0,
+        "exact": 0,
+        "iterations": 0,
+        "histogram": np.zeros(1, dtype=np.int64),
+    }
+    exact = ok & (exact_at <= iterations)
+    saved = np.where(exact, iterations - exact_at, 0)
+    histogram = np.bincount(saved, minlength=summary["histogram"].size)
+    histogram[: summary["histogram"].size] += summary["histogram"]
+    summary["operations"] += int(iterations.size)
+    summary["unconverged"] += int((~ok).sum())
+    summary["exact"] += int(exact.sum())
+    summary["iterations"] += int(iterations.sum())
+    summary["histogram"] = histogram
+    return summary
+
+
+def estimate(unit, lut, spec, operands, batch=DEFAULT_BATCH):
+    """The ``tally`` of the operations of ``unit`` over the operand arrays, in batches."""
+    kind, width = UNITS[unit]
+    summary = None
+    count = operands[0].size
+    for start in range(0, max(count, 1), batch):
+        chunk = [operand[start : start + batch] for operand in operands]
+        if kind == "integer":
+            case = integer_case(lut, spec, *chunk, width)
+        else:
+            from .floatref import FORMATS
+
+            case = float_case(lut, spec, kind, chunk, FORMATS[width][1])
+        summary = tally(*case, summary)
+    return summary
+
+
+def describe(summary):
+    operations = max(summary["operations"], 1)
+    saved = int((np.arange(summary["histogram"].size) * summary["histogram"]).sum())
+    return (
+        f"{summary['operations']} operations, {summary['unconverged']} unconverged, "
+        f"{100 * summary['exact'] / operations:.2f}% exact, {summary['iterations'] / operations:.2f} iterations, "
+        f"{saved / operations:.3f} saved ({100 * saved / max(summary['iterations'], 1):.2f}%)"
+    )
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .exhaustive import target_lut
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Cycles zero-residual early termination would save.")
+    parser.add_argument("--unit", nargs="+", choices=sorted(UNITS), default=["int32", "f32_div", "f32_sqrt"])
+    parser.add_argument("--workload", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--trace", nargs="+", default=[], metavar="FILE", help="trace workloads")
+    parser.add_argument("--count", type=int, default=1 << 20, help="operations per workload (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    for operation in DEFAULT_TABLES:
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(f"--{operation}", choices=sorted(FIGURE_SCRIPTS), help="script target")
+        group.add_argument(f"--{operation}-spec", nargs="+", metavar="FIELD=VALUE", help="table target")
+    parser.add_argument("--histogram", action="store_true", help="print the saved-cycle histograms")
+    args = parser.parse_args(argv)
+
+    tables = {}
+    for name in sorted({"sqrt" if UNITS[unit][0] == "sqrt" else "division" for unit in args.unit}):
+        spec_assignments = getattr(args, f"{name}_spec")
+        target = (
+            parse_assignments(spec_assignments) if spec_assignments else getattr(args, name) or DEFAULT_TABLES[name]
+        )
+        tables[name] = target_lut(target)
+        if (tables[name][0].operation == "division") != (name == "division") or tables[name][0].radix != 4:
+            parser.error(f"{tables[name][0].name} is not a radix-4 {name} table")
+    for unit in args.unit:
+        spec, lut = tables["sqrt" if UNITS[unit][0] == "sqrt" else "division"]
+        workloads = [(workload, workload_operands(unit, workload, args.count, args.seed)) for workload in args.workload]
+        workloads += [(path, read_trace(path, unit)) for path in args.trace]
+        for workload, operands in workloads:
+            summary = estimate(unit, lut, spec, operands)
+            print(f"{unit} {workload} ({spec.name}): {describe(summary)}")
+            if args.histogram:
+                for saved, count in enumerate(summary["histogram"]):
+                    if count:
+                        print(f"  {saved:3d} saved  {count:10d}  {100 * count / summary['operations']:7.3f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
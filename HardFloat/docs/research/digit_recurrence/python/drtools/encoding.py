@@ -0,0 +1,282 @@
+"""Explorer for the digit encoding between the selector and the datapath.
+
+Both RTL selectors hand the datapath a sign-magnitude digit: ``isNeg`` is wired from the sign of
+the estimate and ``isMag2``/``isMag1`` come out of the selector table, and QMC-minimized decoders
+turn the three bits into the on-the-fly update of the accumulated result.  This module scores
+alternative encodings on a resolved table:
+
+* ``sign_magnitude/estimate`` -- the RTL interface; the sign is the estimate's sign bit;
+* ``sign_magnitude/table`` -- the same bits, all three produced by the table;
+* ``one_hot`` -- one output per nonzero digit, zero when none is set;
+* ``twos_complement`` -- the digit as a signed binary number, ``a.bit_length() + 1`` bits.
+
+For each encoding the table outputs become truth tables over the selector inputs (the divisor
+column index and the estimate bits), and the consumer signals become truth tables over the code
+bits, plus the divisor sign when the table has negative columns.  The consumer signals are the
+ones the datapath uses: ``neg`` and ``mag<k>`` select the addend ``-q d`` (``neg`` is set when the
+product ``q d`` is positive, as ``isNeg`` is), ``acc_sel``/``acc_low`` and ``accm_sel``/``accm_low``
+append ``q`` and ``q - 1`` to the accumulated result and to the result minus one ulp.  Codes the
+table never produces are don't-cares; a code bit the selector leaves open, the sign of a zero digit,
+puts both of its values in the consumer's care set, so any selector cover composes with the consumer
+(``compose`` checks that).  An encoding whose codes do not identify the digit, as a sign
+taken from the estimate cannot when a nonzero digit sits across the sign boundary, is reported as
+infeasible.  ``loop`` is the depth of the iteration path from the selector inputs to the addend
+select signals; the on-the-fly update is off that path.
+
+    python -m drtools.encoding                          # every script target
+    python -m drtools.encoding --only radix4_qds_optimized --out-dir /tmp/encodings
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from . import tables
+from .logic import minimize, sop_cost, support, truth_table_lines
+from .scripts import FIGURE_SCRIPTS
+
+
+def _sign_magnitude(a, sign):
+    names = ["neg"] + [f"mag{k}" for k in range(a, 0, -1)]
+
+    def code(q, product_positive, estimate_positive):
+        if sign == "estimate":
+            neg = int(estimate_positive)
+        else:
+            neg = None if q == 0 else int(product_positive)
+        return (neg,) + tuple(int(abs(q) == k) for k in range(a, 0, -1))
+
+    return names, ("neg",) if sign == "estimate" else (), code
+
+
+def _one_hot(a):
+    names = [f"pos{k}" for k in range(a, 0, -1)] + [f"neg{k}" for k in range(1, a + 1)]
+
+    def code(q, product_positive, estimate_positive):
+        return tuple(int(q == k) for k in range(a, 0, -1)) + tuple(int(q == -k) for k in range(1, a + 1))
+
+    return names, (), code
+
+
+def _twos_complement(a):
+    width = a.bit_length() + 1
+    names = [f"q{i}" for i in reversed(range(width))]
+
+    def code(q, product_positive, estimate_positive):
+        return tuple((q >> i) & 1 for i in reversed(range(width)))
+
+    return names, (), code
+
+
+ENCODINGS = {
+    "sign_magnitude/estimate": lambda a: _sign_magnitude(a, "estimate"),
+    "sign_magnitude/table": lambda a: _sign_magnitude(a, "table"),
+    "one_hot": _one_hot,
+    "twos_complement": _twos_complement,
+}
+
+
+def consumer_signals(q, radix, a, negative_divisor):
+    """Datapath signals of digit ``q``; ``None`` marks a don't-care."""
+    low_bits = radix.bit_length() - 1
+    product_positive = (q > 0) != negative_divisor
+    signals = {"neg": None if q == 0 else int(product_positive)}
+    signals.update({f"mag{k}": int(abs(q) == k) for k in range(a, 0, -1)})
+    signals["acc_sel"] = int(q >= 0)
+    signals.update({f"acc_low{i}": ((q % radix) >> i) & 1 for i in reversed(range(low_bits))})
+    signals["accm_sel"] = int(q > 0)
+    signals.update({f"accm_low{i}": (((q - 1) % radix) >> i) & 1 for i in reversed(range(low_bits))})
+    return signals
+
+
+def _expand(bits):
+    """Every code a selector may output for ``bits``, where ``None`` is a don't-care."""
+    codes = [()]
+    for bit in bits:
+        codes = [code + (value,) for code in codes for value in ((0, 1) if bit is None else (bit,))]
+    return codes
+
+
+def _evaluate(cubes, minterm):
+    return int(any(minterm & mask == value for value, mask in cubes))
+
+
+def _minimize_outputs(rows, names, n):
+    """Minimizes every output column of ``{minterm: (bit, ...)}``; ``None`` bits are don't-cares."""
+    functions = {}
+    for index, name in enumerate(names):
+        on = [minterm for minterm, bits in rows.items() if bits[index] == 1]
+        dc = [minterm for minterm in range(1 << n) if minterm not in rows or rows[minterm][index] is None]
+        cubes = minimize(on, dc, n)
+        functions[name] = {"cubes": cubes, **sop_cost(cubes)}
+    return functions
+
+
+def _code_minterm(bits):
+    return sum(bit << (len(bits) - 1 - i) for i, bit in enumerate(bits))
+
+
+def _row_text(bits):
+    return "".join("?" if bit is None else str(bit) for bit in bits)
+
+
+def explore(spec, X, T, digits, encodings=None):
+    """Scores the encodings of a resolved table; returns ``{name: report}``."""
+    a = spec.digit_bound
+    t_values = T[:, 0].astype(int)
+    assigned_columns = [index for index in range(X.shape[1]) if not np.isnan(digits[:, index]).all()]
+    column_bits = max(1, (len(assigned_columns) - 1).bit_length())
+    t_bits = spec.t_bits
+    signed_table = bool((X[0, assigned_columns] < 0).any())
+    n = column_bits + t_bits
+
+    reports = {}
+    for encoding in encodings or ENCODINGS:
+        names, wired, code = ENCODINGS[encoding](a)
+        selector_rows, produced, conflicts = {}, {}, 0
+        for position, index in enumerate(assigned_columns):
+            negative_divisor = bool(X[0, index] < 0)
+            for row in np.flatnonzero(~np.isnan(digits[:, index])):
+                q, t = int(digits[row, index]), int(t_values[row])
+                bits = code(q, (q > 0) != negative_divisor, t >= 0)
+                selector_rows[(position << t_bits) | (t & ((1 << t_bits) - 1))] = tuple(
+                    bit for bit, name in zip(bits, names) if name not in wired
+                )
+                for expanded in _expand(bits):
+                    key = expanded + ((int(negative_divisor),) if signed_table else ())
+                    if produced.setdefault(key, q) != q:
+                        conflicts += 1
+
+        table_names = [name for name in names if name not in wired]
+        selector = _minimize_outputs(selector_rows, table_names, n)
+        depths = {name: 0 for name in wired}
+        depths.update({name: function["depth"] for name, function in selector.items()})
+
+        inputs = list(names) + (["dsign"] if signed_table else [])
+        depths["dsign"] = 0
+        m = len(inputs)
+        consumer_rows, signal_names = {}, None
+        for key, q in produced.items():
+            signals = consumer_signals(q, spec.radix, a, bool(signed_table and key[-1]))
+            signal_names = signal_names or list(signals)
+            consumer_rows[_code_minterm(key)] = tuple(signals.values())
+        consumer = _minimize_outputs(consumer_rows, signal_names, m) if not conflicts else {}
+
+        def signal_depth(function):
+            used = support(function["cubes"])
+            fed = [depths[inputs[m - 1 - i]] for i in range(m) if used >> i & 1]
+            return function["depth"] + max(fed, default=0)
+
+        addend = ["neg"] + [f"mag{k}" for k in range(a, 0, -1)]
+        reports[encoding] = {
+            "feasible": conflicts == 0,
+            "conflicts": conflicts,
+            "code_bits": len(names),
+            "table_outputs": len(table_names),
+            "selector_gates": sum(function["gates"] for function in selector.values()),
+            "selector_depth": max((function["depth"] for function in selector.values()), default=0),
+            "consumer_gates": sum(function["gates"] for function in consumer.values()),
+            "loop_depth": (
+                max((signal_depth(consumer[signal]) for signal in addend), default=None) if consumer else None
+            ),
+            "otf_depth": (
+                max(signal_depth(function) for signal, function in consumer.items() if signal not in addend)
+                if consumer
+                else None
+            ),
+            "inputs": {"selector": ["column"] * column_bits + ["t"] * t_bits, "consumer": inputs},
+            "selector": selector,
+            "consumer": consumer,
+            "selector_table": truth_table_lines({k: _row_text(v) for k, v in selector_rows.items()}, n),
+            "consumer_table": truth_table_lines({k: _row_text(v) for k, v in consumer_rows.items()}, m),
+        }
+    return reports
+
+
+def compose(spec, X, T, digits, encoding, report):
+    """Counts the consumer signal values that differ from ``consumer_signals`` when the minimized
+    selector of ``report`` drives its minimized consumer, over every assigned cell.
+    """
+    a = spec.digit_bound
+    names, wired, code = ENCODINGS[encoding](a)
+    t_bits = spec.t_bits
+    t_values = T[:, 0].astype(int)
+    assigned_columns = [index for index in range(X.shape[1]) if not np.isnan(digits[:, index]).all()]
+    signed_table = "dsign" in report["inputs"]["consumer"]
+    errors = 0
+    for position, index in enumerate(assigned_columns):
+        negative_divisor = bool(X[0, index] < 0)
+        for row in np.flatnonzero(~np.isnan(digits[:, index])):
+            q, t = int(digits[row, index]), int(t_values[row])
+            selector_minterm = (position << t_bits) | (t & ((1 << t_bits) - 1))
+            expected = code(q, (q > 0) != negative_divisor, t >= 0)
+            bits = tuple(
+                bit if name in wired else _evaluate(report["selector"][name]["cubes"], selector_minterm)
+                for bit, name in zip(expected, names)
+            )
+            consumer_minterm = _code_minterm(bits + ((int(negative_divisor),) if signed_table else ()))
+            signals = consumer_signals(q, spec.radix, a, signed_table and negative_divisor)
+            for name, value in signals.items():
+                if value is not None and _evaluate(report["consumer"][name]["cubes"], consumer_minterm) != value:
+                    errors += 1
+    return errors
+
+
+def target_encodings(target, encodings=None):
+    from .pipeline import load_target, target_spec
+
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    digits, _, _ = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec), log=None)
+    return explore(spec, X, T, digits, encodings)
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .pipeline import target_name
+
+    parser = argparse.ArgumentParser(description="Score digit encodings of selector tables.")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--encodings", nargs="+", choices=sorted(ENCODINGS), help="encodings to score")
+    parser.add_argument("--out-dir", help="write the selector and consumer truth tables here")
+    args = parser.parse_args(argv)
+
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    for target in targets or list(FIGURE_SCRIPTS):
+        name = target_name(target)
+        reports = target_encodings(target, args.encodings)
+        width = max(len(encoding) for encoding in reports)
+        print(name)
+        print(
+            f"  {'encoding':<{width}}  {'bits':>4}  {'table':>5}  {'sel.gates':>9}  {'sel.depth':>9}  "
+            f"{'cons.gates':>10}  {'loop':>4}  {'otf':>3}"
+        )
+        ranked = sorted(
+            reports.items(),
+            key=lambda item: (not item[1]["feasible"], item[1]["loop_depth"] or 0, item[1]["selector_gates"]),
+        )
+        for encoding, report in ranked:
+            if not report["feasible"]:
+                print(f"  {encoding:<{width}}  infeasible: {report['conflicts']} conflicting codes")
+                continue
+            print(
+                f"  {encoding:<{width}}  {report['code_bits']:>4}  {report['table_outputs']:>5}  "
+                f"{report['selector_gates']:>9}  {report['selector_depth']:>9}  {report['consumer_gates']:>10}  "
+                f"{report['loop_depth']:>4}  {report['otf_depth']:>3}"
+            )
+            if args.out_dir:
+                os.makedirs(args.out_dir, exist_ok=True)
+                stem = os.path.join(args.out_dir, f"{name}_{encoding.replace('/', '_')}")
+                for part in ("selector", "consumer"):
+                    with open(f"{stem}_{part}.txt", "w") as f:
+                        f.write(f"# inputs (msb first): {' '.join(report['inputs'][part])}\n")
+                        f.write(f"# outputs: {' '.join(report[part])}\n")
+                        f.write("\n".join(report[f"{part}_table"]) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""Sharded, resumable exhaustive verification of a selector table by simulation.
+
+The operand space of ``drtools.simulate.exhaustive_operands`` is cut into shards of consecutive
+operands that a process pool simulates with ``simulate_division``/``simulate_sqrt``.  The compiled
+``drtools.lut.DigitLUT`` is written once as ``<checkpoint>.lut.npy`` and every worker maps it
+read-only, so the table is shared through the page cache rather than pickled per shard.  With
+``--bitsliced`` division shards run through ``drtools.bitslice`` instead, 64 operands per word.
+
+The checkpoint is a JSON file rewritten atomically every ``--checkpoint-every`` seconds and on
+exit, holding the per-shard results of every completed shard.  Rerunning the same command skips
+those shards; a checkpoint written for another table, width or shard size is refused unless
+``--restart`` is given.  Progress, throughput and the estimated time left go to stderr.
+
+    python -m drtools.exhaustive --only radix4_qds_optimized --operand-bits 12 --checkpoint /tmp/qds12.json
+    python -m drtools.exhaustive --only radix4_qds_optimized --operand-bits 16 --bitsliced --checkpoint /tmp/qds16.json
+    python -m drtools.exhaustive --spec operation=square_root x_bits=6 t_bits=9 --operand-bits 16 -j 8 \\
+        --checkpoint /tmp/rds16.json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from . import bitslice, simulate, tables
+from .lut import DigitLUT, compile_lut
+
+DEFAULT_SHARD_SIZE = 1 << 18
+MAX_EXAMPLES = 8
+
+_WORKER = {}
+
+
+def _init_worker(lut_path, lut_fields, spec_fields, functions=None):
+    from .regions import TableSpec
+
+    _WORKER["lut"] = DigitLUT(np.load(lut_path, mmap_mode="r"), **lut_fields)
+    _WORKER["spec"] = TableSpec(**spec_fields)
+    _WORKER["functions"] = functions
+
+
+def verify_shard(shard, start, stop, operand_bits, iterations, signed_divisor):
+    """Simulates operands ``start`` to ``stop``; returns the shard's counts and a few failing operands."""
+    began = time.perf_counter()
+    lut, spec, functions = _WORKER["lut"], _WORKER["spec"], _WORKER["functions"]
+    if functions is not None:
+        x, d = bitslice.exhaustive_planes(operand_bits, start, stop, signed_divisor)
+        result = bitslice.simulate_planes(lut, spec, x, d, stop - start, iterations, operand_bits, functions)
+    else:
+        operands = simulate.exhaustive_operands(spec.operation, operand_bits, start, stop, signed_divisor)
+        if spec.operation == "division":
+            result = simulate.simulate_division(lut, spec, *operands, iterations, operand_bits)
+        else:
+            result = simulate.simulate_sqrt(lut, spec, *operands, iterations, operand_bits)
+    failed = np.flatnonzero(~result.ok)[:MAX_EXAMPLES]
+    examples = [
+        {"operands": [int(operand[0]) for operand in operands], "step": int(result.failed_at[i])}
+        for i, operands in (
+            (i, simulate.exhaustive_operands(spec.operation, operand_bits, start + i, start + i + 1, signed_divisor))
+            for i in failed
+        )
+    ]
+    return {
+        "shard": shard,
+        "operands": stop - start,
+        "failures": int((~result.ok).sum()),
+        "examples": examples,
+        "seconds": time.perf_counter() - began,
+    }
+
+
+def default_iterations(spec, operand_bits):
+    """Enough steps for an ``operand_bits`` result plus one guard digit."""
+    return math.ceil(operand_bits / (spec.radix.bit_length() - 1)) + 1
+
+
+def _save_checkpoint(path, state):
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(temporary, path)
+
+
+def _load_checkpoint(path, fingerprint, restart):
+    if restart or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("fingerprint") != fingerprint:
+        raise ValueError(f"{path} was written for {state.get('fingerprint')}; pass --restart to discard it")
+    return {int(shard): result for shard, result in state["completed"].items()}
+
+
+def _progress(done, shards, verified, remaining, seconds, file=sys.stderr):
+    rate = verified / seconds if seconds > 0 else 0.0
+    left = f"{remaining / rate:7.0f}s left" if rate else ""
+    print(f"\r{done}/{shards} shards  {rate / 1e6:8.3f} M operands/s  {left}", end="", file=file, flush=True)
+
+
+def run(
+    spec,
+    lut,
+    checkpoint,
+    operand_bits,
+    iterations=None,
+    shard_size=DEFAULT_SHARD_SIZE,
+    signed_divisor=True,
+    jobs=None,
+    checkpoint_every=30.0,
+    restart=False,
+    progress=True,
+    bitsliced=False,
+    cache_dir=None,
+):
+    """Verifies every operand; returns the summary also stored in the checkpoint.
+
+    Inputs the simulators cannot model raise ``ValueError`` here, before any worker starts.  With
+    ``cache_dir`` a bit-sliced run reuses the selector minimized by an earlier one.
+    """
+    iterations = iterations or default_iterations(spec, operand_bits)
+    simulate.datapath(spec, operand_bits, iterations)
+    if bitsliced:
+        bitslice.check_spec(spec, operand_bits)
+        if shard_size % 64:
+            raise ValueError("Bit-sliced shards must be a multiple of 64 operands")
+    total = simulate.operand_count(spec.operation, operand_bits, signed_divisor)
+    shards = [(index, start, min(start + shard_size, total)) for index, start in enumerate(range(0, total, shard_size))]
+    fingerprint = {
+        "table": spec.name,
+        "lut_sha256": hashlib.sha256(np.ascontiguousarray(lut.table).tobytes()).hexdigest(),
+        "operand_bits": operand_bits,
+        "iterations": iterations,
+        "shard_size": shard_size,
+        "signed_divisor": signed_divisor,
+    }
+    completed = _load_checkpoint(checkpoint, fingerprint, restart)
+
+    lut_path = f"{checkpoint}.lut.npy"
+    np.save(lut_path, lut.table)
+    lut_fields = {"first_column": lut.first_column, "columns": lut.columns, "t_bits": lut.t_bits, "wrap": lut.wrap}
+
+    def state():
+        return {
+            "fingerprint": fingerprint,
+            "shards": len(shards),
+            "completed": {str(shard): result for shard, result in sorted(completed.items())},
+            "summary": summarize(completed.values(), total),
+        }
+
+    pending = [shard for shard in shards if shard[0] not in completed]
+    # A couple of shards queued per worker keeps the pool busy without running far past a checkpoint.
+    queue_depth = 2 * (jobs or os.cpu_count() or 1)
+    remaining = sum(last - first for _, first, last in pending)
+    start = time.perf_counter()
+    saved = shown = start
+    verified = 0
+    # The selector is minimized once here rather than in every worker.
+    functions = None
+    if bitsliced and cache_dir:
+        functions = bitslice.cached_selector_functions(lut, spec.digit_bound, cache_dir)
+    elif bitsliced:
+        functions = bitslice.selector_functions(lut, spec.digit_bound)
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(lut_path, lut_fields, spec.to_dict(), functions)
+    ) as executor:
+        running = set()
+        try:
+            while pending or running:
+                while pending and len(running) < queue_depth:
+                    shard, first, last = pending.pop(0)
+                    running.add(
+                        executor.submit(verify_shard, shard, first, last, operand_bits, iterations, signed_divisor)
+                    )
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    completed[result["shard"]] = result
+                    verified += result["operands"]
+                    remaining -= result["operands"]
+                now = time.perf_counter()
+                if progress and (now - shown >= 1.0 or not (pending or running)):
+                    _progress(len(completed), len(shards), verified, remaining, now - start)
+                    shown = now
+                if now - saved >= checkpoint_every:
+                    _save_checkpoint(checkpoint, state())
+                    saved = now
+        finally:
+            for future in running:
+                future.cancel()
+            _save_checkpoint(checkpoint, state())
+            if progress:
+                print(file=sys.stderr)
+    return state()["summary"]
+
+
+def summarize(results, total):
+    results = list(results)
+    operands = sum(result["operands"] for result in results)
+    failures = sum(result["failures"] for result in results)
+    examples = [example for result in sorted(results, key=lambda r: r["shard"]) for example in result["examples"]]
+    return {
+        "operands": operands,
+        "total": total,
+        "complete": operands == total,
+        "failures": failures,
+        "examples": examples[:MAX_EXAMPLES],
+        "seconds": sum(result["seconds"] for result in results),
+    }
+
+
+def target_lut(target):
+    from .pipeline import load_target, target_spec
+
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    digits, _, _ = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec), log=None)
+    return spec, compile_lut(spec, X, T, digits)
+
+
+def main(argv=None):
+    from .config import DEFAULTS, parse_assignments
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Exhaustively verify a selector table by simulation.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--only", choices=sorted(FIGURE_SCRIPTS), help="script target")
+    target.add_argument("--spec", nargs="+", metavar="FIELD=VALUE", help="table target")
+    parser.add_argument("--operand-bits", type=int, required=True)
+    parser.add_argument("--iterations", type=int, help="recurrence steps (default: operand bits plus a guard digit)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--positive-divisor", action="store_true", help="skip negative divisors")
+    parser.add_argument("--jobs", "-j", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--checkpoint", required=True, help="JSON checkpoint, resumed when it matches")
+    parser.add_argument("--checkpoint-every", type=float, default=30.0, help="seconds between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="discard an existing checkpoint")
+    parser.add_argument("--bitsliced", action="store_true", help="simulate division 64 operands per word")
+    parser.add_argument(
+        "--cache-dir", default=DEFAULTS["cache_dir"], help="minimized selectors of --bitsliced (default: %(default)s)"
+    )
+    args = parser.parse_args(argv)
+
+    spec, lut = target_lut(args.only or parse_assignments(args.spec))
+    try:
+        summary = run(
+            spec,
+            lut,
+            args.checkpoint,
+            args.operand_bits,
+            args.iterations,
+            args.shard_size,
+            not args.positive_divisor,
+            args.jobs,
+            args.checkpoint_every,
+            args.restart,
+            bitsliced=args.bitsliced,
+            cache_dir=args.cache_dir,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    except KeyboardInterrupt:
+        print(f"interrupted; rerun with the same options to resume from {args.checkpoint}", file=sys.stderr)
+        return 130
+    print(
+        f"{spec.name}: {summary['operands']}/{summary['total']} operands, {summary['failures']} failures, "
+        f"{summary['seconds']:.1f} worker-seconds"
+    )
+    for example in summary["examples"]:
+        print(f"  operands {example['operands']} failed at step {example['step']}")
+    return 0 if summary["complete"] and summary["failures"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
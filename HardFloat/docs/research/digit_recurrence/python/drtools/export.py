@@ -0,0 +1,243 @@
+"""Polygon export of the selector regions as pgfplots code or a lightweight vector PDF.
+
+The scatter figures draw one marker per lattice cell, which makes the PDFs heavy and slow to
+embed.  Here each region is merged into staircase polygons (see ``drtools.polygons``) and emitted
+either as a pgfplots ``tikzpicture`` for ``\\input`` in ``digit_recurrence.tex`` (requires
+``\\usepackage{pgfplots}``) or as a PDF drawn from a handful of filled paths.
+
+    python -m drtools.export [--format tikz|pdf] [--figures-dir DIR] [--only NAME ...]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from .polygons import region_polygons
+from .scripts import FIGURE_SCRIPTS, FIGURES_DIR
+
+
+def digit_symbol(operation):
+    return "q" if operation == "division" else "s"
+
+
+def figure_regions(script, module, inputs, quadrants):
+    """Returns ``[(label, color, mask), ...]`` in the order and colors of the scatter figure."""
+    X, T, digits, *overlaps = inputs
+    colors = list(module.create_custom_colormap().colors)
+    symbol = digit_symbol(script.operation)
+    quadrant_mask = quadrant_columns(script, module, X[0], quadrants)[np.newaxis, :]
+
+    a = len(overlaps) // 2 if overlaps else len(colors) // 2
+    values = list(range(a, -a - 1, -1))
+    regions = []
+    if overlaps:
+        # Overlap cells are drawn on top of the digit markers in the figure; keep the partition clean here.
+        any_overlap = np.logical_or.reduce(overlaps)
+        for i, value in enumerate(values):
+            regions.append((f"${symbol}_{{j+1}} = {value}$", colors[2 * i], (digits == value) & ~any_overlap))
+        for i, overlap in enumerate(overlaps):
+            label = f"${symbol}_{{j+1}} \\in \\{{{values[i + 1]},{values[i]}\\}}$"
+            regions.append((label, colors[2 * i + 1], overlap))
+    else:
+        for i, value in enumerate(values):
+            regions.append((f"${symbol}_{{j+1}} = {value}$", colors[i], digits == value))
+    return [(label, color, mask & quadrant_mask) for label, color, mask in regions]
+
+
+def quadrant_columns(script, module, x_values, quadrants):
+    bits = module.D_BITS if script.operation == "division" else module.S_BITS
+    if quadrants == "quadrants_1_4":
+        return x_values >= 2 ** (bits - 2)
+    elif quadrants == "quadrants_2_3":
+        return x_values < -(2 ** (bits - 2))
+    return np.ones_like(x_values, dtype=bool)
+
+
+def axis_layout(script, module):
+    """Returns the axis limits, tick positions and tick labels used by the scatter figure."""
+    if script.operation == "division":
+        x_range, x_bits, x_fractional_bits = module.D_RANGE, module.D_BITS, module.D_FRACTIONAL_BITS
+        x_ticks = np.arange(-(2 ** (x_bits - 1)), 2 ** (x_bits - 1), 2 ** (x_fractional_bits - 1))
+        x_label = r"$\delta$"
+    else:
+        x_range, x_bits, x_fractional_bits = module.S_RANGE, module.S_BITS, module.S_FRACTIONAL_BITS
+        x_ticks = np.arange(0, 2 ** (x_bits - 1) + 1, 2 ** (x_fractional_bits - 2))
+        x_label = r"$\sigma_j$"
+    t_bits, t_fractional_bits = module.T_BITS, module.T_FRACTIONAL_BITS
+    t_ticks = np.arange(-(2 ** (t_bits - 1)), 2 ** (t_bits - 1), 2 ** (t_fractional_bits - 1))
+    x_format = module.binary_formatter(x_bits, x_fractional_bits)
+    t_format = module.binary_formatter(t_bits, t_fractional_bits)
+    return {
+        "xlim": (x_range[0] - 1 / 3, x_range[-1] + 1 / 3),
+        "tlim": (module.T_RANGE[0] - 0.5, module.T_RANGE[-1] + 0.5),
+        "x_ticks": [(int(x), x_format(x, None)) for x in x_ticks],
+        "t_ticks": [(int(t), t_format(t, None)) for t in t_ticks],
+        "x_label": x_label,
+        "t_label": r"$\tau_j$",
+        "title": f"${digit_symbol(script.operation)}_{{j+1}}$",
+    }
+
+
+def legend_position(quadrants):
+    if quadrants == "quadrants_1_4":
+        return "north west", "upper left"
+    elif quadrants == "quadrants_2_3":
+        return "north east", "upper right"
+    return "north", "upper center"
+
+
+def _number(value):
+    return f"{value:g}"
+
+
+def to_pgfplots(regions, layout, quadrants, source=""):
+    """Returns a pgfplots ``tikzpicture`` drawing every region as filled staircase polygons."""
+    lines = [f"% Generated by drtools.export from {source} ({quadrants}); do not edit."]
+    for i, (_, color, _) in enumerate(regions):
+        lines.append(f"\\definecolor{{drregion{i}}}{{HTML}}{{{color.lstrip('#').upper()}}}")
+    legend_pos, _ = legend_position(quadrants)
+    x_ticks = ",".join(str(x) for x, _ in layout["x_ticks"])
+    x_labels = ",".join(label for _, label in layout["x_ticks"])
+    t_ticks = ",".join(str(t) for t, _ in layout["t_ticks"])
+    t_labels = ",".join(label for _, label in layout["t_ticks"])
+    lines += [
+        "\\begin{tikzpicture}",
+        "\\begin{axis}[",
+        "  axis equal image,",
+        f"  xmin={_number(layout['xlim'][0])}, xmax={_number(layout['xlim'][1])},",
+        f"  ymin={_number(layout['tlim'][0])}, ymax={_number(layout['tlim'][1])},",
+        f"  xtick={{{x_ticks}}}, xticklabels={{{x_labels}}},",
+        f"  ytick={{{t_ticks}}}, yticklabels={{{t_labels}}},",
+        "  xticklabel style={rotate=90, font=\\tiny}, yticklabel style={font=\\tiny},",
+        f"  xlabel={{{layout['x_label']}}}, ylabel={{{layout['t_label']}}}, title={{{layout['title']}}},",
+        f"  grid=major, legend pos={legend_pos}, legend style={{font=\\tiny}},",
+        "]",
+    ]
+    for i, (label, _, mask) in enumerate(regions):
+        polygons = region_polygons(mask, layout["x_values"], layout["t_values"])
+        for j, polygon in enumerate(polygons):
+            coordinates = " ".join(f"({_number(x)},{_number(t)})" for x, t in polygon)
+            options = f"fill=drregion{i}, fill opacity=0.7, draw=none, area legend"
+            if j > 0:
+                options += ", forget plot"
+            lines.append(f"\\addplot[{options}] coordinates {{{coordinates}}} -- cycle;")
+            if j == 0:
+                lines.append(f"\\addlegendentry{{{label}}}")
+    lines += [
+        f"\\addplot[black, dashed, opacity=0.3, forget plot] coordinates "
+        f"{{({_number(layout['xlim'][0])},0) ({_number(layout['xlim'][1])},0)}};",
+        "\\end{axis}",
+        "\\end{tikzpicture}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def render_polygon_pdf(regions, layout, quadrants, path, coverage=None):
+    """Draws the regions as filled polygons with the scatter figure's axes and saves a PDF.
+
+    ``coverage`` is an optional ``(counts, assigned)`` pair of grids: the visit counts are drawn
+    over the regions on a log scale and the assigned cells without visits are hatched.
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import PolyCollection
+    from matplotlib.patches import Patch
+    from matplotlib.ticker import FixedFormatter, FixedLocator
+
+    fig, ax = plt.subplots(figsize=(4, 100))
+    handles = []
+    for label, color, mask in regions:
+        polygons = region_polygons(mask, layout["x_values"], layout["t_values"])
+        if not polygons:
+            continue
+        ax.add_collection(PolyCollection(polygons, facecolors=color, edgecolors="none", alpha=0.7))
+        handles.append(Patch(facecolor=color, alpha=0.7, label=label))
+    if coverage is not None:
+        _draw_coverage(fig, ax, handles, regions, layout, *coverage)
+
+    ax.set_aspect("equal")
+    ax.set_xlim(*layout["xlim"])
+    ax.set_ylim(*layout["tlim"])
+    ax.xaxis.set_major_locator(FixedLocator([x for x, _ in layout["x_ticks"]]))
+    ax.xaxis.set_major_formatter(FixedFormatter([label for _, label in layout["x_ticks"]]))
+    ax.yaxis.set_major_locator(FixedLocator([t for t, _ in layout["t_ticks"]]))
+    ax.yaxis.set_major_formatter(FixedFormatter([label for _, label in layout["t_ticks"]]))
+    ax.grid(True)
+    ax.set_xlabel(layout["x_label"])
+    ax.set_ylabel(layout["t_label"])
+    ax.set_title(layout["title"])
+    ax.legend(handles=handles, loc=legend_position(quadrants)[1])
+    ax.axhline(y=0, color="k", linestyle="--", alpha=0.3)
+
+    plt.tight_layout()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    plt.savefig(path, format="pdf", bbox_inches="tight")
+    plt.close(fig)
+
+
+def _draw_coverage(fig, ax, handles, regions, layout, counts, assigned):
+    from matplotlib.collections import PolyCollection
+    from matplotlib.colors import LogNorm
+    from matplotlib.patches import Patch
+
+    drawn = np.logical_or.reduce([mask for _, _, mask in regions])
+    counts = np.where(drawn, counts, 0)
+    if counts.any():
+        x_edges = np.append(layout["x_values"], layout["x_values"][-1] + 1) - 0.5
+        t_edges = np.append(layout["t_values"], layout["t_values"][-1] + 1) - 0.5
+        norm = LogNorm(vmin=1, vmax=max(int(counts.max()), 2))
+        mesh = ax.pcolormesh(x_edges, t_edges, np.ma.masked_equal(counts, 0), cmap="magma_r", norm=norm, alpha=0.6)
+        fig.colorbar(mesh, ax=ax, label="visits", location="bottom", shrink=0.8, pad=0.005)
+    polygons = region_polygons(drawn & assigned & (counts == 0), layout["x_values"], layout["t_values"])
+    if polygons:
+        ax.add_collection(PolyCollection(polygons, facecolors="none", edgecolors="0.3", hatch="xxx", linewidths=0))
+        handles.append(Patch(facecolor="none", edgecolor="0.3", hatch="xxx", label="never reached"))
+
+
+def export_path(name, quadrants, fmt="tikz", figures_dir=FIGURES_DIR):
+    stem = os.path.splitext(FIGURE_SCRIPTS[name].figure_path(quadrants, figures_dir))[0]
+    return f"{stem}.tikz" if fmt == "tikz" else f"{stem}_regions.pdf"
+
+
+def export_figure(name, quadrants, fmt="tikz", figures_dir=FIGURES_DIR, inputs=None):
+    """Exports one script/quadrant figure and returns the written path.
+
+    ``inputs`` are the arrays the script's plot function takes; they are computed when omitted.
+    """
+    script = FIGURE_SCRIPTS[name]
+    module = script.load()
+    if inputs is None:
+        inputs = script.compute(module)
+    regions = figure_regions(script, module, inputs, quadrants)
+    layout = axis_layout(script, module)
+    layout["x_values"] = inputs[0][0]
+    layout["t_values"] = inputs[1][:, 0]
+    path = export_path(name, quadrants, fmt, figures_dir)
+    if fmt == "tikz":
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(to_pgfplots(regions, layout, quadrants, source=name))
+    else:
+        render_polygon_pdf(regions, layout, quadrants, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export selector regions as staircase polygons.")
+    parser.add_argument("--format", choices=("tikz", "pdf"), default="tikz")
+    parser.add_argument("--figures-dir", default=FIGURES_DIR, help="output root (default: %(default)s)")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="restrict to these scripts")
+    args = parser.parse_args(argv)
+
+    if args.format == "pdf":
+        import matplotlib
+
+        matplotlib.use("Agg")
+    for name in args.only or FIGURE_SCRIPTS:
+        for quadrants in FIGURE_SCRIPTS[name].quadrants:
+            path = export_figure(name, quadrants, args.format, os.path.abspath(args.figures_dir))
+            print(f"{os.path.getsize(path):>8} bytes  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""Correctly rounded f16/f32 division and square root in vectorised integer arithmetic.
+
+A reference for ``DivSqrtRecFN`` at the floating-point level, with the semantics ``testfloat_gen``
+checks it against in ``HardFloatTester``: the six rounding modes of ``ROUNDING`` (the codes are the
+``roundingMode`` inputs of the RTL), tininess detected before or after rounding, the five exception
+flags and the RISC-V default NaN.  Operands and results are IEEE bit patterns held in int64 arrays.
+
+Finite nonzero operands are unpacked into integer significands.  The quotient or root is computed
+exactly to two bits below the result precision, the rest of it folded into a sticky bit, and
+``round_pack`` rounds that once, into a subnormal when the exponent is below the normal range.
+``quotient``/``root`` can be swapped for ``table_quotient``/``table_root``, which take the same
+significands through ``drtools.simulate`` with a selector table, so a table is checked end to end
+against the reference result by result.
+
+``inputs`` enumerates the operand space (every f16 pair for division), ``random_inputs`` draws
+operands weighted towards the exponent extremes, and ``format_vectors`` renders whole arrays as
+``testfloat_gen`` lines that the HardFloat harness reads on stdin:
+
+    python -m drtools.floatref --format 16 --op div --rounding min --tininess after --exhaustive \\
+        | test_run_dir/DivSqrtRecF16_div/dut 2 1
+    python -m drtools.floatref --format 32 --op sqrt --count 1000000 --out f32_sqrt.txt
+    python -m drtools.floatref --format 16 --op div --check radix4_qds_optimized --rounding all --count 1000000
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+FORMATS = {16: (5, 11), 32: (8, 24)}
+ROUNDING = {"near_even": 0, "minMag": 1, "min": 2, "max": 3, "near_maxMag": 4, "odd": 6}
+TININESS = {"before": 0, "after": 1}
+
+FLAG_INEXACT = 1
+FLAG_UNDERFLOW = 2
+FLAG_OVERFLOW = 4
+FLAG_INFINITE = 8
+FLAG_INVALID = 16
+
+CHUNK = 1 << 20
+_HEX = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+
+def _layout(fmt):
+    exponent_bits, precision = FORMATS[fmt]
+    return exponent_bits, precision, (1 << (exponent_bits - 1)) - 1
+
+
+def default_nan(fmt):
+    exponent_bits, precision, _ = _layout(fmt)
+    return ((1 << (exponent_bits + 1)) - 1) << (precision - 2)
+
+
+def _unpack(bits, fmt):
+    """Returns ``(sign, classes, significand, exponent)``.
+
+    ``classes`` holds the ``nan``/``snan``/``inf``/``zero`` masks.  For finite nonzero operands the
+    significand has its leading one at bit ``precision - 1`` and the value is
+    ``significand * 2**(exponent - precision + 1)``; other lanes hold a harmless normal significand.
+    """
+    exponent_bits, precision, bias = _layout(fmt)
+    bits = np.asarray(bits, dtype=np.int64)
+    fraction_bits = precision - 1
+    sign = (bits >> (exponent_bits + fraction_bits)) & 1 == 1
+    field = (bits >> fraction_bits) & ((1 << exponent_bits) - 1)
+    fraction = bits & ((1 << fraction_bits) - 1)
+    special = field == (1 << exponent_bits) - 1
+    classes = {
+        "nan": special & (fraction != 0),
+        "snan": special & (fraction != 0) & (fraction >> (fraction_bits - 1) == 0),
+        "inf": special & (fraction == 0),
+        "zero": (field == 0) & (fraction == 0),
+    }
+    subnormal = (field == 0) & (fraction != 0)
+    # frexp is exact for these widths and gives the bit length of the fraction.
+    shift = np.where(subnormal, precision - np.frexp(fraction.astype(np.float64))[1], 0)
+    significand = np.where(subnormal, fraction << shift, fraction | (1 << fraction_bits))
+    exponent = np.where(subnormal, 1 - bias - shift, field - bias)
+    return sign, classes, significand, exponent
+
+
+def _increment(kept, remainder, half, sticky, sign, rounding):
+    """Whether rounding the dropped ``remainder`` (plus ``sticky``) away from zero bumps ``kept``."""
+    if rounding == "near_even":
+        return (remainder > half) | ((remainder == half) & (sticky | (kept & 1 == 1)))
+    if rounding == "near_maxMag":
+        return remainder >= half
+    inexact = (remainder != 0) | sticky
+    if rounding == "min":
+        return sign & inexact
+    if rounding == "max":
+        return ~sign & inexact
+    return np.zeros_like(sticky)
+
+
+def round_pack(sign, exponent, significand, sticky, fmt, rounding="near_even", tininess="before"):
+    """Rounds ``significand * 2**(exponent - precision - 1)`` (plus ``sticky``) into ``fmt``.
+
+    ``significand`` has its leading one at bit ``precision + 1``, so two bits below the result
+    precision are exact and ``sticky`` tells whether anything nonzero lies below them.  Returns the
+    IEEE bits and the flags.
+    """
+    if rounding not in ROUNDING:
+        raise ValueError(f"Unknown rounding mode {rounding!r}; expected one of {sorted(ROUNDING)}")
+    exponent_bits, precision, bias = _layout(fmt)
+    biased = exponent + bias
+    # Below the normal range the significand is shifted into a subnormal, everything past it sticky.
+    drop = 2 + np.clip(1 - biased, 0, precision + 3)
+    kept = significand >> drop
+    remainder = significand & ((1 << drop) - 1)
+    half = 1 << (drop - 1)
+    inexact = (remainder != 0) | sticky
+    if rounding == "odd":
+        kept = kept | inexact
+    else:
+        kept = kept + _increment(kept, remainder, half, sticky, sign, rounding)
+    # A carry out of the significand runs into the exponent field, also from a subnormal.
+    bits = ((np.maximum(biased, 1) - 1) << (precision - 1)) + kept
+
+    infinity = ((1 << exponent_bits) - 1) << (precision - 1)
+    overflow = bits >= infinity
+    if rounding in ("near_even", "near_maxMag"):
+        to_infinity = np.ones_like(sign)
+    elif rounding == "min":
+        to_infinity = sign
+    elif rounding == "max":
+        to_infinity = ~sign
+    else:
+        to_infinity = np.zeros_like(sign)
+    bits = np.where(overflow, np.where(to_infinity, infinity, infinity - 1), bits)
+
+    if tininess == "before":
+        tiny = biased < 1
+    else:
+        # Tiny unless rounding with an unbounded exponent carries up to the smallest normal.
+        unbounded = significand >> 2
+        if rounding == "odd":
+            carried = np.zeros_like(sign)
+        else:
+            carried = unbounded + _increment(unbounded, significand & 3, 2, sticky, sign, rounding) >= 1 << precision
+        tiny = (biased < 0) | ((biased == 0) & ~carried)
+    flags = (
+        np.where(inexact, FLAG_INEXACT, 0)
+        | np.where(tiny & inexact, FLAG_UNDERFLOW, 0)
+        | np.where(overflow, FLAG_OVERFLOW | FLAG_INEXACT, 0)
+    )
+    return bits | (sign.astype(np.int64) << (exponent_bits + precision - 1)), flags
+
+
+def exact_quotient(x, d, precision):
+    """``floor(x * 2**(precision + 2) / d)`` of significands with the leading one at ``precision - 1``,
+    with the sticky bit of the remainder."""
+    quotient, remainder = np.divmod(x << (precision + 2), d)
+    return quotient, remainder != 0, np.ones(x.shape, dtype=bool)
+
+
+def exact_root(x, precision):
+    """``floor(sqrt(x * 2**(precision + 3)))`` for ``x`` in ``[2**(precision - 1), 2**(precision + 1))``,
+    with the sticky bit of the remainder."""
+    radicand = x << (precision + 3)
+    root = np.sqrt(radicand.astype(np.float64)).astype(np.int64)
+    # The float root is within one unit; fix it up in exact integers.
+    root = np.where(root * root > radicand, root - 1, root)
+    root = np.where((root + 1) * (root + 1) <= radicand, root + 1, root)
+    return root, root * root != radicand, np.ones(x.shape, dtype=bool)
+
+
+def table_quotient(lut, spec):
+    """A ``quotient`` that runs the significands through ``simulate_division`` with ``lut``.
+
+    The recurrence only narrows the remainder to the digit set's bound, so the quotient is corrected
+    by one unit at most, as the RTL does with the sign of the final residual.
+    """
+    from .simulate import simulate_division
+
+    if spec.operation != "division":
+        raise ValueError(f"{spec.name} selects {spec.operation} digits")
+    log_radix = spec.radix.bit_length() - 1
+
+    def quotient(x, d, precision):
+        iterations = -(-(precision + 2) // log_radix) + 1
+        result = simulate_division(lut, spec, x, d, iterations, precision)
+        # result approximates x * r**(iterations - 1) / d
+        scale = log_radix * (iterations - 1)
+        q = result.result
+        remainder = (x << scale) - q * d
+        q, remainder = np.where(remainder < 0, q - 1, q), np.where(remainder < 0, remainder + d, remainder)
+        q, remainder = np.where(remainder >= d, q + 1, q), np.where(remainder >= d, remainder - d, remainder)
+        extra = scale - precision - 2
+        sticky = (remainder != 0) | (q & ((1 << extra) - 1) != 0)
+        return q >> extra, sticky, result.ok
+
+    return quotient
+
+
+def table_root(lut, spec):
+    """A ``root`` that runs the radicands through ``simulate_sqrt`` with ``lut``; see ``table_quotient``."""
+    from .simulate import simulate_sqrt
+
+    if spec.operation != "square_root":
+        raise ValueError(f"{spec.name} selects {spec.operation} digits")
+    log_radix = spec.radix.bit_length() - 1
+
+    def root(x, precision):
+        iterations = -(-(precision + 2) // log_radix) + 1
+        result = simulate_sqrt(lut, spec, x, iterations, precision + 1)
+        # result approximates sqrt(x / 2**(precision + 1)) in units of 2**-fractional_bits
+        s = result.result >> (result.fractional_bits - precision - 2)
+        radicand = x << (precision + 3)
+        s = np.where(s * s > radicand, s - 1, s)
+        s = np.where((s + 1) * (s + 1) <= radicand, s + 1, s)
+        return s, s * s != radicand, result.ok
+
+    return root
+
+
+def divide(a, b, fmt, rounding="near_even", tininess="before", quotient=exact_quotient):
+    """Returns ``(bits, flags, ok)`` of ``a / b``; ``ok`` is the quotient's convergence check."""
+    _, precision, _ = _layout(fmt)
+    sign_a, class_a, significand_a, exponent_a = _unpack(a, fmt)
+    sign_b, class_b, significand_b, exponent_b = _unpack(b, fmt)
+    sign = sign_a ^ sign_b
+    finite = ~(class_a["nan"] | class_a["inf"] | class_a["zero"] | class_b["nan"] | class_b["inf"] | class_b["zero"])
+
+    q, sticky, ok = quotient(significand_a[finite], significand_b[finite], precision)
+    # A quotient of significands at or above one has a bit more than needed.
+    wide = q >> (precision + 2) != 0
+    sticky = sticky | (wide & (q & 1 == 1))
+    q = np.where(wide, q >> 1, q)
+    exponent = exponent_a[finite] - exponent_b[finite] - 1 + wide
+    packed, packed_flags = round_pack(sign[finite], exponent, q, sticky, fmt, rounding, tininess)
+    bits, flags = np.zeros(sign.shape, dtype=np.int64), np.zeros(sign.shape, dtype=np.int64)
+    converged = np.ones(sign.shape, dtype=bool)
+    bits[finite], flags[finite], converged[finite] = packed, packed_flags, ok
+
+    exponent_bits = FORMATS[fmt][0]
+    infinity = ((1 << exponent_bits) - 1) << (precision - 1)
+    signed = sign.astype(np.int64) << (exponent_bits + precision - 1)
+    nan = class_a["nan"] | class_b["nan"]
+    invalid = (class_a["zero"] & class_b["zero"]) | (class_a["inf"] & class_b["inf"])
+    special_bits = np.select(
+        [nan | invalid, class_a["inf"] | class_b["zero"]], [default_nan(fmt), signed | infinity], signed
+    )
+    special_flags = np.select(
+        [class_a["snan"] | class_b["snan"] | (invalid & ~nan), class_b["zero"] & ~class_a["inf"] & ~nan],
+        [FLAG_INVALID, FLAG_INFINITE],
+        0,
+    )
+    return np.where(finite, bits, special_bits), np.where(finite, flags, special_flags), converged
+
+
+def sqrt(a, fmt, rounding="near_even", tininess="before", root=exact_root):
+    """Returns ``(bits, flags, ok)`` of the square root of ``a``; ``ok`` is the root's convergence check."""
+    _, precision, _ = _layout(fmt)
+    sign, classes, significand, exponent = _unpack(a, fmt)
+    finite = ~(classes["nan"] | classes["inf"] | classes["zero"] | sign)
+
+    # An even exponent halves exactly; an odd one moves a bit into the significand.
+    odd = exponent[finite] & 1 == 1
+    s, sticky, ok = root(significand[finite] << odd, precision)
+    packed, packed_flags = round_pack(
+        np.zeros(s.shape, dtype=bool), (exponent[finite] - odd) >> 1, s, sticky, fmt, rounding, tininess
+    )
+    bits, flags = np.zeros(sign.shape, dtype=np.int64), np.zeros(sign.shape, dtype=np.int64)
+    converged = np.ones(sign.shape, dtype=bool)
+    bits[finite], flags[finite], converged[finite] = packed, packed_flags, ok
+
+    invalid = sign & ~classes["zero"] & ~classes["nan"]
+    # Zeros and +inf are their own roots.
+    special_bits = np.where(classes["nan"] | invalid, default_nan(fmt), np.asarray(a, dtype=np.int64))
+    special_flags = np.where(classes["snan"] | invalid, FLAG_INVALID, 0)
+    return np.where(finite, bits, special_bits), np.where(finite, flags, special_flags), converged
+
+
+def operation(op, operands, fmt, rounding="near_even", tininess="before", significands=None):
+    """``divide`` or ``sqrt`` of the operand arrays; ``significands`` replaces the exact quotient or root."""
+    if op == "div":
+        return divide(*operands, fmt, rounding, tininess, significands or exact_quotient)
+    return sqrt(*operands, fmt, rounding, tininess, significands or exact_root)
+
+
+def input_count(fmt, op):
+    return 1 << (fmt * (2 if op == "div" else 1))
+
+
+def inputs(fmt, op, start, stop):
+    """Operands ``start`` to ``stop`` of the whole input space, dividend-major for division."""
+    index = np.arange(start, stop, dtype=np.int64)
+    if op == "div":
+        return index >> fmt, index & ((1 << fmt) - 1)
+    return (index,)
+
+
+def random_inputs(fmt, op, count, seed=0):
+    """Uniform bit patterns, a quarter of them with an exponent next to zero, one or the extremes."""
+    exponent_bits, precision, bias = _layout(fmt)
+    rng = np.random.default_rng(seed)
+    exponents = np.array([0, 1, 2, bias - 1, bias, bias + 1, (1 << exponent_bits) - 2, (1 << exponent_bits) - 1])
+    fractions = np.array([0, 1, (1 << (precision - 1)) - 1, 1 << (precision - 2)])
+    operands = []
+    for _ in range(2 if op == "div" else 1):
+        bits = rng.integers(0, 1 << fmt, count, dtype=np.int64)
+        edge = rng.random(count) < 0.25
+        field = rng.choice(exponents, count)
+        fraction = np.where(rng.random(count) < 0.5, rng.choice(fractions, count), bits & ((1 << (precision - 1)) - 1))
+        edged = (bits >> (fmt - 1) << (fmt - 1)) | (field << (precision - 1)) | fraction
+        operands.append(np.where(edge, edged, bits))
+    return tuple(operands)
+
+
+def format_vectors(columns, fmt):
+    """``testfloat_gen`` lines of the operand and result columns followed by the flags, as bytes."""
+    widths = [fmt // 4] * (len(columns) - 1) + [2]
+    columns = [np.asarray(column, dtype=np.int64) for column in columns]
+    count = columns[0].size
+    lines = np.empty((count, sum(widths) + len(widths)), dtype=np.uint8)
+    position = 0
+    for column, width in zip(columns, widths):
+        for nibble in range(width):
+            lines[:, position] = _HEX[(column >> (4 * (width - 1 - nibble))) & 15]
+            position += 1
+        lines[:, position] = ord(" ")
+        position += 1
+    lines[:, -1] = ord("\n")
+    return lines.tobytes()
+
+
+def stream(file, fmt, op, rounding, tininess, chunks):
+    """Writes the vectors of every operand chunk to the binary ``file``; returns the count."""
+    written = 0
+    for operands in chunks:
+        bits, flags, _ = operation(op, operands, fmt, rounding, tininess)
+        file.write(format_vectors([*operands, bits, flags], fmt))
+        written += operands[0].size
+    return written
+
+
+def check(fmt, op, significands, rounding, tininess, chunks):
+    """Compares a table's results against the reference; returns counts and a few mismatches."""
+    summary = {"operands": 0, "mismatches": 0, "unconverged": 0, "examples": []}
+    for operands in chunks:
+        expected, expected_flags, _ = operation(op, operands, fmt, rounding, tininess)
+        bits, flags, ok = operation(op, operands, fmt, rounding, tininess, significands)
+        wrong = (bits != expected) | (flags != expected_flags)
+        summary["operands"] += operands[0].size
+        summary["mismatches"] += int(wrong.sum())
+        summary["unconverged"] += int((~ok).sum())
+        for i in np.flatnonzero(wrong)[: 8 - len(summary["examples"])]:
+            summary["examples"].append(
+                ([int(operand[i]) for operand in operands], int(bits[i]), int(flags[i]), int(expected[i]))
+            )
+    return summary
+
+
+def _chunks(fmt, op, args):
+    if args.exhaustive:
+        total = input_count(fmt, op)
+        return (inputs(fmt, op, start, min(start + CHUNK, total)) for start in range(0, total, CHUNK))
+    return (
+        random_inputs(fmt, op, min(CHUNK, args.count - start), args.seed + start // CHUNK)
+        for start in range(0, args.count, CHUNK)
+    )
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Correctly rounded f16/f32 division and square-root vectors.")
+    parser.add_argument("--format", type=int, choices=sorted(FORMATS), default=16)
+    parser.add_argument("--op", choices=["div", "sqrt"], default="div")
+    parser.add_argument("--rounding", nargs="+", choices=sorted(ROUNDING) + ["all"], default=["near_even"])
+    parser.add_argument("--tininess", nargs="+", choices=sorted(TININESS) + ["all"], default=["before"])
+    inputs_group = parser.add_mutually_exclusive_group()
+    inputs_group.add_argument("--exhaustive", action="store_true", help="every operand (pair) of the format")
+    inputs_group.add_argument("--count", type=int, default=1 << 16, help="random operands (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="vector file (default: stdout)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--check", choices=sorted(FIGURE_SCRIPTS), help="compare a script table's results")
+    target.add_argument("--check-spec", nargs="+", metavar="FIELD=VALUE", help="compare a table's results")
+    args = parser.parse_args(argv)
+
+    if args.exhaustive and input_count(args.format, args.op) > 1 << 36:
+        parser.error(f"f{args.format} {args.op} has too many operands for --exhaustive")
+    roundings = sorted(ROUNDING, key=ROUNDING.get) if "all" in args.rounding else args.rounding
+    tininesses = sorted(TININESS, key=TININESS.get) if "all" in args.tininess else args.tininess
+
+    if not (args.check or args.check_spec):
+        if len(roundings) != 1 or len(tininesses) != 1:
+            parser.error("vectors are written for one rounding mode and one tininess at a time")
+        file = open(args.out, "wb") if args.out else sys.stdout.buffer
+        try:
+            stream(file, args.format, args.op, roundings[0], tininesses[0], _chunks(args.format, args.op, args))
+        except BrokenPipeError:
+            return 0
+        finally:
+            if args.out:
+                file.close()
+        return 0
+
+    from .exhaustive import target_lut
+
+    spec, lut = target_lut(args.check or parse_assignments(args.check_spec))
+    if (spec.operation == "division") != (args.op == "div"):
+        parser.error(f"{spec.name} selects {spec.operation} digits, not {args.op}")
+    significands = table_quotient(lut, spec) if args.op == "div" else table_root(lut, spec)
+    failed = False
+    for rounding in roundings:
+        for tininess in tininesses:
+            summary = check(args.format, args.op, significands, rounding, tininess, _chunks(args.format, args.op, args))
+            print(
+                f"{spec.name} f{args.format}_{args.op} {rounding} tininess {tininess}: {summary['operands']} operands, "
+                f"{summary['mismatches']} mismatches, {summary['unconverged']} unconverged"
+            )
+            for operands, bits, flags, expected in summary["examples"]:
+                hexed = " ".join(f"{operand:0{args.format // 4}X}" for operand in operands)
+                print(f"  {hexed} -> {bits:0{args.format // 4}X} {flags:02X}, expected {expected:0{args.format // 4}X}")
+            failed |= summary["mismatches"] > 0 or summary["unconverged"] > 0
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+"""Incremental re-evaluation of a target after one boundary or seam is edited.
+
+The pipeline derives a table from scratch: every condition over the whole grid, then overlap
+resolution and verification of every column.  ``IncrementalTable`` keeps what those stages
+derived per column -- the ``generate`` digits and overlap masks, the raw digit bounds, the resolved
+intervals and the containment report of ``verify_resolution`` -- and a dependency map from every
+boundary, i.e. one ``(case, digit)`` condition, to the columns its case lists and the mask it gave
+there.  ``update`` fingerprints the conditions and ``remove_overlaps`` again and re-evaluates
+
+* every changed boundary on its own columns only; the columns where its mask changed are
+  regenerated, resolved and checked again;
+* when ``remove_overlaps`` changed (a seam moved), the resolution of every other column from its
+  stored bounds; the columns whose intervals come out different are reported.
+
+The affected columns are evaluated together, by one call of each stage on the grid restricted to
+them, and the results split per column.
+
+``store`` patches the ``generate``/``resolve`` results in the task cache under the keys the driver
+computes for the sources on disk, so the next ``python -m drtools run`` only verifies, plots and
+exports again.  Edits made in memory with ``edit``/``edit_seam`` do not match those sources and are
+never stored.  The command line keeps the state of every target under ``<cache-dir>/incremental``
+and brings it up to date with the script as edited on disk:
+
+    python -m drtools.incremental --only radix4_qds_optimized
+    python -m drtools.incremental --spec operation=square_root radix=4 x_bits=5 t_bits=8 --no-store
+"""
+
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import types
+
+import numpy as np
+
+from . import tables
+
+STATE_VERSION = 1
+
+
+def _code_digest(digest, code):
+    # Line numbers and file names are left out, so moving a lambda does not change it.
+    digest.update(code.co_code)
+    digest.update(repr((code.co_names, code.co_varnames, code.co_freevars)).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _code_digest(digest, const)
+        else:
+            digest.update(repr(const).encode())
+
+
+def _global_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _feed(digest, value, seen):
+    if isinstance(value, types.FunctionType):
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        _code_digest(digest, value.__code__)
+        for cell in value.__closure__ or ():
+            try:
+                _feed(digest, cell.cell_contents, seen)
+            except ValueError:
+                digest.update(b"<empty cell>")
+        for default in (value.__defaults__ or ()) + tuple(sorted((value.__kwdefaults__ or {}).items())):
+            _feed(digest, default, seen)
+        for name in sorted(_global_names(value.__code__)):
+            if name in value.__globals__:
+                digest.update(name.encode())
+                _feed(digest, value.__globals__[name], seen)
+    elif isinstance(value, types.ModuleType):
+        digest.update(value.__name__.encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.shape, value.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    else:
+        digest.update(repr(value).encode())
+
+
+def fingerprint(function):
+    """A digest of a function's code, closure, defaults and the globals it reads, functions followed."""
+    digest = hashlib.sha256()
+    _feed(digest, function, set())
+    return digest.hexdigest()
+
+
+def restrict(conditions, values):
+    """``conditions`` keeping only the columns in ``values``, and only the cases that list one."""
+    values = set(values)
+    restricted = {}
+    for name, case in conditions.items():
+        key = "D_values" if "D_values" in case else "S_values"
+        kept = [x for x in case[key] if x in values]
+        if kept:
+            restricted[name] = {**case, key: kept}
+    return restricted
+
+
+def _replace_boundary(conditions, case_name, digit, condition):
+    case = conditions[case_name]
+    key = "q_conditions" if "q_conditions" in case else "s_conditions"
+    if digit not in [d for d, _ in case[key]]:
+        raise KeyError(f"Case {case_name!r} has no boundary for digit {digit}")
+    edited = [(d, condition if d == digit else c) for d, c in case[key]]
+    return {**conditions, case_name: {**case, key: edited}}
+
+
+class IncrementalTable:
+    """The derived state of one target, re-evaluated column by column as its conditions change."""
+
+    def __init__(self, target):
+        from .pipeline import load_target, target_name, target_spec
+
+        self.target = target
+        self.name = target_name(target)
+        self.edited = False
+        self.operation, self.X, self.T, conditions = load_target(target)
+        self.conditions = conditions
+        self.remove_overlaps = tables.overlap_policy(target_spec(target))
+        self.seam = fingerprint(self.remove_overlaps)
+        self.digits = np.full_like(self.X, np.nan, dtype=float)
+        self.overlaps = None
+        self.resolved = np.full_like(self.X, np.nan, dtype=float)
+        self.layouts = {}
+        self.boundaries = {}
+        self.columns = {}
+        for case_name, case in conditions.items():
+            self._track(case_name, case)
+        self._evaluate(self.order())
+
+    def __getstate__(self):
+        # Conditions and remove_overlaps are functions; they are loaded again from the sources.
+        return {k: v for k, v in self.__dict__.items() if k not in ("conditions", "remove_overlaps")}
+
+    def order(self):
+        """Every column value, in the order the conditions list them."""
+        return [x for values, _ in self.layouts.values() for x in values]
+
+    def _column(self, x):
+        return int(np.flatnonzero(self.X[0] == x)[0])
+
+    def _track(self, case_name, case):
+        values, digit_conditions = tables.case_fields(case)
+        if set(values) & {x for name, (other, _) in self.layouts.items() if name != case_name for x in other}:
+            raise ValueError(f"{self.name}: case {case_name!r} lists a column another case lists")
+        self.layouts[case_name] = (tuple(int(x) for x in values), tuple(digit for digit, _ in digit_conditions))
+        columns = [self._column(x) for x in values]
+        for digit, condition in digit_conditions:
+            mask = condition(self.X[:, columns], self.T[:, columns])
+            self.boundaries[(case_name, digit)] = (fingerprint(condition), mask)
+
+    def _evaluate(self, values):
+        """Regenerates, resolves and checks the columns ``values`` from the current conditions."""
+        if not values:
+            return {"cells": 0, "holes": 0, "invalid": 0}
+        columns = [self._column(x) for x in values]
+        X, T = self.X[:, columns], self.T[:, columns]
+        conditions = restrict(self.conditions, values)
+        self.digits[:, columns] = tables.apply_conditions(X, T, conditions)
+        overlaps = tables.detect_overlaps(X, T, conditions)
+        if self.overlaps is None:
+            self.overlaps = tuple(np.zeros_like(self.X, dtype=bool) for _ in overlaps)
+        for overlap, patch in zip(self.overlaps, overlaps):
+            overlap[:, columns] = patch
+        for x, bounds in tables.column_bounds(X, T, conditions):
+            self.columns[x] = {"bounds": bounds}
+        return self._resolve(values)
+
+    def _resolve(self, values):
+        """Resolves and checks the columns ``values`` from their stored bounds; returns their report."""
+        columns = [self._column(x) for x in values]
+        X, T = self.X[:, columns], self.T[:, columns]
+        bounds = [(x, self.columns[x]["bounds"]) for x in values]
+        digits, intervals, unresolved = tables.resolve_columns(X, T, bounds, self.remove_overlaps)
+        self.resolved[:, columns] = digits
+        counts = tables.verify_resolution(X, T, restrict(self.conditions, values), digits, axis=0)
+        for index, x in enumerate(values):
+            state = self.columns[x]
+            state["intervals"], state["unresolved"] = [], []
+            state["report"] = {field: int(count[index]) for field, count in counts.items()}
+        for interval in intervals:
+            self.columns[interval[0]]["intervals"].append(interval)
+        for pair in unresolved:
+            self.columns[pair[0]]["unresolved"].append(pair)
+        return {field: int(count.sum()) for field, count in counts.items()}
+
+    def update(self, conditions=None, remove_overlaps=None):
+        """Brings the state up to ``conditions``/``remove_overlaps``, by default the sources on disk.
+
+        Returns which boundaries changed, the columns regenerated and re-resolved, and the
+        containment report of the cells checked again.
+        """
+        from .pipeline import load_target, target_spec
+
+        if conditions is None:
+            operation, X, T, conditions = load_target(self.target)
+            if operation != self.operation or X.shape != self.X.shape or (X != self.X).any() or (T != self.T).any():
+                raise ValueError(f"{self.name}: the grid changed; build the table again")
+        if remove_overlaps is None:
+            remove_overlaps = tables.overlap_policy(target_spec(self.target))
+        self.conditions, self.remove_overlaps = conditions, remove_overlaps
+
+        affected, changed = set(), []
+        for case_name in list(self.layouts) + [name for name in conditions if name not in self.layouts]:
+            case = conditions.get(case_name)
+            old_values, old_digits = self.layouts.get(case_name, ((), ()))
+            if case is None:
+                affected |= set(old_values)
+                del self.layouts[case_name]
+                changed += [(case_name, digit) for digit in old_digits]
+                continue
+            values, digit_conditions = tables.case_fields(case)
+            if (tuple(values), tuple(digit for digit, _ in digit_conditions)) != (old_values, old_digits):
+                affected |= set(old_values) | set(values)
+                changed += [(case_name, digit) for digit, _ in digit_conditions]
+                self._track(case_name, case)
+                continue
+            columns = [self._column(x) for x in values]
+            for digit, condition in digit_conditions:
+                key = (case_name, digit)
+                digest = fingerprint(condition)
+                if digest == self.boundaries[key][0]:
+                    continue
+                changed.append(key)
+                mask = condition(self.X[:, columns], self.T[:, columns])
+                moved = (mask != self.boundaries[key][1]).any(axis=0)
+                affected |= {values[i] for i in np.flatnonzero(moved)}
+                self.boundaries[key] = (digest, mask)
+        self.boundaries = {key: value for key, value in self.boundaries.items() if key[0] in self.layouts}
+        for x in affected - set(self.order()):
+            # A column no case lists any more.
+            column = self._column(x)
+            self.digits[:, column] = self.resolved[:, column] = np.nan
+            for overlap in self.overlaps:
+                overlap[:, column] = False
+            del self.columns[x]
+        evaluated = [x for x in self.order() if x in affected]
+        report = self._evaluate(evaluated)
+
+        resolved = []
+        seam = fingerprint(remove_overlaps)
+        if seam != self.seam:
+            self.seam = seam
+            others = [x for x in self.order() if x not in affected]
+            before = {x: (self.columns[x]["intervals"], self.columns[x]["unresolved"]) for x in others}
+            self._resolve(others)
+            for x in others:
+                if (self.columns[x]["intervals"], self.columns[x]["unresolved"]) != before[x]:
+                    resolved.append(x)
+                    for field in report:
+                        report[field] += self.columns[x]["report"][field]
+        return {"boundaries": changed, "evaluated": evaluated, "resolved": resolved, **report}
+
+    def edit(self, case_name, digit, condition):
+        """Replaces the boundary of ``digit`` in ``case_name`` in memory; see ``update``."""
+        self.edited = True
+        return self.update(_replace_boundary(self.conditions, case_name, digit, condition), self.remove_overlaps)
+
+    def edit_seam(self, remove_overlaps):
+        """Replaces ``remove_overlaps`` in memory; see ``update``."""
+        self.edited = True
+        return self.update(self.conditions, remove_overlaps)
+
+    def generate_result(self):
+        """What ``drtools.pipeline.generate`` returns for the current conditions."""
+        return {
+            "name": self.name,
+            "operation": self.operation,
+            "x": self.X,
+            "t": self.T,
+            "digits": self.digits.copy(),
+            "overlaps": tuple(overlap.copy() for overlap in self.overlaps),
+        }
+
+    def resolve_result(self):
+        """What ``drtools.pipeline.resolve`` returns for the current conditions."""
+        order = self.order()
+        return {
+            "digits": self.resolved.copy(),
+            "intervals": [interval for x in order for interval in self.columns[x]["intervals"]],
+            "unresolved": [pair for x in order for pair in self.columns[x]["unresolved"]],
+        }
+
+    def report(self):
+        """The containment report of ``verify_resolution`` over the whole table."""
+        return {
+            field: sum(state["report"][field] for state in self.columns.values())
+            for field in ("cells", "holes", "invalid")
+        }
+
+    def store(self, cache_dir, figures_dir):
+        """Patches the cached ``generate``/``resolve`` results of the target."""
+        from .pipeline import build_graph
+        from .tasks import store_result
+
+        if self.edited:
+            raise ValueError(f"{self.name} was edited in memory; its results do not match the sources")
+        graph = build_graph("resolve-overlaps", {"targets": [self.target], "figures_dir": figures_dir})
+        store_result(graph, f"generate:{self.name}", cache_dir, self.generate_result())
+        store_result(graph, f"resolve:{self.name}", cache_dir, self.resolve_result())
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            pickle.dump((STATE_VERSION, drtools_fingerprint(), self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path, target):
+        """The saved state of ``target`` brought up to date with the sources, or ``None`` if unusable."""
+        if not os.path.exists(path):
+            return None, None
+        with open(path, "rb") as f:
+            version, sources, table = pickle.load(f)
+        if version != STATE_VERSION or sources != drtools_fingerprint() or table.target != target:
+            return None, None
+        try:
+            return table, table.update()
+        except ValueError:
+            return None, None
+
+
+def drtools_fingerprint():
+    """The package sources; state saved by other code is rebuilt."""
+    from .tasks import source_fingerprint
+
+    return source_fingerprint(("drtools",))
+
+
+def main(argv=None):
+    from .config import DEFAULTS, parse_assignments
+    from .pipeline import target_name
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Re-evaluate only the columns an edited boundary or seam affects.")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--cache-dir", default=DEFAULTS["cache_dir"], help="task result cache (default: %(default)s)")
+    parser.add_argument("--figures-dir", default=DEFAULTS["figures_dir"], help="output root (default: %(default)s)")
+    parser.add_argument("--no-store", action="store_true", help="do not patch the task cache")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the saved state")
+    args = parser.parse_args(argv)
+
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    failed = False
+    for target in targets or list(FIGURE_SCRIPTS):
+        name = target_name(target)
+        path = os.path.join(args.cache_dir, "incremental", f"{name}.pkl")
+        table, update = (None, None) if args.rebuild else IncrementalTable.load(path, target)
+        if table is None:
+            table = IncrementalTable(target)
+            print(f"{name}: built, {len(table.columns)} columns")
+        else:
+            boundaries = ", ".join(f"{case}:{digit:+d}" for case, digit in update["boundaries"]) or "none"
+            print(
+                f"{name}: boundaries changed {boundaries}; {len(update['evaluated'])} columns regenerated, "
+                f"{len(update['resolved'])} re-resolved; {update['cells']} cells checked, "
+                f"{update['holes']} holes, {update['invalid']} invalid"
+            )
+        report = table.report()
+        print(f"  table: {report['cells']} cells, {report['holes']} holes, {report['invalid']} invalid")
+        failed |= report["holes"] > 0 or report["invalid"] > 0
+        table.save(path)
+        if not args.no_store:
+            table.store(args.cache_dir, args.figures_dir)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
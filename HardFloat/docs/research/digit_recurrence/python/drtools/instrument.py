@@ -0,0 +1,88 @@
+"""Opt-in instrumentation of the table pipeline.
+
+The script and ``drtools.tables`` functions take an optional ``stats`` argument.  When it is
+``None`` (the default) they run exactly as before, behind a single ``is not None`` test; when it
+is a ``Profile`` they report into it:
+
+* ``stats.phase(name)`` -- a context manager accumulating wall time and entry count per phase;
+* ``stats.count(name, n)`` -- integer counters (mask evaluations, cells assigned, ...);
+* ``stats.event(name, **fields)`` -- individual occurrences worth listing, e.g. an overlap width
+  ``transform`` does not support.
+
+``Profile.summary()`` returns all of it, plus the peak traced memory when requested, as a
+JSON-serialisable dict.  Code without a ``stats`` parameter of its own (the task functions of
+``drtools.pipeline``) picks up the profile installed with ``activate``.
+"""
+
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_ACTIVE = None
+
+
+class Profile:
+    def __init__(self, track_memory=False):
+        self.phases = {}
+        self.counters = {}
+        self.events = []
+        self.track_memory = track_memory
+        self._started_tracing = False
+        self._start = time.perf_counter()
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds, calls = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (seconds + time.perf_counter() - start, calls + 1)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def event(self, name, **fields):
+        self.events.append({"event": name, **fields})
+
+    def summary(self):
+        summary = {
+            "seconds": time.perf_counter() - self._start,
+            "phases": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.phases.items()},
+            "counters": dict(self.counters),
+            "events": list(self.events),
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+        if self.track_memory and tracemalloc.is_tracing():
+            summary["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+        return summary
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+
+def phase(stats, name):
+    """``stats.phase(name)``, or a no-op context when ``stats`` is ``None``."""
+    return nullcontext() if stats is None else stats.phase(name)
+
+
+def active():
+    """Returns the profile installed with ``activate``, or ``None``."""
+    return _ACTIVE
+
+
+@contextmanager
+def activate(profile):
+    global _ACTIVE
+    previous, _ACTIVE = _ACTIVE, profile
+    try:
+        yield profile
+    finally:
+        _ACTIVE = previous
+        profile.close()
@@ -0,0 +1,140 @@
+"""Lint of generated selector tables.
+
+A NaN inside a divisor column of a resolved table becomes a ``BitPat.dontCare`` in the Scala decoder,
+so the checks here look for everything that can silently reach the RTL:
+
+* ``hole`` -- an unassigned cell of a column in use that some state can reach (see
+  ``drtools.regions.reachable_spans``), or that lies between assigned cells;
+* ``unresolved_overlap`` -- adjacent digit intervals still overlapping because ``transform`` could
+  not handle their width;
+* ``invalid`` -- a cell whose digit the conditions do not allow there;
+* ``non_monotone`` -- a digit smaller than the one below it (larger, for negative divisors);
+* ``out_of_range`` -- an assigned cell the truncated estimate can never produce, or estimates the
+  estimate can produce but the ``t_bits`` table cannot hold.
+
+Coordinates are printed in the scripts' ``binary_formatter`` notation.
+
+    python -m drtools.lint                        # every script target
+    python -m drtools.lint --spec x_bits=6 t_bits=9
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from . import tables
+from .regions import estimate_range, reachable_cells
+
+
+def _violation(spec, kind, x, t, detail):
+    return {
+        "kind": kind,
+        "x": None if x is None else int(x),
+        "t": None if t is None else int(t),
+        "x_label": None if x is None else spec.x_label(x),
+        "t_label": None if t is None else spec.t_label(t),
+        "detail": detail,
+    }
+
+
+def _cells(spec, kind, mask, X, T, detail):
+    rows, columns = np.nonzero(mask)
+    return [_violation(spec, kind, X[row, column], T[row, column], detail) for row, column in zip(rows, columns)]
+
+
+def lint_table(spec, X, T, digits, conditions, intervals=(), unresolved=(), overflow=True):
+    """Returns the violations of ``digits``; ``intervals`` and ``unresolved`` come from ``resolve_overlaps``.
+
+    The checks are local to each column, so a table may be linted a few columns at a time; only the
+    estimate overflow, skipped when ``overflow`` is false, concerns the table as a whole.
+    """
+    values = [x for case in conditions.values() for x in tables.case_fields(case)[0]]
+    in_use = np.isin(X, values)
+    assigned = ~np.isnan(digits)
+    violations = []
+
+    covered = np.zeros_like(assigned)
+    allowed = np.zeros_like(assigned)
+    for case in conditions.values():
+        column_values, digit_conditions = tables.case_fields(case)
+        x_mask = np.isin(X, column_values)
+        for digit, condition in digit_conditions:
+            mask = x_mask & condition(X, T)
+            covered |= mask
+            allowed |= mask & (digits == digit)
+
+    # Holes: unassigned but reachable or selectable, or with assigned cells both above and below in the column.
+    below = np.maximum.accumulate(assigned, axis=0)
+    above = np.maximum.accumulate(assigned[::-1], axis=0)[::-1]
+    holes = in_use & ~assigned & (reachable_cells(spec, X, T) | covered | (below & above))
+    violations += _cells(spec, "hole", holes, X, T, "no digit")
+
+    for x, upper, lower in unresolved:
+        ranges = {digit: (low, high) for column, digit, low, high in intervals if column == x}
+        low, high = ranges[upper][0], ranges[lower][1]
+        detail = f"digits {upper} and {lower} overlap up to {spec.t_label(high)}"
+        violations.append(_violation(spec, "unresolved_overlap", x, low, detail))
+
+    violations += _cells(spec, "invalid", assigned & ~allowed, X, T, "digit not allowed here")
+
+    # Non-monotone: compare each assigned cell with the nearest assigned cell below it.
+    rows = np.arange(X.shape[0])[:, None]
+    last = np.maximum.accumulate(np.where(assigned, rows, -1), axis=0)
+    previous = np.vstack([np.full((1, X.shape[1]), -1), last[:-1]])
+    has_previous = assigned & (previous >= 0)
+    previous_digit = np.take_along_axis(digits, np.maximum(previous, 0), axis=0)
+    direction = np.where(X >= 0, 1, -1)
+    decreasing = has_previous & in_use & (direction * (digits - previous_digit) < 0)
+    violations += _cells(spec, "non_monotone", decreasing, X, T, "digit order reverses")
+
+    lowest, highest = estimate_range(spec)
+    unreachable = assigned & in_use & ((T < lowest) | (T > highest))
+    detail = f"estimates span {spec.t_label(lowest)}..{spec.t_label(highest)}"
+    violations += _cells(spec, "out_of_range", unreachable, X, T, detail)
+    if overflow and (lowest < spec.t_range[0] or highest > spec.t_range[-1]):
+        detail = f"estimates {lowest}..{highest} exceed the {spec.t_bits}-bit table"
+        violations.append(_violation(spec, "out_of_range", None, None, detail))
+    return violations
+
+
+def lint_target(target):
+    """Resolves the table of a script name or spec dict and lints it."""
+    from .pipeline import load_target, target_spec
+
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    # The lint reports the overlaps remove_overlaps cannot handle, so it need not print them.
+    digits, intervals, unresolved = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec), log=None)
+    return lint_table(spec, X, T, digits, conditions, intervals, unresolved)
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .pipeline import target_name
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Lint generated selector tables.")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--limit", type=int, default=20, help="violations listed per target (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    failed = False
+    for target in targets or list(FIGURE_SCRIPTS):
+        violations = lint_target(target)
+        kinds = {}
+        for violation in violations:
+            kinds[violation["kind"]] = kinds.get(violation["kind"], 0) + 1
+        summary = ", ".join(f"{count} {kind}" for kind, count in sorted(kinds.items())) or "clean"
+        print(f"{target_name(target)}: {summary}")
+        for violation in violations[: args.limit]:
+            x, t = violation["x_label"] or "-", violation["t_label"] or "-"
+            print(f"  {violation['kind']:<18}  x={x:<10}  t={t:<12}  {violation['detail']}")
+        failed |= bool(violations)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
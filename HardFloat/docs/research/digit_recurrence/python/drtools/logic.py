@@ -0,0 +1,91 @@
+"""Two-level logic minimization and cost estimates for selector truth tables.
+
+A truth table is given by its on-set and don't-care set of input minterms (integers, bit ``i`` is
+input ``i``).  ``minimize`` returns a sum of products as a list of cubes ``(value, mask)``: the
+inputs set in ``mask`` appear as literals, with the polarity given by ``value``.  The prime
+implicants come from Quine-McCluskey merging and the cover from the essential primes followed by
+a greedy pick, which is what Chisel's ``QMCMinimizer`` does up to the order of ties.
+
+``sop_cost`` counts two-input gates without sharing between products and takes both polarities of
+every input as free, as they are for register outputs.
+"""
+
+import math
+
+import numpy as np
+
+
+def minimize(on, dc=(), n=None):
+    """Returns a minimal-ish sum of products covering ``on`` and no minterm outside ``on | dc``."""
+    on = set(on)
+    if not on:
+        return []
+    care = on | set(dc)
+    if n is None:
+        n = max(care).bit_length()
+    full = (1 << n) - 1
+    if len(care) == 1 << n:
+        return [(0, 0)]
+
+    # Implicants are keyed ``mask << n | value`` so a whole merging level is one sorted array.
+    primes = []
+    keys = np.array(sorted(care), dtype=np.int64) | full << n
+    while keys.size:
+        merged = np.zeros(keys.size, dtype=bool)
+        following = []
+        for i in range(n):
+            bit = 1 << i
+            partner = keys | bit
+            position = np.minimum(np.searchsorted(keys, partner), keys.size - 1)
+            pairs = (keys >> n & bit != 0) & (keys & bit == 0) & (keys[position] == partner)
+            merged[pairs] = True
+            merged[position[pairs]] = True
+            following.append(keys[pairs] - (bit << n))
+        primes += [(int(key) & full, int(key) >> n) for key in keys[~merged]]
+        keys = np.unique(np.concatenate(following))
+
+    minterms = np.array(sorted(on), dtype=np.int64)
+    covering = {int(minterm): [] for minterm in minterms}
+    for index, (value, mask) in enumerate(primes):
+        for minterm in minterms[minterms & mask == value]:
+            covering[int(minterm)].append(index)
+
+    chosen = {indices[0] for indices in covering.values() if len(indices) == 1}
+    uncovered = {minterm for minterm, indices in covering.items() if not chosen.intersection(indices)}
+    while uncovered:
+        counts = {}
+        for minterm in uncovered:
+            for index in covering[minterm]:
+                counts[index] = counts.get(index, 0) + 1
+        best = max(counts, key=lambda index: (counts[index], -bin(primes[index][1]).count("1"), -index))
+        chosen.add(best)
+        uncovered = {minterm for minterm in uncovered if best not in covering[minterm]}
+    return sorted((primes[index] for index in chosen), key=lambda cube: (cube[1], cube[0]))
+
+
+def support(cubes):
+    """Mask of the inputs the sum of products depends on."""
+    result = 0
+    for _, mask in cubes:
+        result |= mask
+    return result
+
+
+def sop_cost(cubes):
+    """Returns ``{"terms", "literals", "gates", "depth"}`` of a sum of products in two-input gates."""
+    literals = [bin(mask).count("1") for _, mask in cubes]
+    if not cubes or (len(cubes) == 1 and literals[0] <= 1):
+        return {"terms": len(cubes), "literals": sum(literals), "gates": 0, "depth": 0}
+    gates = sum(max(count - 1, 0) for count in literals) + len(cubes) - 1
+    depth = math.ceil(math.log2(max(max(literals), 1))) + math.ceil(math.log2(len(cubes)))
+    return {"terms": len(cubes), "literals": sum(literals), "gates": gates, "depth": depth}
+
+
+def format_cube(value, mask, n):
+    """Renders a cube as a ``BitPat`` string, most significant input first."""
+    return "b" + "".join("?" if not mask >> i & 1 else str(value >> i & 1) for i in reversed(range(n)))
+
+
+def truth_table_lines(rows, n):
+    """``TruthTable`` entries ``b<input> -> b<outputs>`` of ``{minterm: "01?"}`` rows."""
+    return [f"{format_cube(minterm, (1 << n) - 1, n)} -> b{outputs}" for minterm, outputs in sorted(rows.items())]
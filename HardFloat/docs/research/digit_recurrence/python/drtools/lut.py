@@ -0,0 +1,80 @@
+"""Dense lookup tables compiled from generated selector tables.
+
+``compile_lut`` flattens a digit grid into an int8 array indexed like ``encodeLutInput`` in the
+RTL selectors::
+
+    index = (column - first_column) << t_bits | (estimate & (2**t_bits - 1))
+
+so with the 7-bit estimate of the RTL (``t_bits=7``) and the lowest truncated divisor as the first
+column the index is the decoder input itself.  ``select_digit`` then looks up whole arrays of
+``(column, estimate)`` pairs with one gather.  Masking the estimate is the signed wrap of the
+``t_bits``-bit estimate adder; for a spec without ``wrap`` an estimate outside the table, like a
+column outside it or a cell without a digit, selects ``HOLE``.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+HOLE = -128
+
+
+@dataclass
+class DigitLUT:
+    table: np.ndarray
+    first_column: int
+    columns: int
+    t_bits: int
+    wrap: bool = True
+
+    @property
+    def t_mask(self):
+        return (1 << self.t_bits) - 1
+
+
+def compile_lut(spec, X, T, digits):
+    """Compiles the ``(t, x)`` digit grid of ``spec`` into a ``DigitLUT``.
+
+    The table spans the columns between the first and the last one holding a digit.
+    """
+    assigned = ~np.isnan(digits)
+    used = np.flatnonzero(assigned.any(axis=0))
+    if used.size == 0:
+        raise ValueError("The table assigns no digit")
+    first, last = int(X[0, used[0]]), int(X[0, used[-1]])
+    t_low, t_high = -(2 ** (spec.t_bits - 1)), 2 ** (spec.t_bits - 1) - 1
+    if T.min() < t_low or T.max() > t_high:
+        raise ValueError(f"Estimates {int(T.min())}..{int(T.max())} do not fit {spec.t_bits} bits")
+
+    table = np.full((last - first + 1) << spec.t_bits, HOLE, dtype=np.int8)
+    lut = DigitLUT(table, first, last - first + 1, spec.t_bits, spec.wrap)
+    lut.table[lut_index(lut, X[assigned], T[assigned])] = digits[assigned].astype(np.int8)
+    return lut
+
+
+def lut_index(lut, columns, estimates):
+    """The ``encodeLutInput`` index of every ``(column, estimate)`` pair; columns must lie inside the table."""
+    columns = np.asarray(columns, dtype=np.int64)
+    estimates = np.asarray(estimates, dtype=np.int64)
+    return ((columns - lut.first_column) << lut.t_bits) | (estimates & lut.t_mask)
+
+
+def lookup_index(lut, columns, estimates):
+    """Returns ``(index, inside)``: the table index of every pair and whether the pair lies in the table.
+
+    Pairs outside the table get an index into its first column, so ``index`` is always safe to gather.
+    """
+    columns = np.asarray(columns, dtype=np.int64)
+    estimates = np.asarray(estimates, dtype=np.int64)
+    offsets = columns - lut.first_column
+    inside = (offsets >= 0) & (offsets < lut.columns)
+    if not lut.wrap:
+        half = 1 << (lut.t_bits - 1)
+        inside &= (estimates >= -half) & (estimates < half)
+    return (np.where(inside, offsets, 0) << lut.t_bits) | (estimates & lut.t_mask), inside
+
+
+def select_digit(lut, columns, estimates):
+    """Returns the int8 digits selected for arrays of divisor (or root) columns and signed estimates."""
+    index, inside = lookup_index(lut, columns, estimates)
+    return np.where(inside, lut.table[index], np.int8(HOLE))
@@ -0,0 +1,190 @@
+"""Per-cell safety margins of selector tables and a robustness score to rank them.
+
+The margin of a cell is how far, in estimate units, the residuals it can stand for stay inside the
+selection interval of its digit, over every divisor (or partial root) of its column.  A cell ``t``
+stands for ``t <= r w < t + estimate_error``; for the outermost digits the outward side is the
+residual bound itself and is not counted.  Negative margins are containment violations, cells
+without a digit or that no state reaches are NaN.  ``robustness`` condenses a map into the score
+``drtools sweep`` ranks its tables by.
+
+    python -m drtools.margins                                # every script, basic and resolved
+    python -m drtools.margins --spec operation=square_root x_bits=6 --out-dir /tmp/margins
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from . import tables
+from .regions import _sqrt_families, _sqrt_vertex
+from .scripts import FIGURE_SCRIPTS
+
+
+def division_margins(spec, X, T, digits, values):
+    """Vectorised margins of a division table; ``values`` are the divisor columns in use."""
+    a, rho = spec.digit_bound, float(spec.redundancy)
+    c, err = float(spec.scale), float(spec.estimate_error)
+    positive = X >= 0
+    # For d > 0 digit k covers [(k - rho) d, (k + rho) d], for d < 0 the same interval reversed.
+    lower_coefficient = np.where(positive, digits - rho, digits + rho)
+    upper_coefficient = np.where(positive, digits + rho, digits - rho)
+    lower = c * np.maximum(lower_coefficient * X, lower_coefficient * (X + 1))
+    upper = c * np.minimum(upper_coefficient * X, upper_coefficient * (X + 1))
+    outer = a + rho
+    below = np.where(np.isclose(np.abs(lower_coefficient), outer), np.inf, T - lower)
+    above = np.where(np.isclose(np.abs(upper_coefficient), outer), np.inf, upper - (T + err))
+    margins = np.minimum(below, above)
+    return np.where(np.isin(X, values) & ~np.isnan(digits), margins, np.nan)
+
+
+def sqrt_margins(spec, X, T, digits):
+    """Margins of a square-root table over the state families of ``drtools.regions.sqrt_regions``."""
+    a, err = spec.digit_bound, float(spec.estimate_error)
+    margins = np.full(X.shape, np.nan)
+    t = T[:, 0].astype(float)
+    for column in range(2 ** (spec.x_fractional_bits - 1), 2**spec.x_fractional_bits + 1):
+        index = int(np.flatnonzero(X[0] == column)[0])
+        k = digits[:, index]
+        assigned = ~np.isnan(k)
+        k = np.where(assigned, k, 0).astype(int)
+        worst = np.full(t.shape, np.inf)
+        for vertices, exact in _sqrt_families(spec, column):
+            for S, eps in vertices:
+                low, high, _, intervals = _sqrt_vertex(spec, S, eps, exact)
+                low, high = float(low), float(high)
+                lower = np.array([float(intervals[digit][0]) for digit in range(-a, a + 1)])[k + a]
+                upper = np.array([float(intervals[digit][1]) for digit in range(-a, a + 1)])[k + a]
+                below = np.where(k == -a, np.inf, np.maximum(t, low) - lower)
+                above = np.where(k == a, np.inf, upper - np.minimum(t + err, high))
+                reached = (t + err > low) & (t <= high)
+                worst = np.where(reached, np.minimum(worst, np.minimum(below, above)), worst)
+        margins[:, index] = np.where(assigned & np.isfinite(worst), worst, np.nan)
+    return margins
+
+
+def cell_margins(spec, X, T, digits, conditions=None):
+    """Returns the margin of every cell of ``digits`` on the ``(X, T)`` grid of ``spec``."""
+    if spec.operation == "division":
+        conditions = conditions if conditions is not None else spec.conditions()
+        values = [x for case in conditions.values() for x in tables.case_fields(case)[0]]
+        margins = division_margins(spec, X, T, digits, values)
+    else:
+        margins = sqrt_margins(spec, X, T, digits)
+    # The bounds are rationals evaluated in floating point; a cell touching its bound reads as zero.
+    return np.round(margins, 9) + 0.0
+
+
+def robustness(margins, spec):
+    """Aggregates a margin map: the worst cell ranks first, then the 5th percentile and the mean.
+
+    The statistics are in units of ``r w`` rather than of the estimate, so lattices with different
+    estimate precisions rank on the same scale.
+    """
+    values = margins[np.isfinite(margins)] / 2**spec.t_fractional_bits
+    if values.size == 0:
+        return {"cells": 0, "violations": 0, "min": None, "p05": None, "mean": None}
+    return {
+        "cells": int(values.size),
+        "violations": int((values < 0).sum()),
+        "min": float(values.min()),
+        "p05": float(np.percentile(values, 5)),
+        "mean": float(values.mean()),
+    }
+
+
+def rank_key(score):
+    """Sort key putting the most robust table first."""
+    if score["min"] is None:
+        return (1, 0.0, 0.0, 0.0)
+    return (score["violations"] > 0, -score["min"], -score["p05"], -score["mean"])
+
+
+def plot_margins(spec, X, T, margins, path, title=None):
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import TwoSlopeNorm
+
+    columns = np.flatnonzero(np.isfinite(margins).any(axis=0))
+    rows = np.flatnonzero(np.isfinite(margins).any(axis=1))
+    columns, rows = np.arange(columns[0], columns[-1] + 1), np.arange(rows[0], rows[-1] + 1)
+    x_edges = np.append(X[0, columns], X[0, columns[-1]] + 1) - 0.5
+    t_edges = np.append(T[rows, 0], T[rows[-1], 0] + 1) - 0.5
+    values = margins[np.ix_(rows, columns)]
+    finite = values[np.isfinite(values)]
+    norm = TwoSlopeNorm(vmin=min(finite.min(), -1.0), vcenter=0.0, vmax=max(finite.max(), 1.0))
+
+    fig, ax = plt.subplots(figsize=(max(6, columns.size * 0.35), max(8, rows.size * 0.08)))
+    mesh = ax.pcolormesh(x_edges, t_edges, np.ma.masked_invalid(values), cmap="RdYlGn", norm=norm)
+    fig.colorbar(mesh, ax=ax, label="margin (estimate units)")
+    x_ticks = X[0, columns][:: max(1, columns.size // 8)]
+    t_ticks = T[rows, 0][:: max(1, rows.size // 16)]
+    ax.set_xticks(x_ticks, [spec.x_label(x) for x in x_ticks], rotation=90)
+    ax.set_yticks(t_ticks, [spec.t_label(t) for t in t_ticks])
+    ax.set_xlabel(r"$\delta$" if spec.operation == "division" else r"$\sigma_j$")
+    ax.set_ylabel(r"$\tau_j$")
+    ax.set_title(title or spec.name)
+    ax.axhline(y=-0.5, color="k", linestyle="--", alpha=0.3)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fig.savefig(path, format="pdf", bbox_inches="tight")
+    plt.close(fig)
+
+
+def target_margins(target):
+    """Returns ``(spec, X, T, {"basic": margins, "resolved": margins})`` for a script name or spec dict."""
+    from .pipeline import load_target, target_spec
+
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    basic = tables.apply_conditions(X, T, conditions)
+    resolved, _, _ = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec))
+    return (
+        spec,
+        X,
+        T,
+        {
+            "basic": cell_margins(spec, X, T, basic, conditions),
+            "resolved": cell_margins(spec, X, T, resolved, conditions),
+        },
+    )
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .pipeline import target_name
+
+    parser = argparse.ArgumentParser(description="Per-cell safety margins of selector tables.")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIGURE_SCRIPTS), help="script targets")
+    parser.add_argument("--spec", nargs="+", action="append", metavar="FIELD=VALUE", help="add a table target")
+    parser.add_argument("--out-dir", help="write <target>_<table>.npy and heat-map PDFs here")
+    args = parser.parse_args(argv)
+
+    targets = list(args.only or []) + [parse_assignments(spec) for spec in args.spec or []]
+    rows = []
+    for target in targets or list(FIGURE_SCRIPTS):
+        spec, X, T, maps = target_margins(target)
+        for table, margins in maps.items():
+            name = f"{target_name(target)}/{table}"
+            rows.append((name, robustness(margins, spec)))
+            if args.out_dir:
+                stem = os.path.join(args.out_dir, name.replace("/", "_"))
+                os.makedirs(args.out_dir, exist_ok=True)
+                np.save(f"{stem}.npy", margins)
+                plot_margins(spec, X, T, margins, f"{stem}.pdf", title=name)
+
+    rows.sort(key=lambda row: rank_key(row[1]))
+    width = max(len(name) for name, _ in rows)
+    print(f"{'table':<{width}}  {'cells':>6}  {'viol.':>5}  {'min':>7}  {'p05':>7}  {'mean':>7}")
+    for name, score in rows:
+        if score["min"] is None:
+            print(f"{name:<{width}}  {0:>6}")
+            continue
+        print(
+            f"{name:<{width}}  {score['cells']:>6}  {score['violations']:>5}  {score['min']:>7.3f}  "
+            f"{score['p05']:>7.3f}  {score['mean']:>7.3f}"
+        )
+    return 1 if any(score["violations"] for _, score in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""Two overlapped radix-2 stages per cycle as an alternative to one radix-4 selection.
+
+Each cycle retires two radix-2 digits.  The first stage selects ``q1`` from the estimate of
+``2 w[j]`` with the radix-2 selector of ``radix2_qds_basic``/``radix2_rds_basic``.  In parallel
+the second stage selects ``q2`` speculatively for each ``c`` in ``{-1, 0, 1}``: its estimate of
+``2 w[j + 1]`` adds the top bits of the shifted sum and carry words and of the shifted subtrahend
+``-c d`` (``-c (2 S + c ulp)`` for the square root) directly, without waiting for the carry-save
+update, and ``q1`` then picks one of the three digits.  Three truncated words make that estimate
+off by less than three units instead of two, so the second-stage table is derived for
+``estimate_error=3``.  ``stage_target`` derives both tables, widening the script lattice until
+the table verifies.  The derived tables replace the scripts' own: on the same lattice the derived
+first root stage converges where the hand-written ``radix2_rds_basic`` table does not.
+
+``simulate_overlapped`` runs the overlapped recurrence vectorised over a batch of operands and
+checks every radix-2 step against the convergence bound, like ``drtools.simulate``.  ``compare``
+scores both stage tables with ``drtools.encoding`` and sets the cycle against the radix-4
+selector's in two-input gate levels: a ``t``-bit estimate adder is a prefix adder, the addend
+select is a 2-level AND-OR and the carry-save update two XOR levels::
+
+    radix-4:      add(t4) + loop4 + select + csa
+    overlapped:   q1 = add(t1) + loop1
+                  q2 = max(q1, csa + add(t2) + loop2) + select
+                  max(q1 + select + csa, q2 + select) + csa
+
+``loop`` is the encoding explorer's selector-to-addend-select depth.  The tables are counted as
+compiled ``drtools.lut`` entries; the second stage is instantiated once per speculative branch.
+
+    python -m drtools.overlap
+    python -m drtools.overlap --operation division --operand-bits 12 --exhaustive
+"""
+
+import argparse
+import math
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import simulate
+from .lut import HOLE, select_digit
+
+SCRIPTS = {"division": "radix2_qds_basic", "square_root": "radix2_rds_basic"}
+RADIX4 = {"division": "radix4_qds_optimized", "square_root": "radix4_rds_optimized"}
+CARRY_SAVE_ERROR = 2
+SPECULATIVE_ERROR = 3
+SELECT_DEPTH = 2
+CSA_DEPTH = 2
+BITS = ("t_fractional_bits", "x_fractional_bits")
+
+
+@dataclass
+class OverlappedResult:
+    digits: np.ndarray
+    ok: np.ndarray
+    failed_at: np.ndarray
+    result: np.ndarray
+    fractional_bits: int
+
+
+def _verifies(target):
+    from .pipeline import generate, resolve, verify
+
+    table = generate(target)
+    return verify(target, table, resolve(target))["ok"]
+
+
+def stage_target(operation, error, widen=2):
+    """The smallest lattice around the radix-2 script's with a verified table for ``error``.
+
+    Candidates add up to ``widen`` column bits, ``widen`` fractional estimate bits and one integer
+    estimate bit to the script's lattice and are tried in order of table size.  Spec targets are
+    also checked for estimate overflow, which the script lattices are not.
+    """
+    from .pipeline import target_spec
+
+    base = target_spec(SCRIPTS[operation])
+    integer_bits = base.t_bits - base.t_fractional_bits
+    candidates = sorted(
+        (
+            {
+                "operation": operation,
+                "radix": 2,
+                "x_bits": base.x_bits + extra_x,
+                "x_fractional_bits": base.x_fractional_bits + extra_x,
+                "t_bits": integer_bits + extra_integer + base.t_fractional_bits + extra_t,
+                "t_fractional_bits": base.t_fractional_bits + extra_t,
+                "estimate_error": error,
+            }
+            for extra_x in range(widen + 1)
+            for extra_t in range(widen + 1)
+            for extra_integer in range(2)
+        ),
+        key=lambda target: (target["x_bits"] + target["t_bits"], target["t_bits"]),
+    )
+    for target in candidates:
+        if _verifies(target):
+            return target
+    raise ValueError(f"No {operation} table for estimate error {error} within {widen} extra bits")
+
+
+def simulate_overlapped(stages, operation, operands, iterations, operand_bits):
+    """Runs ``iterations`` radix-2 steps, two per cycle, for every operand.
+
+    ``stages`` holds ``(spec, lut)`` of the first and the speculative second stage.  ``result`` is
+    the quotient in units of ``2**-iterations`` or the root in units of ``2**-fractional_bits``, as
+    ``simulate_division``/``simulate_sqrt`` return them.
+    """
+    (first, first_lut), (second, second_lut) = stages
+    if iterations % 2:
+        raise ValueError("The overlapped recurrence retires two digits per cycle")
+    for spec in (first, second):
+        if spec.estimate != "carry_save" or not spec.wrap or spec.dropped_bits is not None:
+            raise ValueError(f"{spec.name}: the speculative estimate models a wrapping carry-save estimate")
+    x = np.asarray(operands[0], dtype=np.int64)
+    fractional_bits = max(operand_bits, *(getattr(spec, field) for spec in (first, second) for field in BITS))
+    if operation == "square_root":
+        fractional_bits = max(fractional_bits, iterations)
+    # The wider integer part of the two estimates sizes the residual words.
+    path = simulate._Datapath(
+        max((first, second), key=lambda spec: spec.t_bits - spec.t_fractional_bits), fractional_bits
+    )
+    scale = fractional_bits - operand_bits
+
+    if operation == "division":
+        d = np.asarray(operands[1], dtype=np.int64)
+        divisor = d << scale
+        total = path.word(x << scale)
+        result = np.zeros(x.size, dtype=np.int64)
+
+        def column(spec, q=0, ulp=0):
+            return d >> (operand_bits - spec.x_fractional_bits)
+
+        def subtrahend(q, ulp):
+            return q * divisor
+
+        def failed(residual, ulp):
+            return np.abs(residual) > np.abs(divisor)
+
+        def accumulate(q, ulp):
+            return 2 * result + q
+
+    else:
+        one = 1 << fractional_bits
+        result = np.full(x.size, one, dtype=np.int64)
+        total = path.word(2 * ((x << scale) - one))
+        s1 = simulate.first_root_digit(first, x, operand_bits)
+
+        def column(spec, q=0, ulp=0):
+            return (result + q * ulp) >> (fractional_bits - spec.x_fractional_bits)
+
+        def subtrahend(q, ulp):
+            return 2 * result * q + q * q * ulp
+
+        def failed(residual, ulp):
+            # -(2 S - ulp) <= w <= 2 S + ulp for the updated root, with rho = 1.
+            return (residual < -2 * result + ulp) | (residual > 2 * result + ulp)
+
+        def accumulate(q, ulp):
+            return result + q * ulp
+
+    def unit(step):
+        # The root digit weight; the quotient is accumulated by shifting instead.
+        return 1 << (fractional_bits - step - 1) if operation == "square_root" else None
+
+    carry = path.word(np.zeros_like(x))
+    digits = np.zeros((iterations, x.size), dtype=np.int8)
+    ok = np.ones(x.size, dtype=bool)
+    failed_at = np.full(x.size, -1, dtype=np.int32)
+    one_bit = np.uint64(1)
+    for j in range(0, iterations, 2):
+        ulp = unit(j)
+        # Every branch of the second stage starts from the words the first stage sees.
+        branches = []
+        for c in (-1, 0, 1):
+            words = [(word << one_bit) & path.mask for word in (total, carry, path.word(-subtrahend(c, ulp)))]
+            tau = simulate.word_estimate(words, second, fractional_bits)
+            branches.append(select_digit(second_lut, column(second, c, ulp), tau))
+        if operation == "square_root" and j == 0:
+            q1 = s1
+        else:
+            q1 = select_digit(first_lut, column(first), simulate.word_estimate([total, carry], first, fractional_bits))
+        q2 = np.choose(np.where(q1 == HOLE, 1, q1 + 1), branches)
+        for step, q in ((j, q1), (j + 1, q2)):
+            ulp = unit(step)
+            hole = q == HOLE
+            q = np.where(hole, 0, q).astype(np.int64)
+            amount = subtrahend(q, ulp)
+            residual = path.value(total, carry) - amount
+            result = accumulate(q, ulp)
+            bad = hole | failed(residual, ulp)
+            failed_at = np.where(ok & bad, step, failed_at)
+            ok &= ~bad
+            digits[step] = q
+            total, carry = path.step(total, carry, amount)
+    return OverlappedResult(digits, ok, failed_at, result, fractional_bits)
+
+
+def adder_depth(bits):
+    """Two-input gate levels of a ``bits``-wide prefix adder: propagate/generate, the prefix tree, the sum XOR."""
+    return 2 + 2 * math.ceil(math.log2(max(bits, 2)))
+
+
+def _stage(target):
+    from .exhaustive import target_lut
+    from .prescale import baseline
+
+    spec, encoding, report = baseline(target)
+    _, lut = target_lut(target)
+    return {
+        "target": target,
+        "spec": spec,
+        "lut": lut,
+        "encoding": encoding,
+        "selector": report,
+        "entries": int(lut.table.size),
+        "assigned": int((lut.table != HOLE).sum()),
+    }
+
+
+def compare(operation):
+    """Both radix-2 stages and the radix-4 selector of ``operation``, with the cycle depths of both loops."""
+    first = _stage(stage_target(operation, CARRY_SAVE_ERROR))
+    second = _stage(stage_target(operation, SPECULATIVE_ERROR))
+    radix4 = _stage(RADIX4[operation])
+    if first["selector"] is None or second["selector"] is None or radix4["selector"] is None:
+        raise ValueError(f"No feasible encoding for a {operation} selector")
+    q1 = adder_depth(first["spec"].t_bits) + first["selector"]["loop_depth"]
+    q2 = max(q1, CSA_DEPTH + adder_depth(second["spec"].t_bits) + second["selector"]["loop_depth"]) + SELECT_DEPTH
+    cycle = max(q1 + SELECT_DEPTH + CSA_DEPTH, q2 + SELECT_DEPTH) + CSA_DEPTH
+    radix4_cycle = adder_depth(radix4["spec"].t_bits) + radix4["selector"]["loop_depth"] + SELECT_DEPTH + CSA_DEPTH
+    return {
+        "first": first,
+        "second": second,
+        "radix4": radix4,
+        "overlapped_cycle": cycle,
+        "radix4_cycle": radix4_cycle,
+        # One first-stage table and one second-stage table per speculative branch.
+        "overlapped_entries": first["entries"] + 3 * second["entries"],
+        "overlapped_gates": first["selector"]["selector_gates"] + 3 * second["selector"]["selector_gates"],
+    }
+
+
+def main(argv=None):
+    from .exhaustive import default_iterations
+    from .pipeline import target_name
+
+    parser = argparse.ArgumentParser(description="Compare overlapped radix-2 stages with the radix-4 selector.")
+    parser.add_argument("--operation", nargs="+", choices=sorted(SCRIPTS), default=sorted(SCRIPTS))
+    parser.add_argument("--operand-bits", type=int, default=16)
+    parser.add_argument("--iterations", type=int, help="radix-2 steps, even (default: operand bits plus a guard cycle)")
+    operands = parser.add_mutually_exclusive_group()
+    operands.add_argument("--count", type=int, default=1 << 18, help="random operands (default: %(default)s)")
+    operands.add_argument("--exhaustive", action="store_true", help="every operand of --operand-bits")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    status = 0
+    for operation in args.operation:
+        report = compare(operation)
+        first, second, radix4 = report["first"], report["second"], report["radix4"]
+        iterations = args.iterations or 2 * default_iterations(radix4["spec"], args.operand_bits)
+        if args.exhaustive:
+            count = simulate.operand_count(operation, args.operand_bits)
+            operands = simulate.exhaustive_operands(operation, args.operand_bits, 0, count)
+        else:
+            operands = simulate.random_operands(operation, args.count, args.operand_bits, args.seed)
+        stages = ((first["spec"], first["lut"]), (second["spec"], second["lut"]))
+        result = simulate_overlapped(stages, operation, operands, iterations, args.operand_bits)
+        failures = int((~result.ok).sum())
+        status |= failures != 0
+        print(
+            f"{operation}: {operands[0].size} operands, {iterations} radix-2 steps, {failures} failures"
+            + (f" (first at step {int(result.failed_at[~result.ok].min())})" if failures else "")
+        )
+        print(f"  {'selector':<46} {'inputs':>6} {'entries':>7} {'cells':>5} {'gates':>5} {'depth':>5} {'loop':>4}")
+        for label, stage, copies in (("stage 1", first, 1), ("stage 2, per branch", second, 3), ("radix-4", radix4, 1)):
+            selector = stage["selector"]
+            print(
+                f"  {label + ': ' + target_name(stage['target']):<46} {len(selector['inputs']['selector']):>6} "
+                f"{stage['entries']:>7} {stage['assigned']:>5} {selector['selector_gates']:>5} "
+                f"{selector['selector_depth']:>5} {selector['loop_depth']:>4}" + (f"  x{copies}" if copies > 1 else "")
+            )
+        print(
+            f"  overlapped: {report['overlapped_entries']} entries, {report['overlapped_gates']} selector gates, "
+            f"cycle {report['overlapped_cycle']} levels; radix-4: {radix4['entries']} entries, "
+            f"{radix4['selector']['selector_gates']} selector gates, cycle {report['radix4_cycle']} levels"
+        )
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
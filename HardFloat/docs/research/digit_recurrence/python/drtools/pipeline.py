@@ -0,0 +1,154 @@
+"""Task functions of the research flow and the graphs the command-line driver builds from them.
+
+A target is either the name of one of the figure scripts, whose own conditions are used, or a
+``TableSpec`` given as a dict, whose conditions come from ``drtools.regions``.
+"""
+
+import itertools
+
+from . import instrument, tables
+from .batch import table_hash
+from .export import export_figure, export_path
+from .lint import lint_table
+from .margins import cell_margins, robustness
+from .regions import TableSpec, estimate_range, sqrt_gaps
+from .scripts import FIGURE_SCRIPTS
+from .tasks import Task
+
+
+def target_name(target):
+    return target if isinstance(target, str) else TableSpec(**target).name
+
+
+def load_target(target):
+    """Returns ``(operation, X, T, conditions)`` for a script name or a spec dict."""
+    if isinstance(target, str):
+        script = FIGURE_SCRIPTS[target]
+        module = script.load()
+        X, T = (getattr(module, name) for name in script.grid_names)
+        return script.operation, X, T, getattr(module, script.conditions_name)
+    spec = TableSpec(**target)
+    X, T = spec.grid()
+    return spec.operation, X, T, spec.conditions()
+
+
+def target_spec(target):
+    if isinstance(target, str):
+        script = FIGURE_SCRIPTS[target]
+        return script.spec(script.load())
+    return TableSpec(**target)
+
+
+def generate(target):
+    stats = instrument.active()
+    with instrument.phase(stats, "load"):
+        operation, X, T, conditions = load_target(target)
+    with instrument.phase(stats, "apply_conditions"):
+        digits = tables.apply_conditions(X, T, conditions, stats)
+    with instrument.phase(stats, "detect_overlaps"):
+        overlaps = tables.detect_overlaps(X, T, conditions)
+    return {
+        "name": target_name(target),
+        "operation": operation,
+        "x": X,
+        "t": T,
+        "digits": digits,
+        "overlaps": overlaps,
+    }
+
+
+def resolve(target):
+    stats = instrument.active()
+    with instrument.phase(stats, "load"):
+        _, X, T, conditions = load_target(target)
+        remove_overlaps = tables.overlap_policy(target_spec(target))
+    digits, intervals, unresolved = tables.resolve_overlaps(X, T, conditions, remove_overlaps, stats)
+    return {"digits": digits, "intervals": intervals, "unresolved": unresolved}
+
+
+def verify(target, table, resolved):
+    _, X, T, conditions = load_target(target)
+    report = tables.verify_resolution(X, T, conditions, resolved["digits"])
+    report["overlap_cells"] = int(sum(overlap.sum() for overlap in table["overlaps"]))
+    report["unresolved"] = len(resolved["unresolved"])
+    report["ok"] = report["holes"] == 0 and report["invalid"] == 0 and report["unresolved"] == 0
+    spec = target_spec(target)
+    report["robustness"] = robustness(cell_margins(spec, X, T, resolved["digits"], conditions), spec)
+    report["robustness_basic"] = robustness(cell_margins(spec, X, T, table["digits"], conditions), spec)
+    report["ok"] = report["ok"] and report["robustness"]["violations"] == 0
+    violations = lint_table(spec, X, T, resolved["digits"], conditions, resolved["intervals"], resolved["unresolved"])
+    report["lint"] = len(violations)
+    report["ok"] = report["ok"] and report["lint"] == 0
+    if not isinstance(target, str):
+        lowest, highest = estimate_range(spec)
+        report["overflow"] = max(0, int(spec.t_range[0]) - lowest) + max(0, highest - int(spec.t_range[-1]))
+        report["ok"] = report["ok"] and report["overflow"] == 0
+        if spec.operation == "square_root":
+            # Derived root tables can also leave reachable estimates without any correct digit.
+            report["gaps"] = len(sqrt_gaps(spec))
+            report["ok"] = report["ok"] and report["gaps"] == 0
+    return report
+
+
+def plot_inputs(script, table, resolved):
+    if script.overlaps:
+        return (table["x"], table["t"], table["digits"], *table["overlaps"])
+    return (table["x"], table["t"], resolved["digits"])
+
+
+def plot(name, quadrants, figures_dir, table, resolved):
+    script = FIGURE_SCRIPTS[name]
+    inputs = plot_inputs(script, table, resolved)
+    script.plot(script.load(), inputs, quadrants, figures_dir=figures_dir, show=False)
+    return {"path": script.figure_path(quadrants, figures_dir), "hash": table_hash(name, quadrants, inputs)}
+
+
+def export(name, quadrants, fmt, figures_dir, table, resolved):
+    inputs = plot_inputs(FIGURE_SCRIPTS[name], table, resolved)
+    return {"path": export_figure(name, quadrants, fmt, figures_dir, inputs=inputs)}
+
+
+def sweep_targets(sweep):
+    """Expands ``{"field": [values, ...], ...}`` into the spec dicts of its Cartesian product."""
+    fields = sorted(sweep)
+    values = [value if isinstance(value, list) else [value] for value in (sweep[name] for name in fields)]
+    return [dict(zip(fields, combination)) for combination in itertools.product(*values)]
+
+
+def build_graph(command, config):
+    """Returns ``{key: Task}`` for one subcommand; ``run`` covers everything but ``sweep``."""
+    stages = {
+        "generate": ("generate",),
+        "resolve-overlaps": ("generate", "resolve"),
+        "verify": ("generate", "resolve", "verify"),
+        "plot": ("generate", "resolve", "plot"),
+        "export": ("generate", "resolve", "export"),
+        "sweep": ("generate", "resolve", "verify"),
+        "run": ("generate", "resolve", "verify", "plot", "export"),
+    }[command]
+    targets = sweep_targets(config["sweep"]) if command == "sweep" else list(config["targets"])
+    figures_dir = config["figures_dir"]
+    graph = {}
+    for target in targets:
+        name = target_name(target)
+        generate_key, resolve_key = f"generate:{name}", f"resolve:{name}"
+        graph[generate_key] = Task(generate_key, generate, (target,))
+        if "resolve" in stages:
+            graph[resolve_key] = Task(resolve_key, resolve, (target,))
+        if "verify" in stages:
+            graph[f"verify:{name}"] = Task(f"verify:{name}", verify, (target,), (generate_key, resolve_key))
+        if not isinstance(target, str):
+            continue
+        for quadrants in FIGURE_SCRIPTS[name].quadrants:
+            if "plot" in stages:
+                key = f"plot:{name}:{quadrants}"
+                outputs = (FIGURE_SCRIPTS[name].figure_path(quadrants, figures_dir),)
+                graph[key] = Task(key, plot, (name, quadrants, figures_dir), (generate_key, resolve_key), outputs)
+            if "export" in stages:
+                key = f"export:{name}:{quadrants}"
+                fmt = config["format"]
+                outputs = (export_path(name, quadrants, fmt, figures_dir),)
+                graph[key] = Task(
+                    key, export, (name, quadrants, fmt, figures_dir), (generate_key, resolve_key), outputs
+                )
+    return graph
@@ -0,0 +1,90 @@
+"""Staircase polygons for selector regions.
+
+A selector region is a set of lattice cells ``(x, t)``; cell ``(x, t)`` covers the unit square
+centred on the lattice point, exactly as the square scatter markers in the figures do.  Each
+column of a region is split into maximal runs of consecutive ``t`` values, and runs in adjacent
+columns whose ``t`` ranges overlap are chained into one staircase polygon.  The union of the
+returned polygons is exactly the region, so every boundary line lands on a half-integer.
+"""
+
+import numpy as np
+
+
+def column_runs(column_mask):
+    """Returns the inclusive index ranges ``(lo, hi)`` of the True runs of a 1-D mask."""
+    padded = np.concatenate(([False], np.asarray(column_mask, dtype=bool), [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[0::2], edges[1::2] - 1))
+
+
+def staircase_chains(mask):
+    """Groups the runs of a ``(len(t), len(x))`` mask into chains of column-adjacent runs.
+
+    Returns a list of chains, each a list of ``(column, lo, hi)`` index triples in increasing
+    column order.  A run continues a chain only when it is the sole run overlapping the chain's
+    last run and vice versa, which keeps every chain's outline a simple polygon.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    chains = []
+    open_chains = []
+    previous_runs = []
+    for column in range(mask.shape[1]):
+        runs = column_runs(mask[:, column])
+        next_open = []
+        for lo, hi in runs:
+            matches = [i for i, (plo, phi) in enumerate(previous_runs) if plo <= hi and lo <= phi]
+            chain = None
+            if len(matches) == 1:
+                plo, phi = previous_runs[matches[0]]
+                siblings = [1 for rlo, rhi in runs if rlo <= phi and plo <= rhi]
+                if len(siblings) == 1:
+                    chain = open_chains[matches[0]]
+            if chain is None:
+                chain = []
+                chains.append(chain)
+            chain.append((column, lo, hi))
+            next_open.append(chain)
+        open_chains = next_open
+        previous_runs = runs
+    return chains
+
+
+def chain_outline(chain, x_values, t_values):
+    """Returns the counter-clockwise outline of a chain in plot coordinates, without repeated points."""
+    x_values = np.asarray(x_values)
+    t_values = np.asarray(t_values)
+    upper = []
+    lower = []
+    for column, lo, hi in chain:
+        left = x_values[column] - 0.5
+        right = x_values[column] + 0.5
+        top = t_values[hi] + 0.5
+        bottom = t_values[lo] - 0.5
+        upper += [(left, top), (right, top)]
+        lower += [(left, bottom), (right, bottom)]
+    points = lower + upper[::-1]
+    outline = []
+    for point in points:
+        point = (float(point[0]), float(point[1]))
+        if outline and outline[-1] == point:
+            continue
+        outline.append(point)
+    if len(outline) > 1 and outline[0] == outline[-1]:
+        outline.pop()
+    return _drop_collinear(outline)
+
+
+def _drop_collinear(points):
+    kept = []
+    count = len(points)
+    for i, (x, y) in enumerate(points):
+        px, py = points[i - 1]
+        nx, ny = points[(i + 1) % count]
+        if (x - px) * (ny - y) - (y - py) * (nx - x) != 0:
+            kept.append((x, y))
+    return kept
+
+
+def region_polygons(mask, x_values, t_values):
+    """Returns the staircase polygons covering a ``(len(t), len(x))`` boolean mask exactly."""
+    return [chain_outline(chain, x_values, t_values) for chain in staircase_chains(mask)]
@@ -0,0 +1,287 @@
+"""Divisor prescaling: factor tables, the selection regions they leave and what they cost.
+
+Prescaling multiplies divisor and dividend by a factor ``M`` read from a small table indexed by
+the leading divisor bits, so the recurrence divides by ``z = M d`` close to one and the quotient
+is unchanged.  The selection intervals ``[(k - rho) z, (k + rho) z]`` then barely move with the
+divisor and the selector can drop most or all of its divisor columns.
+
+A ``FactorTable`` has ``2**index_bits`` entries over ``d`` in ``[1/2, 1)``; each factor has
+``factor_bits`` fractional bits and at most ``terms`` nonzero digits in canonical signed-digit
+form, so that multiplying by it is a ``terms``-input addition.  ``choose_factors`` picks, for
+every divisor interval, the admissible factor keeping ``z`` closest to one.  ``selection_table``
+derives the digits over the estimate for the resulting ``z`` range in exact arithmetic, either
+independent of the divisor or split into the columns of ``z`` truncated to ``z_fractional_bits``;
+a reachable cell without a digit makes the table infeasible.  ``explore`` finds the narrowest
+estimate with a feasible table and scores it with ``drtools.encoding.explore``, the same gate and
+depth model as the unscaled selector it is compared against.  The prescale side is the factor
+table's logic and the 3:2 levels of the ``terms``-input multiply; the final residual is ``M``
+times the remainder, which a remainder operation has to undo.
+
+    python -m drtools.prescale                                   # against radix4_qds_optimized
+    python -m drtools.prescale --index-bits 3 4 --factor-bits 4 5 --terms 2 3 --z-bits none 0
+"""
+
+import argparse
+import math
+import sys
+from dataclasses import dataclass
+from fractions import Fraction
+
+import numpy as np
+
+from .logic import minimize, sop_cost
+from .regions import TableSpec, estimate_error
+
+MAX_T_FRACTIONAL_BITS = 6
+RTL_ENCODING = "sign_magnitude/estimate"
+
+
+@dataclass(frozen=True)
+class FactorTable:
+    index_bits: int
+    factor_bits: int
+    terms: int
+
+    @property
+    def name(self):
+        return f"m{self.index_bits}_f{self.factor_bits}_n{self.terms}"
+
+    def intervals(self):
+        """The divisor intervals ``[low, high)`` the table entries cover."""
+        width = Fraction(1, 2 ** (self.index_bits + 1))
+        return [(Fraction(1, 2) + i * width, Fraction(1, 2) + (i + 1) * width) for i in range(2**self.index_bits)]
+
+
+def signed_digits(value):
+    """Canonical signed-digit (non-adjacent form) digits of a nonnegative integer, least significant first."""
+    digits = []
+    while value:
+        digit = 2 - (value & 3) if value & 1 else 0
+        digits.append(digit)
+        value = (value - digit) >> 1
+    return digits
+
+
+def factor_candidates(factor_bits, terms):
+    """Factors in ``[1, 2]`` with ``factor_bits`` fractional bits and at most ``terms`` nonzero digits."""
+    return [
+        Fraction(k, 2**factor_bits)
+        for k in range(2**factor_bits, 2 ** (factor_bits + 1) + 1)
+        if sum(digit != 0 for digit in signed_digits(k)) <= terms
+    ]
+
+
+def choose_factors(table):
+    """Returns one factor per divisor interval, the one with ``M d`` deviating least from one."""
+    candidates = factor_candidates(table.factor_bits, table.terms)
+    return [
+        min(candidates, key=lambda m: (max(abs(m * low - 1), abs(m * high - 1)), m)) for low, high in table.intervals()
+    ]
+
+
+def scaled_range(table, factors):
+    """The range ``[z_min, z_max]`` of ``M d``; ``z_max`` is a supremum."""
+    intervals = table.intervals()
+    return (
+        min(m * low for m, (low, _) in zip(factors, intervals)),
+        max(m * high for m, (_, high) in zip(factors, intervals)),
+    )
+
+
+def z_columns(z_min, z_max, z_fractional_bits=None):
+    """``[(column, low, high), ...]``: one column, or the truncations of ``z`` to ``z_fractional_bits``."""
+    if z_fractional_bits is None:
+        return [(0, z_min, z_max)]
+    unit = Fraction(1, 2**z_fractional_bits)
+    first, last = math.floor(z_min / unit), math.ceil(z_max / unit) - 1
+    return [
+        (column - first, max(z_min, column * unit), min(z_max, (column + 1) * unit))
+        for column in range(first, last + 1)
+    ]
+
+
+def selection_table(radix, z_min, z_max, t_fractional_bits, z_fractional_bits=None, error=None):
+    """Returns ``(spec, X, T, digits, holes)`` of the prescaled selector.
+
+    Cell ``t`` stands for ``t <= r w / u < t + error`` with ``u = 2**-t_fractional_bits`` and a
+    column for every ``z`` in ``[low, high]``; digit ``k`` is selectable when
+    ``(k - rho) z <= t u`` and ``(t + error) u <= (k + rho) z`` hold over the whole column, the outer
+    digits' outward side being the residual bound.  Of the selectable digits the one nearest to the
+    cell's quotient estimate is taken; ``holes`` counts reachable cells with none.
+    """
+    a = radix // 2
+    rho = Fraction(a, radix - 1)
+    error = Fraction(2) if error is None else Fraction(error)
+    u = Fraction(1, 2**t_fractional_bits)
+    # r w stays within (a + rho) z.
+    high = (a + rho) * z_max / u
+    lowest, highest = math.floor(-high - error) + 1, math.floor(high)
+    t_bits = max((-lowest - 1).bit_length(), highest.bit_length()) + 1
+    spec = TableSpec(
+        "division", radix, x_bits=2, t_bits=t_bits, x_fractional_bits=0, t_fractional_bits=t_fractional_bits
+    )
+    columns = z_columns(z_min, z_max, z_fractional_bits)
+    X, T = np.meshgrid(np.arange(len(columns)), spec.t_range)
+    digits = np.full(X.shape, np.nan)
+    holes = 0
+    for column, low, top in columns:
+        middle = (low + top) / 2
+        for row, t in enumerate(spec.t_range.tolist()):
+            if t < lowest or t > highest:
+                continue
+            selectable = []
+            for k in range(-a, a + 1):
+                below = k == -a or max((k - rho) * low, (k - rho) * top) <= t * u
+                above = k == a or (t + error) * u <= min((k + rho) * low, (k + rho) * top)
+                if below and above:
+                    selectable.append(k)
+            if selectable:
+                estimate = (t + error / 2) * u / middle
+                digits[row, column] = min(selectable, key=lambda k: (abs(k - estimate), abs(k)))
+            else:
+                holes += 1
+    return spec, X, T, digits, holes
+
+
+def best_encoding(reports):
+    """``(name, report)`` of the RTL encoding when it is feasible, otherwise of the shallowest feasible one."""
+    if reports.get(RTL_ENCODING, {}).get("feasible"):
+        return RTL_ENCODING, reports[RTL_ENCODING]
+    feasible = [(name, report) for name, report in reports.items() if report["feasible"]]
+    return min(feasible, key=lambda item: (item[1]["loop_depth"], item[1]["selector_gates"]), default=(None, None))
+
+
+def csa_levels(terms):
+    """3:2 levels reducing ``terms`` addends to a carry-save pair."""
+    levels = 0
+    while terms > 2:
+        terms -= terms // 3
+        levels += 1
+    return levels
+
+
+def factor_logic(table, factors):
+    """Gates and depth of the factor table as sum-of-products over the divisor index bits.
+
+    Every factor position outputs a nonzero and a sign bit of the factor's signed digits.
+    """
+    digits = [signed_digits(int(m * 2**table.factor_bits)) for m in factors]
+    positions = max(len(d) for d in digits)
+    gates, depth = 0, 0
+    for position in range(positions):
+        for part in (lambda digit: digit != 0, lambda digit: digit < 0):
+            on = [i for i, d in enumerate(digits) if position < len(d) and part(d[position])]
+            cost = sop_cost(minimize(on, (), table.index_bits))
+            gates, depth = gates + cost["gates"], max(depth, cost["depth"])
+    return {"gates": gates, "depth": depth}
+
+
+def explore(table, radix=4, z_fractional_bits=None, estimate="carry_save", dropped_bits=None):
+    """The narrowest feasible prescaled selector of ``table``; ``None`` fields when none is found."""
+    from .encoding import explore as explore_encodings
+
+    factors = choose_factors(table)
+    z_min, z_max = scaled_range(table, factors)
+    report = {
+        "table": table.name,
+        "factor_bits": table.factor_bits,
+        "factors": factors,
+        "z_range": (z_min, z_max),
+        "z_columns": len(z_columns(z_min, z_max, z_fractional_bits)),
+        "factor_logic": factor_logic(table, factors),
+        "csa_levels": csa_levels(table.terms),
+        "spec": None,
+        "encoding": None,
+        "selector": None,
+    }
+    error = estimate_error(estimate, dropped_bits)
+    for t_fractional_bits in range(1, MAX_T_FRACTIONAL_BITS + 1):
+        spec, X, T, digits, holes = selection_table(radix, z_min, z_max, t_fractional_bits, z_fractional_bits, error)
+        if holes:
+            continue
+        reports = explore_encodings(spec, X, T, digits, [RTL_ENCODING])
+        if not reports[RTL_ENCODING]["feasible"]:
+            reports = explore_encodings(spec, X, T, digits)
+        name, selector = best_encoding(reports)
+        report.update(spec=spec, encoding=name, selector=selector, digits=digits)
+        break
+    return report
+
+
+def baseline(target):
+    """``(spec, encoding, report)`` of an unscaled selector, with the encoding the explorer ranks first."""
+    from .encoding import target_encodings
+    from .pipeline import target_spec
+
+    name, report = best_encoding(target_encodings(target))
+    return target_spec(target), name, report
+
+
+def _parse_z_bits(value):
+    return None if value == "none" else int(value)
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .pipeline import target_name
+    from .scripts import FIGURE_SCRIPTS
+
+    parser = argparse.ArgumentParser(description="Explore divisor prescaling for the quotient selector.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--only", choices=sorted(FIGURE_SCRIPTS), help="unscaled script table to compare against")
+    target.add_argument("--spec", nargs="+", metavar="FIELD=VALUE", help="unscaled table to compare against")
+    parser.add_argument("--index-bits", nargs="+", type=int, default=[2, 3, 4, 5])
+    parser.add_argument("--factor-bits", nargs="+", type=int, default=[3, 4, 5, 6])
+    parser.add_argument("--terms", nargs="+", type=int, default=[2, 3])
+    parser.add_argument(
+        "--z-bits", nargs="+", type=_parse_z_bits, default=[None, 0], help="z column fractional bits, or none"
+    )
+    parser.add_argument("--width", type=int, default=64, help="operand width of the prescale multiply")
+    args = parser.parse_args(argv)
+
+    reference = args.only or (parse_assignments(args.spec) if args.spec else "radix4_qds_optimized")
+    spec, encoding, report = baseline(reference)
+    columns = report["inputs"]["selector"].count("column")
+    print(
+        f"{target_name(reference)}: {columns} column + {spec.t_bits} estimate inputs, "
+        f"{report['selector_gates']} selector gates, depth {report['selector_depth']}, loop {report['loop_depth']} "
+        f"({encoding})"
+    )
+    print(
+        f"  {'factors':<12} {'z range':>17} {'z cols':>6} {'t':>5} {'inputs':>6} {'gates':>5} {'depth':>5} "
+        f"{'loop':>4} {'rom gates':>9} {'prescale':>8}"
+    )
+    rows = []
+    for index_bits in args.index_bits:
+        for factor_bits in args.factor_bits:
+            for terms in args.terms:
+                for z_bits in args.z_bits:
+                    result = explore(FactorTable(index_bits, factor_bits, terms), spec.radix, z_bits)
+                    rows.append(result)
+    rows.sort(
+        key=lambda row: (
+            (1, 0, 0, 0)
+            if row["selector"] is None
+            else (0, row["selector"]["loop_depth"], row["selector"]["selector_gates"], row["factor_logic"]["gates"])
+        )
+    )
+    for row in rows:
+        z_min, z_max = row["z_range"]
+        prefix = f"  {row['table']:<12} {float(z_min):>8.4f}..{float(z_max):<7.4f} {row['z_columns']:>6}"
+        if row["selector"] is None:
+            print(f"{prefix}  no feasible estimate up to {MAX_T_FRACTIONAL_BITS} fractional bits")
+            continue
+        selector, row_spec = row["selector"], row["spec"]
+        inputs = (row["z_columns"] - 1).bit_length() + row_spec.t_bits
+        # Two operands, each a terms-input sum of shifted copies, reduced and added once.
+        prescale = f"{row['csa_levels']}+cpa{args.width + row['factor_bits']}"
+        print(
+            f"{prefix} {row_spec.t_bits}.{row_spec.t_fractional_bits:<3} {inputs:>6} "
+            f"{selector['selector_gates']:>5} {selector['selector_depth']:>5} {selector['loop_depth']:>4} "
+            f"{row['factor_logic']['gates']:>9} {prescale:>8}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
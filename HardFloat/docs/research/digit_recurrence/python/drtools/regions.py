@@ -0,0 +1,491 @@
+"""Selection regions derived from the SRT bounds for an arbitrary radix and lattice.
+
+The scripts hard-code the conditions of one lattice each.  ``TableSpec`` describes a lattice
+(radix, integer and fractional widths of the divisor and of the residual estimate) and
+``division_conditions`` builds the same ``QUOTIENT_CONDITIONS`` structure for it, with the bounds
+evaluated in exact integer arithmetic instead of floating point.  For the scripts' own lattices
+the result is cell-for-cell identical to their tables.
+
+``sqrt_conditions`` does the same for the square root, including the startup columns the scripts
+write by hand (see ``sqrt_regions``).
+"""
+
+import functools
+import operator
+from dataclasses import asdict, dataclass
+from fractions import Fraction
+
+import numpy as np
+
+RELATIONS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+# Words truncated and added to form the estimate.
+ESTIMATE_WORDS = {"carry_save": 2, "non_redundant": 1}
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    operation: str = "division"
+    radix: int = 4
+    x_bits: int = 5
+    t_bits: int = 8
+    x_fractional_bits: int = None
+    t_fractional_bits: int = None
+    estimate_error: Fraction = None
+    estimate: str = "carry_save"
+    dropped_bits: int = None
+    wrap: bool = True
+
+    def __post_init__(self):
+        # Defaults follow the scripts: a divisor/root in [-1, 1), an estimate with three integer bits
+        # for division and four for the square root.
+        if self.x_fractional_bits is None:
+            object.__setattr__(self, "x_fractional_bits", self.x_bits - 1)
+        if self.t_fractional_bits is None:
+            integer_bits = 3 if self.operation == "division" else 4
+            object.__setattr__(self, "t_fractional_bits", self.t_bits - integer_bits)
+        if self.estimate not in ESTIMATE_WORDS:
+            raise ValueError(f"Unknown estimate representation {self.estimate!r}")
+        if self.estimate_error is None:
+            object.__setattr__(self, "estimate_error", estimate_error(self.estimate, self.dropped_bits))
+
+    @property
+    def name(self):
+        kind = "qds" if self.operation == "division" else "rds"
+        error = Fraction(self.estimate_error)
+        if error.denominator == 1:
+            error = f"e{error.numerator}"
+        elif self.dropped_bits is not None:
+            error = f"e{ESTIMATE_WORDS[self.estimate]}d{self.dropped_bits}"
+        else:
+            error = f"e{error.numerator}-{error.denominator}"
+        return (
+            f"radix{self.radix}_{kind}_x{self.x_bits}.{self.x_fractional_bits}"
+            f"_t{self.t_bits}.{self.t_fractional_bits}_{error}{'' if self.wrap else '_nowrap'}"
+        )
+
+    @property
+    def error_attained(self):
+        """Whether ``t + estimate_error`` itself can be reached, which it can once the dropped bits are bounded."""
+        return self.dropped_bits is not None
+
+    @property
+    def digit_bound(self):
+        return self.radix // 2
+
+    @property
+    def redundancy(self):
+        return Fraction(self.digit_bound, self.radix - 1)
+
+    @property
+    def scale(self):
+        """Ratio between one estimate unit and one divisor unit in the bound coefficients."""
+        return Fraction(2) ** (self.t_fractional_bits - self.x_fractional_bits)
+
+    @property
+    def x_range(self):
+        if self.operation == "division":
+            return np.arange(-(2 ** (self.x_bits - 1)), 2 ** (self.x_bits - 1))
+        return np.arange(0, 2 ** (self.x_bits - 1) + 1)
+
+    @property
+    def t_range(self):
+        return np.arange(-(2 ** (self.t_bits - 1)), 2 ** (self.t_bits - 1))
+
+    def grid(self):
+        return np.meshgrid(self.x_range, self.t_range)
+
+    def x_label(self, x):
+        return binary_label(x, self.x_bits, self.x_fractional_bits)
+
+    def t_label(self, t):
+        return binary_label(t, self.t_bits, self.t_fractional_bits)
+
+    def conditions(self):
+        if self.operation == "division":
+            return division_conditions(self)
+        if self.operation == "square_root":
+            return sqrt_conditions(self)
+        raise ValueError(f"No region builder for operation {self.operation!r}")
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def binary_label(value, bits, fractional_bits):
+    """Formats a lattice index as the scripts' ``binary_formatter`` does, e.g. ``-3`` as ``11111.101``."""
+    value = int(value)
+    if value < 0:
+        value += 2**bits
+    digits = bin(value)[2:].zfill(bits)
+    return f"{digits[:-fractional_bits]}.{digits[-fractional_bits:]}" if fractional_bits else digits
+
+
+def estimate_error(estimate="carry_save", dropped_bits=None):
+    """Largest ``r w - t`` in estimate units when ``t`` truncates the residual.
+
+    Each truncated word loses at most ``1 - 2**-dropped_bits`` units, so a carry-save estimate,
+    which truncates sum and carry separately before adding them, is off by less than two units and
+    a non-redundant one by less than one.  Without a bound on the dropped bits the error only
+    approaches the number of words.
+    """
+    words = ESTIMATE_WORDS[estimate]
+    if dropped_bits is None:
+        return Fraction(words)
+    return words * (1 - Fraction(1, 2**dropped_bits))
+
+
+@functools.lru_cache(maxsize=None)
+def residual_range(spec):
+    """Returns the extreme values of ``r w`` in estimate units over every reachable state."""
+    c = Fraction(2) ** spec.t_fractional_bits
+    if spec.operation == "division":
+        # |r w| <= (a + rho) |d| with |d| <= 1.
+        high = c * (spec.digit_bound + spec.redundancy)
+        return -high, high
+    low = high = Fraction(0)
+    for column in range(2 ** (spec.x_fractional_bits - 1), 2**spec.x_fractional_bits + 1):
+        for vertices, exact in _sqrt_families(spec, column):
+            for S, eps in vertices:
+                state_low, state_high, _, _ = _sqrt_vertex(spec, S, eps, exact)
+                low, high = min(low, state_low), max(high, state_high)
+    return low, high
+
+
+def estimate_range(spec):
+    """Returns the lowest and highest estimate the truncation can produce, before any wrap-around.
+
+    Estimates outside ``spec.t_range`` do not fit the table: with ``wrap`` the ``t_bits``-bit adder
+    of the RTL aliases them onto the opposite end of the table, without it they have no cell at all.
+    """
+    low, high = residual_range(spec)
+    lowest = low - spec.estimate_error
+    lowest = _ceil(lowest) if spec.error_attained else _floor(lowest) + 1
+    return lowest, _floor(high)
+
+
+def bound(coefficient, shift, constant, relation):
+    """Returns ``f(x, t)`` testing ``coefficient * (x + shift) + constant <relation> t`` exactly."""
+    coefficient = Fraction(coefficient)
+    constant = Fraction(constant)
+    denominator = coefficient.denominator * constant.denominator
+    p = coefficient.numerator * constant.denominator
+    c = constant.numerator * coefficient.denominator
+    compare = RELATIONS[relation]
+    return lambda x, t: compare(p * (x + shift) + c, denominator * t)
+
+
+def interval(lower, upper):
+    return lambda x, t: lower(x, t) & upper(x, t)
+
+
+def _cell_max_shift(coefficient):
+    # Over the cell [x, x + 1) a linear bound peaks at x + 1 when increasing and at x otherwise.
+    return 1 if coefficient > 0 else 0
+
+
+def division_conditions(spec):
+    """Builds ``QUOTIENT_CONDITIONS`` for ``spec`` in the scripts' format.
+
+    For a positive divisor digit ``k`` is selectable on ``[(k - rho) d, (k + rho) d]``, for a
+    negative one on ``[(k + rho) d, (k - rho) d]``.  Each lower bound is taken at its maximum over
+    the divisor cell and each upper bound at its minimum less the estimate error; the outermost
+    digits are bounded by the residual range instead.
+    """
+    a, rho, c, err = spec.digit_bound, spec.redundancy, spec.scale, spec.estimate_error
+    # The lowest estimate of a cell is reachable when r w sits estimate_error above it.
+    bottom = "<=" if spec.error_attained else "<"
+    x_range = spec.x_range
+    digits = range(a, -a - 1, -1)
+
+    positive = []
+    for k in digits:
+        if k == -a:
+            coefficient = c * (-a - rho)
+            lower = bound(coefficient, 1 - _cell_max_shift(coefficient), -err, bottom)
+        else:
+            coefficient = c * (k - rho)
+            lower = bound(coefficient, _cell_max_shift(coefficient), 0, "<=")
+        if k == a:
+            coefficient = c * (a + rho)
+            upper = bound(coefficient, _cell_max_shift(coefficient), 0, ">")
+        else:
+            coefficient = c * (k + rho)
+            upper = bound(coefficient, 1 - _cell_max_shift(coefficient), -err, ">=")
+        positive.append((k, interval(lower, upper)))
+
+    negative = []
+    for k in digits:
+        if k == a:
+            coefficient = c * (a + rho)
+            lower = bound(coefficient, 1 - _cell_max_shift(coefficient), -err, bottom)
+        else:
+            coefficient = c * (k + rho)
+            lower = bound(coefficient, _cell_max_shift(coefficient), 0, "<=")
+        if k == -a:
+            coefficient = c * (-a - rho)
+            upper = bound(coefficient, _cell_max_shift(coefficient), 0, ">=")
+        else:
+            coefficient = c * (k - rho)
+            upper = bound(coefficient, 1 - _cell_max_shift(coefficient), -err, ">=")
+        negative.append((k, interval(lower, upper)))
+
+    return {
+        "positive_D": {
+            "D_values": list(range(int(x_range[-1] + 1) // 2, int(x_range[-1] + 1))),
+            "q_conditions": positive,
+        },
+        "negative_D": {
+            "D_values": list(range(int(x_range[0]), int(x_range[0]) // 2)),
+            "q_conditions": negative,
+        },
+    }
+
+
+def _ceil(value):
+    return -((-value.numerator) // value.denominator)
+
+
+def _floor(value):
+    return value.numerator // value.denominator
+
+
+def _sqrt_families(spec, column):
+    """Returns the ``(vertices, exact)`` state families of root column ``column``.
+
+    A state is a partial root ``S`` and a step ``eps = r**-j``, ``j >= 1``; the first digit comes
+    from the initialization intervals, so the table is never consulted at ``j = 0``.  Early states
+    are listed one by one.  From step ``J`` on, where ``eps`` is below half a column, the states of
+    a column fill a polygon in ``(S, eps)`` and are given by its corners, ``eps = 0`` standing for
+    the limit.  ``exact`` families also apply the radicand range ``1/4 <= X < 1``, which is what
+    makes ``S = 1/2`` residuals nonnegative and ``S = 1`` residuals negative.
+    """
+    r, f = spec.radix, spec.x_fractional_bits
+    lo, hi = Fraction(column, 2**f), Fraction(column + 1, 2**f)
+    half, one = Fraction(1, 2), Fraction(1)
+    steps = 1
+    while Fraction(1, r**steps) > Fraction(1, 2 ** (f + 1)):
+        steps += 1
+    families = []
+    for j in range(1, steps):
+        eps = Fraction(1, r**j)
+        first = max(_ceil(lo / eps), _ceil(half / eps))
+        last = min(_ceil(hi / eps) - 1, _floor(one / eps))
+        families.extend(([(m * eps, eps)], True) for m in range(first, last + 1))
+    eps = Fraction(1, r**steps)
+    if lo == one:
+        families.append(([(one, eps), (one, 0)], True))
+    elif lo == half:
+        families.append(([(half, eps), (half, 0)], True))
+        families.append(([(half + eps, eps), (half, 0), (hi - eps, eps), (hi, 0)], False))
+    else:
+        families.append(([(lo, eps), (lo, 0), (hi - eps, eps), (hi, 0)], False))
+    return families
+
+
+def _sqrt_vertex(spec, S, eps, exact):
+    """Scaled residual range and digit intervals of one state, in estimate units of ``r * w[j]``.
+
+    Returns ``(low, high, high_closed, intervals)`` with ``intervals[k] = (L_k, U_k)`` from the
+    selection interval ``2 (k - rho) S + (k - rho)**2 eps / r <= r w <= 2 (k + rho) S + (k + rho)**2 eps / r``.
+    """
+    r, a, rho = spec.radix, spec.digit_bound, spec.redundancy
+    c = Fraction(2) ** spec.t_fractional_bits
+    intervals = {
+        k: (c * (2 * (k - rho) * S + (k - rho) ** 2 * eps / r), c * (2 * (k + rho) * S + (k + rho) ** 2 * eps / r))
+        for k in range(-a, a + 1)
+    }
+    low, high = intervals[-a][0], intervals[a][1]
+    high_closed = eps > 0
+    if exact:
+        # r w[j] = r**(j + 1) (X - S**2) with 1/4 <= X < 1.
+        if S == Fraction(1, 2):
+            low = max(low, Fraction(0))
+        elif eps > 0:
+            low = max(low, c * r * (Fraction(1, 4) - S * S) / eps)
+        if S == 1 or eps > 0:
+            ceiling = c * r * (1 - S * S) / eps if eps > 0 else Fraction(0)
+            if ceiling <= high:
+                high, high_closed = ceiling, False
+    return low, high, high_closed, intervals
+
+
+def _span_limits(low, high, high_closed, low_closed=False):
+    first = _ceil(low) if low_closed else _floor(low) + 1
+    last = _floor(high) if high_closed else _ceil(high) - 1
+    return first, last
+
+
+def _merge(spans):
+    """Sorted disjoint ``(first, last)`` spans covering the nonempty ones of ``spans``."""
+    merged = []
+    for first, last in sorted(span for span in spans if span[0] <= span[1]):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _subtract(spans, removed):
+    """The parts of the merged ``spans`` outside the merged ``removed`` spans."""
+    result = []
+    for first, last in spans:
+        for low, high in removed:
+            if high < first or low > last:
+                continue
+            if low > first:
+                result.append((first, low - 1))
+            first = high + 1
+        if first <= last:
+            result.append((first, last))
+    return result
+
+
+def _span_mask(spans, t_values):
+    """The ``(t, column)`` mask of per-column spans."""
+    mask = np.zeros((t_values.size, len(spans)), dtype=bool)
+    for index, column in enumerate(spans):
+        for first, last in column:
+            mask[:, index] |= (t_values >= first) & (t_values <= last)
+    return mask
+
+
+def _family_reach(states):
+    """``(low, high, high_closed)`` of the scaled residuals of a family's ``_sqrt_vertex`` states."""
+    low = min(state[0] for state in states)
+    high = max(state[1] for state in states)
+    return low, high, any(state[2] and state[1] == high for state in states)
+
+
+def reachable_spans(spec, columns=None):
+    """``{x: [(first, last), ...]}``: the estimates some state of column ``x`` can produce.
+
+    Division bounds ``|r w| <= (a + rho) |d|`` over the divisor cell, as the outermost digits of
+    ``division_conditions`` do; the square root takes the state families of ``sqrt_spans``.
+    Spans may extend past ``spec.t_range``, see ``estimate_range``.  ``columns`` limits the
+    columns derived, by default those of ``spec.x_range``.
+    """
+    a, rho, c, err = spec.digit_bound, spec.redundancy, spec.scale, spec.estimate_error
+    f = spec.x_fractional_bits
+    columns = spec.x_range if columns is None else columns
+    spans = {}
+    if spec.operation == "division":
+        for x in columns:
+            # |d| < x + 1 over a positive cell and |d| <= -x over a negative one.
+            extreme = c * (a + rho) * (int(x) + 1 if x >= 0 else -int(x))
+            spans[int(x)] = [_span_limits(-extreme - err, extreme, x < 0, spec.error_attained)]
+        return spans
+    for column in map(int, columns):
+        if not 2 ** (f - 1) <= column <= 2**f:
+            continue
+        for vertices, exact in _sqrt_families(spec, column):
+            low, high, high_closed = _family_reach([_sqrt_vertex(spec, S, eps, exact) for S, eps in vertices])
+            spans.setdefault(column, []).append(_span_limits(low - err, high, high_closed, spec.error_attained))
+    return spans
+
+
+def reachable_cells(spec, X, T):
+    """Mask of the cells of the ``(X, T)`` meshgrid some state can produce, see ``reachable_spans``."""
+    reachable = np.zeros(np.shape(X), dtype=bool)
+    spans = reachable_spans(spec, np.unique(np.asarray(X)[0]).tolist())
+    for index, x in enumerate(np.asarray(X)[0]):
+        for first, last in spans.get(int(x), ()):
+            reachable[:, index] |= (T[:, index] >= first) & (T[:, index] <= last)
+    return reachable
+
+
+def sqrt_spans(spec):
+    """Derives the square-root selection regions of ``spec`` from the recurrence bounds.
+
+    Returns ``(columns, reachable, allowed)``: the root columns ``2**(f-1) .. 2**f``, per column the
+    spans of estimates in ``spec.t_range`` some state can produce, and per digit and column the spans
+    where the digit is correct for every state of the column that can produce the estimate.  Spans
+    are sorted disjoint ``(first, last)`` pairs, so nothing here grows with ``t_bits``.  An estimate
+    ``t`` stands for ``t <= r w < t + estimate_error`` in estimate units (``<=`` once the error is
+    attained, see ``TableSpec.error_attained``).  Within a family of states
+    the bad estimates of a digit are bounded by the extremes of its bounds, which only enlarges them,
+    so every allowed cell is safe; reachable cells with no allowed digit are reported by
+    ``sqrt_gaps``.
+    """
+    a, err = spec.digit_bound, spec.estimate_error
+    f = spec.x_fractional_bits
+    columns = np.arange(2 ** (f - 1), 2**f + 1)
+    t_first, t_last = int(spec.t_range[0]), int(spec.t_range[-1])
+    reachable = []
+    allowed = {k: [] for k in range(a, -a - 1, -1)}
+    for column in columns:
+        reach_spans, bad = [], {k: [] for k in allowed}
+        for vertices, exact in _sqrt_families(spec, int(column)):
+            states = [_sqrt_vertex(spec, S, eps, exact) for S, eps in vertices]
+            low, high, high_closed = _family_reach(states)
+            first, last = _span_limits(low - err, high, high_closed, spec.error_attained)
+            first, last = max(first, t_first), min(last, t_last)
+            reach_spans.append((first, last))
+            for k in bad:
+                lower = max(state[3][k][0] for state in states)
+                upper = min(state[3][k][1] for state in states)
+                if any(state[0] < state[3][k][0] for state in states):
+                    # Part of the cell lies below L_k.
+                    bad[k].append((first, min(last, _ceil(lower) - 1)))
+                if any(state[1] > state[3][k][1] for state in states):
+                    # Part of the cell lies above U_k.
+                    bad[k].append(_span_limits(max(upper, low) - err, high, high_closed))
+        reach_spans = _merge(reach_spans)
+        reachable.append(reach_spans)
+        for k in allowed:
+            allowed[k].append(_subtract(reach_spans, _merge(bad[k])))
+    return columns, reachable, allowed
+
+
+def sqrt_regions(spec):
+    """``sqrt_spans`` with the spans as ``(t, column)`` masks over ``spec.t_range``."""
+    columns, reachable, allowed = sqrt_spans(spec)
+    t_values = spec.t_range
+    return columns, _span_mask(reachable, t_values), {k: _span_mask(spans, t_values) for k, spans in allowed.items()}
+
+
+def sqrt_gaps(spec):
+    """Returns the ``(column, t)`` cells some state reaches but no digit covers."""
+    columns, reachable, allowed = sqrt_regions(spec)
+    covered = np.logical_or.reduce(list(allowed.values()))
+    rows, indices = np.nonzero(reachable & ~covered)
+    return [(int(columns[i]), int(spec.t_range[row])) for row, i in zip(rows, indices)]
+
+
+def _lookup(spans, x_first):
+    """A condition testing ``t`` against the spans of column ``x``, padded to one array per span index."""
+    count = max(1, max(len(column) for column in spans))
+    firsts = np.ones((count, len(spans)), dtype=np.int64)
+    lasts = np.zeros((count, len(spans)), dtype=np.int64)
+    for index, column in enumerate(spans):
+        for rank, (first, last) in enumerate(column):
+            firsts[rank, index], lasts[rank, index] = first, last
+
+    def condition(x, t):
+        t, cols = np.asarray(t), np.asarray(x) - x_first
+        inside = (cols >= 0) & (cols < len(spans))
+        cols = np.clip(cols, 0, len(spans) - 1)
+        result = np.zeros(np.shape(cols), dtype=bool)
+        for first, last in zip(firsts, lasts):
+            result |= (t >= first[cols]) & (t <= last[cols])
+        return inside & result
+
+    return condition
+
+
+def sqrt_conditions(spec):
+    """Builds ``ROOT_CONDITIONS`` for ``spec`` from ``sqrt_spans``.
+
+    Unlike the scripts, no column is written by hand: the startup columns ``S = 1/2`` and ``S = 1``
+    come out of the same derivation as the interior, with the residual sign fixed by the radicand
+    range while the root sits exactly on them.
+    """
+    columns, _, allowed = sqrt_spans(spec)
+    x_first = int(columns[0])
+    return {
+        "S": {
+            "S_values": [int(column) for column in columns],
+            "s_conditions": [(k, _lookup(spans, x_first)) for k, spans in allowed.items()],
+        },
+    }
@@ -0,0 +1,143 @@
+"""Registry of the selector figure scripts and helpers to load them as modules."""
+
+import importlib.util
+import os
+import sys
+from dataclasses import dataclass
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIGURES_DIR = os.path.abspath(os.path.join(PYTHON_DIR, "../figures"))
+
+DIVISION_QUADRANTS = ("quadrants_1_2_3_4", "quadrants_1_4", "quadrants_2_3")
+SQUARE_ROOT_QUADRANTS = ("quadrants_1_4",)
+
+
+@dataclass(frozen=True)
+class FigureScript:
+    name: str
+    operation: str
+    digit_function: str
+    plot_function: str
+    quadrants: tuple
+    conditions: str = None
+    overlaps: bool = False
+    radix: int = 4
+
+    @property
+    def path(self):
+        return os.path.join(PYTHON_DIR, self.operation, f"{self.name}.py")
+
+    @property
+    def grid_names(self):
+        return ("D", "T") if self.operation == "division" else ("S", "T")
+
+    @property
+    def conditions_name(self):
+        return "QUOTIENT_CONDITIONS" if self.operation == "division" else "ROOT_CONDITIONS"
+
+    def spec(self, module):
+        """Returns the ``TableSpec`` describing the script's lattice."""
+        from .regions import TableSpec
+
+        prefix = "D" if self.operation == "division" else "S"
+        return TableSpec(
+            self.operation,
+            self.radix,
+            getattr(module, f"{prefix}_BITS"),
+            module.T_BITS,
+            getattr(module, f"{prefix}_FRACTIONAL_BITS"),
+            module.T_FRACTIONAL_BITS,
+        )
+
+    def figure_path(self, quadrants, figures_dir=FIGURES_DIR):
+        return os.path.join(figures_dir, self.operation, f"{self.name}_{quadrants}.pdf")
+
+    def load(self):
+        return load_script(self.path, f"drtools_{self.name}")
+
+    def compute(self, module):
+        """Returns the positional arguments the script's plot function expects before ``quadrants``."""
+        X, T = (getattr(module, name) for name in self.grid_names)
+        digit_function = getattr(module, self.digit_function)
+        if self.conditions is not None:
+            digits = digit_function(X, T, getattr(module, self.conditions))
+        else:
+            digits = digit_function(X, T)
+        overlaps = module.detect_overlaps(X, T) if self.overlaps else ()
+        return (X, T, digits, *overlaps)
+
+    def plot(self, module, inputs, quadrants, figures_dir=FIGURES_DIR, show=False):
+        save_path = os.path.join(figures_dir, self.operation)
+        getattr(module, self.plot_function)(*inputs, quadrants, save_path=save_path, show=show)
+
+
+FIGURE_SCRIPTS = {
+    script.name: script
+    for script in (
+        FigureScript(
+            "radix2_qds_basic",
+            "division",
+            "get_quotient_digit",
+            "plot_quotient_regions",
+            DIVISION_QUADRANTS,
+            overlaps=True,
+            radix=2,
+        ),
+        FigureScript(
+            "radix4_qds_basic",
+            "division",
+            "get_quotient_digit",
+            "plot_quotient_regions",
+            DIVISION_QUADRANTS,
+            overlaps=True,
+        ),
+        FigureScript(
+            "radix4_qds_optimized",
+            "division",
+            "get_quotient_digit_no_overlap",
+            "plot_quotient_regions_no_overlap",
+            DIVISION_QUADRANTS,
+            conditions="QUOTIENT_CONDITIONS",
+        ),
+        FigureScript(
+            "radix2_rds_basic",
+            "square_root",
+            "get_root_digit",
+            "plot_root_regions",
+            SQUARE_ROOT_QUADRANTS,
+            overlaps=True,
+            radix=2,
+        ),
+        FigureScript(
+            "radix4_rds_basic",
+            "square_root",
+            "get_root_digit",
+            "plot_root_regions",
+            SQUARE_ROOT_QUADRANTS,
+            overlaps=True,
+        ),
+        FigureScript(
+            "radix4_rds_optimized",
+            "square_root",
+            "get_root_digit_no_overlap",
+            "plot_root_regions_no_overlap",
+            SQUARE_ROOT_QUADRANTS,
+            conditions="ROOT_CONDITIONS",
+        ),
+    )
+}
+
+
+def load_script(path, module_name):
+    """Imports a script by file path, reusing the module if it was already loaded."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module
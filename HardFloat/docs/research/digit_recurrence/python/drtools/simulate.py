@@ -0,0 +1,266 @@
+"""Vectorised carry-save simulation of the division and square-root recurrences.
+
+Every operand of a batch advances in lock step.  The shifted residual ``r * w[j]`` is held as a
+sum/carry pair of ``W``-bit two's-complement words with ``F`` fractional bits, updated by a 3:2
+carry-save adder exactly like the datapath.  The selector estimate adds the top ``t_bits`` bits of
+both words modulo ``2**t_bits``, so it carries the same error and the same wrap-around as the RTL
+estimate; ``TableSpec.estimate`` and ``TableSpec.wrap`` select a non-redundant or a wide estimate
+instead, and ``TableSpec.dropped_bits`` fixes ``F`` to that many bits below the estimate.  Each
+step also checks the exact residual against the convergence bound, which makes the simulator a test
+of the table itself.
+
+Operands are integers in units of ``2**-n``:
+
+* division: dividend ``x`` in ``[2**(n-1), 2**n)`` and divisor ``d`` with ``|d|`` in the same range,
+  starting from ``w[0] = x / r``;
+* square root: radicand ``x`` in ``[2**(n-2), 2**n)``, starting from ``S[0] = 1``, ``w[0] = x - 1``;
+  the first digit comes from the exact initialization intervals, not from the table.
+
+``SimulationResult.exact_at`` is the number of digits after which the exact residual is zero and stays
+zero, i.e. after which the remaining digits are all zero and the result is exact; it is
+``iterations + 1`` where the residual is still nonzero after the last step.  With ``words=True`` the
+simulators also keep ``SimulationResult.words``: the sum and carry words before every step and after
+the last one, ``(iterations + 1, operands)``, and the subtrahend word each step adds, ``(iterations,
+operands)``, all as the datapath's unsigned ``W``-bit words.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .lut import HOLE, select_digit
+
+
+@dataclass
+class SimulationResult:
+    digits: np.ndarray
+    estimates: np.ndarray
+    columns: np.ndarray
+    ok: np.ndarray
+    failed_at: np.ndarray
+    result: np.ndarray
+    fractional_bits: int
+    exact_at: np.ndarray = None
+    words: dict = None
+
+
+def _signed(words, width):
+    words = words.astype(np.int64)
+    return np.where(words >= 1 << (width - 1), words - (1 << width), words)
+
+
+def word_estimate(words, spec, fractional_bits):
+    """Adds the words truncated to ``spec``'s estimate lattice modulo ``2**t_bits``, signed.
+
+    Each truncated word is off by less than one estimate unit, so ``n`` words give an estimate off
+    by less than ``n`` units, with the wrap-around of a ``t_bits``-bit estimate adder.
+    """
+    shift = np.uint64(fractional_bits - spec.t_fractional_bits)
+    tau = sum(word >> shift for word in words) & np.uint64((1 << spec.t_bits) - 1)
+    return _signed(tau, spec.t_bits)
+
+
+def _carry_save(a, b, c, mask):
+    total = a ^ b ^ c
+    carry = ((a & b) | (a & c) | (b & c)) << np.uint64(1)
+    return total & mask, carry & mask
+
+
+class _Datapath:
+    def __init__(self, spec, fractional_bits):
+        self.spec = spec
+        self.log_radix = spec.radix.bit_length() - 1
+        if spec.dropped_bits is not None:
+            if fractional_bits > spec.t_fractional_bits + spec.dropped_bits:
+                raise ValueError(
+                    f"{fractional_bits} residual fractional bits do not fit {spec.dropped_bits} bits below the estimate"
+                )
+            fractional_bits = spec.t_fractional_bits + spec.dropped_bits
+        self.fractional_bits = fractional_bits
+        self.width = spec.t_bits - spec.t_fractional_bits + fractional_bits
+        if self.width > 58:
+            raise ValueError(f"A {self.width}-bit residual does not fit the int64 datapath")
+        self.mask = np.uint64((1 << self.width) - 1)
+        self.t_mask = np.uint64((1 << spec.t_bits) - 1)
+        self.t_shift = np.uint64(fractional_bits - spec.t_fractional_bits)
+
+    def word(self, values):
+        return np.asarray(values, dtype=np.int64).astype(np.uint64) & self.mask
+
+    def value(self, total, carry):
+        return _signed((total + carry) & self.mask, self.width)
+
+    def estimate(self, total, carry):
+        if self.spec.estimate == "carry_save":
+            tau = (total >> self.t_shift) + (carry >> self.t_shift)
+        else:
+            tau = ((total + carry) & self.mask) >> self.t_shift
+        if self.spec.wrap:
+            return _signed(tau & self.t_mask, self.spec.t_bits)
+        width = self.width - int(self.t_shift)
+        return _signed(tau & np.uint64((1 << width) - 1), width)
+
+    def record(self, words, total, carry, subtrahend=None):
+        if words is not None:
+            words["sum"].append(total)
+            words["carry"].append(carry)
+            if subtrahend is not None:
+                words["addend"].append(self.word(-subtrahend))
+
+    def step(self, total, carry, subtrahend):
+        """Returns ``r * (total + carry - subtrahend)`` in carry-save form."""
+        total, carry = _carry_save(total, carry, self.word(-subtrahend), self.mask)
+        shift = np.uint64(self.log_radix)
+        return (total << shift) & self.mask, (carry << shift) & self.mask
+
+
+def _stack(words):
+    return None if words is None else {name: np.stack(values) for name, values in words.items()}
+
+
+def datapath(spec, operand_bits, iterations):
+    """The residual datapath a simulation of ``spec`` runs on; raises ``ValueError`` when none fits."""
+    fractional_bits = max(operand_bits, spec.t_fractional_bits, spec.x_fractional_bits)
+    if spec.operation != "division":
+        fractional_bits = max(fractional_bits, iterations * (spec.radix.bit_length() - 1))
+    return _Datapath(spec, fractional_bits)
+
+
+def simulate_division(table, spec, x, d, iterations, operand_bits, words=False):
+    """Runs ``iterations`` radix-``spec.radix`` division steps for every ``(x, d)`` pair.
+
+    ``table`` is the ``drtools.lut.DigitLUT`` of the selector.  ``result`` is the quotient in units of
+    ``r**-iterations``; it approximates ``x / (r * d)``.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    d = np.asarray(d, dtype=np.int64)
+    path = datapath(spec, operand_bits, iterations)
+    scale = path.fractional_bits - operand_bits
+    divisor = d << scale
+    column = d >> (operand_bits - spec.x_fractional_bits)
+    # |w| <= rho * |d| with rho = a / (r - 1), kept in integers.
+    bound = spec.digit_bound * np.abs(divisor)
+
+    total, carry = path.word(x << scale), path.word(np.zeros_like(x))
+    digits = np.zeros((iterations, x.size), dtype=np.int8)
+    estimates = np.zeros((iterations, x.size), dtype=np.int16)
+    ok = np.ones(x.size, dtype=bool)
+    failed_at = np.full(x.size, -1, dtype=np.int32)
+    quotient = np.zeros(x.size, dtype=np.int64)
+    exact_at = np.ones(x.size, dtype=np.int32)
+    words = {"sum": [], "carry": [], "addend": []} if words else None
+    for j in range(iterations):
+        tau = path.estimate(total, carry)
+        q = select_digit(table, column, tau)
+        hole = q == HOLE
+        q = np.where(hole, 0, q).astype(np.int64)
+        residual = path.value(total, carry) - q * divisor
+        failed = hole | ((spec.radix - 1) * np.abs(residual) > bound)
+        failed_at = np.where(ok & failed, j, failed_at)
+        ok &= ~failed
+        exact_at = np.where(residual != 0, j + 2, exact_at)
+        digits[j], estimates[j] = q, tau
+        quotient = quotient * spec.radix + q
+        path.record(words, total, carry, q * divisor)
+        total, carry = path.step(total, carry, q * divisor)
+    path.record(words, total, carry)
+    columns = np.broadcast_to(column, (iterations, x.size))
+    return SimulationResult(
+        digits, estimates, columns, ok, failed_at, quotient, path.fractional_bits, exact_at, _stack(words)
+    )
+
+
+def first_root_digit(spec, x, operand_bits):
+    """Largest ``s1`` in ``{-a, ..., 0}`` with ``1 + (s1 - rho) / r <= sqrt(x)``, in exact integers."""
+    a, r = spec.digit_bound, spec.radix
+    s1 = np.full(np.shape(x), -a, dtype=np.int64)
+    for k in range(-a + 1, 1):
+        edge = (r - 1) * (r + k) - a
+        s1 = np.where(edge * edge << operand_bits <= np.asarray(x) * (r * (r - 1)) ** 2, k, s1)
+    return s1
+
+
+def simulate_sqrt(table, spec, x, iterations, operand_bits, words=False):
+    """Runs ``iterations`` radix-``spec.radix`` square-root steps for every radicand.
+
+    ``table`` is the ``drtools.lut.DigitLUT`` of the selector.  ``result`` is ``S[iterations]`` in units
+    of ``2**-fractional_bits``.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    log_radix = spec.radix.bit_length() - 1
+    path = datapath(spec, operand_bits, iterations)
+    fractional_bits = path.fractional_bits
+    one = 1 << fractional_bits
+    a, r = spec.digit_bound, spec.radix
+
+    root = np.full(x.size, one, dtype=np.int64)
+    residual = (x << (fractional_bits - operand_bits)) - one
+    total, carry = path.word(r * residual), path.word(np.zeros_like(x))
+    digits = np.zeros((iterations, x.size), dtype=np.int8)
+    estimates = np.zeros((iterations, x.size), dtype=np.int16)
+    columns = np.zeros((iterations, x.size), dtype=np.int16)
+    ok = np.ones(x.size, dtype=bool)
+    failed_at = np.full(x.size, -1, dtype=np.int32)
+    s1 = first_root_digit(spec, x, operand_bits)
+    exact_at = np.ones(x.size, dtype=np.int32)
+    words = {"sum": [], "carry": [], "addend": []} if words else None
+    for j in range(iterations):
+        tau = path.estimate(total, carry)
+        column = root >> (fractional_bits - spec.x_fractional_bits)
+        s = s1 if j == 0 else select_digit(table, column, tau)
+        hole = s == HOLE
+        s = np.where(hole, 0, s).astype(np.int64)
+        ulp = 1 << (fractional_bits - (j + 1) * log_radix)
+        subtrahend = 2 * root * s + s * s * ulp
+        residual = path.value(total, carry) - subtrahend
+        root = root + s * ulp
+        # -rho (2 S - rho ulp) <= w <= rho (2 S + rho ulp), scaled by (r - 1)^2.
+        scaled = (r - 1) ** 2 * residual
+        lower = -a * (r - 1) * 2 * root + a * a * ulp
+        upper = a * (r - 1) * 2 * root + a * a * ulp
+        failed = hole | (scaled < lower) | (scaled > upper)
+        failed_at = np.where(ok & failed, j, failed_at)
+        ok &= ~failed
+        exact_at = np.where(residual != 0, j + 2, exact_at)
+        digits[j], estimates[j], columns[j] = s, tau, column
+        path.record(words, total, carry, subtrahend)
+        total, carry = path.step(total, carry, subtrahend)
+    path.record(words, total, carry)
+    return SimulationResult(digits, estimates, columns, ok, failed_at, root, fractional_bits, exact_at, _stack(words))
+
+
+def random_operands(operation, count, operand_bits, seed=0, signed_divisor=True):
+    """Returns uniformly drawn operands in the ranges the simulators expect."""
+    rng = np.random.default_rng(seed)
+    if operation == "division":
+        x = rng.integers(1 << (operand_bits - 1), 1 << operand_bits, count)
+        d = rng.integers(1 << (operand_bits - 1), 1 << operand_bits, count)
+        if signed_divisor:
+            # Negative divisors are normalized like the RTL's two's complement ones, to [-1, -1/2).
+            d = np.where(rng.random(count) < 0.5, -d - 1, d)
+        return x, d
+    return (rng.integers(1 << (operand_bits - 2), 1 << operand_bits, count),)
+
+
+def operand_count(operation, operand_bits, signed_divisor=True):
+    """Size of the operand space ``exhaustive_operands`` enumerates."""
+    if operation == "division":
+        return (1 << (operand_bits - 1)) * ((2 if signed_divisor else 1) << (operand_bits - 1))
+    return 3 << (operand_bits - 2)
+
+
+def exhaustive_operands(operation, operand_bits, start, stop, signed_divisor=True):
+    """Returns operands ``start`` to ``stop`` of the space, in the same form as ``random_operands``.
+
+    Division pairs are ordered dividend-major; the divisors of one dividend run through
+    ``[2**(n-1), 2**n)`` and then, when ``signed_divisor``, through ``[-2**n, -2**(n-1))`` downwards.
+    """
+    index = np.arange(start, stop, dtype=np.int64)
+    half = 1 << (operand_bits - 1)
+    if operation == "division":
+        divisors = (2 if signed_divisor else 1) * half
+        x = half + index // divisors
+        d = index % divisors
+        d = np.where(d < half, half + d, -d - 1)
+        return x, d
+    return ((1 << (operand_bits - 2)) + index,)
@@ -0,0 +1,298 @@
+"""Speculative next-digit selector tables: selection retimed off the carry-save update.
+
+In ``DividerStage3`` and ``DivSqrtStage2`` the digit ``q[j+1]`` is selected from the estimate of
+``r w[j+1]``, so the selector waits for the carry-save update that ``q[j]`` drives.  Since
+``r w[j+1] = r (r w[j]) - r q[j] d``, the next digit can instead be selected from the estimate of
+``r (r w[j])``, read off the *pre-update* sum and carry words shifted by ``log2 r``, with one table
+per possible ``q[j]``; the registered ``q[j]`` then picks among the ``2a + 1`` table outputs while
+the update runs in parallel.
+
+``speculative_table`` derives the table for one current digit ``q`` in exact arithmetic: digit
+``k`` is selectable in a cell ``t <= r (r w) / u < t + error`` of a divisor column when
+``k d - rho |d| + r q d <= t u`` and ``(t + error) u <= k d + rho |d| + r q d`` hold over the
+whole column, the outermost interval's outward side being the convergence bound.  The reachable
+cells are those of ``r (r w)`` for a residual ``q`` was selected for; the table only spans that
+window and indexes it modulo ``2**t_bits``, as a wrapping estimate adder does.  ``tables`` finds
+the fewest estimate fractional bits for which all ``2a + 1`` tables are hole-free, and
+``simulate_speculative`` runs the retimed recurrence vectorised, selecting the first digit with the
+ordinary table.
+
+``compare`` sets the two loops against each other in the gate-level model of
+``drtools.overlap``, with the registered digit decoded to one-hot so that picking one of the
+``2a + 1`` table outputs is an AND-OR::
+
+    ordinary:      add(t) + loop + select + csa
+    speculative:   max(decode + select + csa, add(t') + selector + and-or(2a + 1))
+
+The square-root tables would depend on the iteration through ``q**2 r**-(j+1)``; only division
+is covered.
+
+    python -m drtools.speculate
+    python -m drtools.speculate --only radix4_qds_basic --operand-bits 12 --exhaustive
+"""
+
+import argparse
+import dataclasses
+import math
+import sys
+
+import numpy as np
+
+from . import simulate
+from .lut import HOLE, compile_lut, select_digit
+
+MAX_EXTRA_BITS = 3
+
+
+def divisor_columns(x_fractional_bits):
+    """The normalized divisor columns, ``[-1, -1/2)`` and ``[1/2, 1)`` truncated to ``x_fractional_bits``."""
+    half = 1 << (x_fractional_bits - 1)
+    return list(range(-2 * half, -half)) + list(range(half, 2 * half))
+
+
+def speculative_table(spec, q, t_fractional_bits, x_fractional_bits=None):
+    """Returns ``(table_spec, X, T, digits, holes)`` of the next-digit table for current digit ``q``.
+
+    ``T`` holds the estimates wrapped to ``table_spec.t_bits``, the bits of the reachable window.
+    Bounds are compared in integers, in units of ``2**-(x_fractional_bits + t_fractional_bits) / (r - 1)``.
+    """
+    a, r, error = spec.digit_bound, spec.radix, int(spec.estimate_error)
+    if error != spec.estimate_error:
+        raise ValueError("Speculative tables are derived for an integral estimate error")
+    xf = spec.x_fractional_bits if x_fractional_bits is None else x_fractional_bits
+    tf = t_fractional_bits
+    columns = divisor_columns(xf)
+
+    def bounds(k, c, shift):
+        # k d -+ rho |d| + shift d at the column edge d = c 2**-xf.
+        return ((k + shift) * (r - 1) * c - a * abs(c)) << tf, ((k + shift) * (r - 1) * c + a * abs(c)) << tf
+
+    def reach(c):
+        # r (r w) for r w in the selection interval of q.
+        low, high = bounds(q, c, 0)
+        return r * low, r * high
+
+    unit = (r - 1) << xf
+    windows = [
+        (min(reach(c)[0] for c in ends) // unit - error + 1, max(reach(c)[1] for c in ends) // unit)
+        for ends in ((column, column + 1) for column in columns)
+    ]
+    lowest, highest = min(low for low, _ in windows), max(high for _, high in windows)
+    # The column is part of the table index, so only one column's window has to fit the estimate.
+    t_bits = max(1, max((high - low).bit_length() for low, high in windows))
+    table_spec = dataclasses.replace(spec, x_bits=xf + 1, x_fractional_bits=xf, t_bits=t_bits, t_fractional_bits=tf)
+    rows = np.arange(lowest, highest + 1, dtype=np.int64)
+    X, T = np.meshgrid(columns, rows)
+    digits = np.full(X.shape, np.nan)
+    holes = 0
+    for index, (column, (low, high)) in enumerate(zip(columns, windows)):
+        reachable = (rows >= low) & (rows <= high)
+        # The interval nearest minus infinity has the convergence bound as its lower side.
+        bottom = -a if column > 0 else a
+        selectable = {}
+        for k in range(-a, a + 1):
+            edges = [bounds(k, c, r * q) for c in (column, column + 1)]
+            ok = np.ones(rows.shape, dtype=bool)
+            if k != bottom:
+                ok &= max(low for low, _ in edges) <= rows * unit
+            if k != -bottom:
+                ok &= (rows + error) * unit <= min(high for _, high in edges)
+            selectable[k] = ok & reachable
+        # Of the selectable digits the one nearest the cell's quotient estimate.
+        middle = 2 * column + 1
+        estimate = (2 * rows + error) * 2.0 ** (xf - tf) / middle - r * q
+        best = np.full(rows.shape, np.nan)
+        distance = np.full(rows.shape, np.inf)
+        for k in sorted(selectable, key=abs):
+            closer = selectable[k] & (np.abs(k - estimate) < distance)
+            best = np.where(closer, k, best)
+            distance = np.where(closer, np.abs(k - estimate), distance)
+        digits[:, index] = best
+        holes += int((reachable & np.isnan(best)).sum())
+    half = 1 << (t_bits - 1)
+    return table_spec, X, (T + half) % (2 * half) - half, digits, holes
+
+
+def tables(spec, extra_bits=MAX_EXTRA_BITS):
+    """The hole-free next-digit tables with the fewest entries, ``{q: (table_spec, X, T, digits)}``.
+
+    Divisor columns from ``spec``'s up to ``extra_bits`` finer and estimate fractional bits from two
+    up to ``extra_bits`` beyond ``spec``'s are tried; ties go to the narrower estimate.
+    """
+    a = spec.digit_bound
+    best = None
+    for xf in range(spec.x_fractional_bits, spec.x_fractional_bits + extra_bits + 1):
+        for tf in range(2, spec.t_fractional_bits + extra_bits + 1):
+            derived = {q: speculative_table(spec, q, tf, xf) for q in range(-a, a + 1)}
+            if any(holes for *_, holes in derived.values()):
+                continue
+            # Both divisor signs span 2**(xf + 1) columns of 2**t_bits entries each.
+            size = sum(1 << (xf + 1 + table[0].t_bits) for table in derived.values())
+            key = (size, max(table[0].t_bits for table in derived.values()))
+            if best is None or key < best[0]:
+                best = key, {q: table[:4] for q, table in derived.items()}
+    if best is None:
+        raise ValueError(f"No hole-free speculative tables within {extra_bits} extra bits")
+    return best[1]
+
+
+def simulate_speculative(first, speculative, spec, x, d, iterations, operand_bits):
+    """Runs ``iterations`` division steps selecting ``q[j+1]`` from the pre-update words.
+
+    ``first`` is the ordinary ``DigitLUT`` of ``spec`` for the first digit and ``speculative``
+    ``{q: (table_spec, lut)}``.  Returns a ``drtools.simulate.SimulationResult`` whose estimates
+    and columns are the next-digit tables' inputs.
+    """
+    x = np.asarray(x, dtype=np.int64)
+    d = np.asarray(d, dtype=np.int64)
+    a, r = spec.digit_bound, spec.radix
+    specs = [table_spec for table_spec, _ in speculative.values()]
+    fractional_bits = max(
+        operand_bits, spec.t_fractional_bits, spec.x_fractional_bits, *(s.t_fractional_bits for s in specs)
+    )
+    # The words carry the integer bits of the widest estimate window.
+    integer_bits = max(s.t_bits - s.t_fractional_bits for s in specs + [spec])
+    path = simulate._Datapath(dataclasses.replace(spec, t_bits=spec.t_fractional_bits + integer_bits), fractional_bits)
+    scale = path.fractional_bits - operand_bits
+    divisor = d << scale
+    bound = a * np.abs(divisor)
+    shift = np.uint64(path.log_radix)
+    table_spec = specs[0]
+    column = d >> (operand_bits - table_spec.x_fractional_bits)
+
+    total, carry = path.word(x << scale), path.word(np.zeros_like(x))
+    digits = np.zeros((iterations, x.size), dtype=np.int8)
+    estimates = np.zeros((iterations, x.size), dtype=np.int16)
+    ok = np.ones(x.size, dtype=bool)
+    failed_at = np.full(x.size, -1, dtype=np.int32)
+    quotient = np.zeros(x.size, dtype=np.int64)
+    exact_at = np.ones(x.size, dtype=np.int32)
+    tau = simulate.word_estimate([total, carry], spec, path.fractional_bits)
+    q = select_digit(first, d >> (operand_bits - spec.x_fractional_bits), tau)
+    for j in range(iterations):
+        hole = q == HOLE
+        q = np.where(hole, 0, q).astype(np.int64)
+        # Every next-digit table reads r (r w[j]) off the words before they are updated.
+        tau = simulate.word_estimate(
+            [(word << shift) & path.mask for word in (total, carry)], table_spec, path.fractional_bits
+        )
+        following = np.choose(q + a, [select_digit(lut, column, tau) for _, lut in speculative.values()])
+        residual = path.value(total, carry) - q * divisor
+        failed = hole | ((r - 1) * np.abs(residual) > bound)
+        failed_at = np.where(ok & failed, j, failed_at)
+        ok &= ~failed
+        exact_at = np.where(residual != 0, j + 2, exact_at)
+        digits[j], estimates[j] = q, tau
+        quotient = quotient * r + q
+        total, carry = path.step(total, carry, q * divisor)
+        q = following
+    columns = np.broadcast_to(column, (iterations, x.size))
+    return simulate.SimulationResult(
+        digits, estimates, columns, ok, failed_at, quotient, path.fractional_bits, exact_at
+    )
+
+
+def compare(target):
+    """The ordinary selector of ``target`` and its next-digit tables, with the cycle depths of both loops."""
+    from .encoding import explore, target_encodings
+    from .exhaustive import target_lut
+    from .overlap import CSA_DEPTH, SELECT_DEPTH, adder_depth
+    from .pipeline import target_spec
+    from .prescale import best_encoding
+
+    spec = target_spec(target)
+    if spec.operation != "division":
+        raise ValueError("Speculative next-digit tables are derived for division only")
+    _, first = target_lut(target)
+    encoding, ordinary = best_encoding(target_encodings(target))
+    rows = {}
+    for q, (table_spec, X, T, digits) in tables(spec).items():
+        name, report = best_encoding(explore(table_spec, X, T, digits))
+        lut = compile_lut(table_spec, X, T, digits)
+        rows[q] = {
+            "spec": table_spec,
+            "lut": lut,
+            "encoding": name,
+            "selector": report,
+            "entries": int(lut.table.size),
+            "assigned": int((lut.table != HOLE).sum()),
+        }
+    if ordinary is None or any(row["selector"] is None for row in rows.values()):
+        raise ValueError("No feasible encoding for a selector table")
+    t_bits = max(row["spec"].t_bits for row in rows.values())
+    selector_depth = max(row["selector"]["selector_depth"] for row in rows.values())
+    decode = max(row["selector"]["loop_depth"] - row["selector"]["selector_depth"] for row in rows.values())
+    pick = 1 + math.ceil(math.log2(len(rows)))
+    return {
+        "spec": spec,
+        "first": first,
+        "encoding": encoding,
+        "ordinary": ordinary,
+        "ordinary_entries": int(first.table.size),
+        "tables": rows,
+        "entries": sum(row["entries"] for row in rows.values()),
+        "gates": sum(row["selector"]["selector_gates"] for row in rows.values()),
+        "ordinary_cycle": adder_depth(spec.t_bits) + ordinary["loop_depth"] + SELECT_DEPTH + CSA_DEPTH,
+        "cycle": max(decode + SELECT_DEPTH + CSA_DEPTH, adder_depth(t_bits) + selector_depth + pick),
+    }
+
+
+def main(argv=None):
+    from .config import parse_assignments
+    from .exhaustive import default_iterations
+    from .pipeline import target_name
+    from .scripts import FIGURE_SCRIPTS
+
+    divisions = sorted(name for name, script in FIGURE_SCRIPTS.items() if script.operation == "division")
+    parser = argparse.ArgumentParser(description="Derive and verify speculative next-digit selector tables.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--only", choices=divisions, help="division script target (default: radix4_qds_optimized)")
+    target.add_argument("--spec", nargs="+", metavar="FIELD=VALUE", help="division table target")
+    parser.add_argument("--operand-bits", type=int, default=16)
+    parser.add_argument("--iterations", type=int, help="recurrence steps (default: operand bits plus a guard digit)")
+    operands = parser.add_mutually_exclusive_group()
+    operands.add_argument("--count", type=int, default=1 << 18, help="random operands (default: %(default)s)")
+    operands.add_argument("--exhaustive", action="store_true", help="every operand of --operand-bits")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    target = args.only or (parse_assignments(args.spec) if args.spec else "radix4_qds_optimized")
+    report = compare(target)
+    spec = report["spec"]
+    iterations = args.iterations or default_iterations(spec, args.operand_bits)
+    if args.exhaustive:
+        count = simulate.operand_count("division", args.operand_bits)
+        x, d = simulate.exhaustive_operands("division", args.operand_bits, 0, count)
+    else:
+        x, d = simulate.random_operands("division", args.count, args.operand_bits, args.seed)
+    speculative = {q: (row["spec"], row["lut"]) for q, row in report["tables"].items()}
+    result = simulate_speculative(report["first"], speculative, spec, x, d, iterations, args.operand_bits)
+    failures = int((~result.ok).sum())
+    print(f"{target_name(target)}: {x.size} operands, {iterations} steps, {failures} failures")
+    print(f"  {'table':<36} {'inputs':>6} {'entries':>7} {'cells':>5} {'gates':>5} {'depth':>5} {'steps':>6}  encoding")
+    ordinary = report["ordinary"]
+    print(
+        f"  {'ordinary ' + spec.name:<36} {len(ordinary['inputs']['selector']):>6} {report['ordinary_entries']:>7} "
+        f"{int((report['first'].table != HOLE).sum()):>5} {ordinary['selector_gates']:>5} "
+        f"{ordinary['selector_depth']:>5} {'':>6}  {report['encoding']}"
+    )
+    taken = result.ok | (np.arange(iterations)[:, np.newaxis] <= result.failed_at)
+    for q, row in report["tables"].items():
+        # Steps selected from the table of q are those following a step that selected q.
+        steps = int((taken[1:] & (result.digits[:-1] == q)).sum())
+        selector = row["selector"]
+        print(
+            f"  {f'after {q:+d}  ' + row['spec'].name:<36} {len(selector['inputs']['selector']):>6} "
+            f"{row['entries']:>7} {row['assigned']:>5} {selector['selector_gates']:>5} {selector['selector_depth']:>5} "
+            f"{100 * steps / max(1, int(taken[1:].sum())):5.1f}%  {row['encoding']}"
+        )
+    print(
+        f"  speculative: {report['entries']} entries, {report['gates']} selector gates, "
+        f"cycle {report['cycle']} levels; ordinary: {report['ordinary_entries']} entries, "
+        f"{ordinary['selector_gates']} selector gates, cycle {report['ordinary_cycle']} levels"
+    )
+    return 0 if failures == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Operation-agnostic versions of the scripts' table routines.
+
+Division conditions key their columns by ``D_values``/``q_conditions`` and square-root conditions
+by ``S_values``/``s_conditions``; everything here accepts either.
+"""
+
+import numpy as np
+
+from .instrument import phase
+from .scripts import FIGURE_SCRIPTS
+
+
+def case_fields(case):
+    """Returns ``(column_values, digit_conditions)`` of one conditions case."""
+    if "D_values" in case:
+        return case["D_values"], case["q_conditions"]
+    return case["S_values"], case["s_conditions"]
+
+
+def apply_conditions(X, T, conditions, stats=None):
+    result = np.full_like(X, np.nan, dtype=float)
+    for case in conditions.values():
+        values, digit_conditions = case_fields(case)
+        x_mask = np.isin(X, values)
+        for digit, condition in digit_conditions:
+            mask = x_mask & condition(X, T)
+            result[mask] = digit
+            if stats is not None:
+                stats.count("mask_evaluations")
+                stats.count("cells_assigned", np.count_nonzero(mask))
+    return result
+
+
+def detect_overlaps(X, T, conditions):
+    """Returns one mask per adjacent digit pair, in the order the conditions list the digits."""
+    overlaps = None
+    for case in conditions.values():
+        values, digit_conditions = case_fields(case)
+        x_mask = np.isin(X, values)
+        masks = [x_mask & condition(X, T) for _, condition in digit_conditions]
+        if overlaps is None:
+            overlaps = [np.zeros_like(X, dtype=bool) for _ in masks[1:]]
+        for overlap, upper, lower in zip(overlaps, masks, masks[1:]):
+            overlap |= upper & lower
+    return tuple(overlaps)
+
+
+OPTIMIZED_SCRIPTS = {("division", 4): "radix4_qds_optimized", ("square_root", 4): "radix4_rds_optimized"}
+
+
+def aligned_split(x, y):
+    """Moves the seam of an overlap ``[y, x]`` to its most aligned estimate; returns the new ``(x, y)``.
+
+    This is what the optimized scripts' ``transform`` does for the widths it covers, for any width.
+    """
+    for shift in range((x + 1 - y).bit_length(), -1, -1):
+        step = 1 << shift
+        seam = -(-y // step) * step
+        if seam <= x + 1:
+            return seam - 1, seam
+
+
+def split_overlaps(transform=aligned_split):
+    """A ``remove_overlaps`` moving every seam with ``transform``, and with ``aligned_split`` where it raises.
+
+    Every overlap is resolved, so ``log`` is never called; it is accepted as ``resolve_column`` passes it.
+    """
+
+    def remove_overlaps(x_list, min_t_list, max_t_list, stats=None, log=print):
+        for i in range(len(x_list) - 1):
+            x, y = max_t_list[i + 1], min_t_list[i]
+            if x_list[i + 1] != x_list[i] or x < y:
+                continue
+            try:
+                new_x, new_y = transform(x, y)
+            except ValueError:
+                new_x, new_y = aligned_split(x, y)
+                if stats is not None:
+                    stats.count("aligned_splits")
+            max_t_list[i + 1], min_t_list[i] = new_x, new_y
+            if stats is not None:
+                stats.count("overlaps_resolved")
+        return min_t_list, max_t_list
+
+    return remove_overlaps
+
+
+def overlap_policy(spec):
+    """Returns the ``remove_overlaps`` for tables of ``spec``'s operation and radix.
+
+    Radix 4 moves its seams with the optimized script's ``transform``, so an edit there reaches every
+    radix-4 table; overlaps wider than it covers, and other radices, are split by ``aligned_split``.
+    """
+    name = OPTIMIZED_SCRIPTS.get((spec.operation, spec.radix))
+    return split_overlaps(FIGURE_SCRIPTS[name].load().transform) if name else split_overlaps()
+
+
+def resolve_column(x, bounds, remove_overlaps, stats=None, log=print):
+    """Resolves one column from its ``{digit: (min_t, max_t)}`` bounds.
+
+    Returns ``[(digit, min_t, max_t), ...]``, top interval first, and the ``(upper, lower)`` digit
+    pairs that still overlap.  ``log`` receives the message of every overlap ``remove_overlaps``
+    cannot handle; ``None`` drops them, the pairs are returned either way.
+    """
+    sorted_digits = sorted(bounds, reverse=(x >= 0))
+    min_t_list = [bounds[digit][0] for digit in sorted_digits]
+    max_t_list = [bounds[digit][1] for digit in sorted_digits]
+    x_list = [x] * len(sorted_digits)
+    with phase(stats, "remove_overlaps"):
+        # Only pass what differs from the defaults, so a plain remove_overlaps(x, min_t, max_t) works too.
+        options = {} if stats is None else {"stats": stats}
+        if log is not print:
+            options["log"] = log
+        min_t_list, max_t_list = remove_overlaps(x_list, min_t_list, max_t_list, **options)
+    unresolved = [
+        (sorted_digits[i - 1], sorted_digits[i])
+        for i in range(1, len(sorted_digits))
+        if max_t_list[i] >= min_t_list[i - 1]
+    ]
+    return list(zip(sorted_digits, min_t_list, max_t_list)), unresolved
+
+
+def column_bounds(X, T, conditions, stats=None):
+    """Returns ``[(x, {digit: (min_t, max_t)}), ...]`` for every column the conditions list, in order."""
+    t_values = T[:, 0]
+    columns = []
+    for case in conditions.values():
+        values, digit_conditions = case_fields(case)
+        with phase(stats, "masks"):
+            masks = [(digit, condition(X, T)) for digit, condition in digit_conditions]
+        if stats is not None:
+            stats.count("mask_evaluations", len(masks))
+        for x in values:
+            column = int(np.flatnonzero(X[0] == x)[0])
+            bounds = {}
+            with phase(stats, "intervals"):
+                for digit, mask in masks:
+                    t = t_values[mask[:, column]]
+                    if t.size > 0:
+                        bounds[digit] = (int(t.min()), int(t.max()))
+            columns.append((x, bounds))
+    return columns
+
+
+def resolve_columns(X, T, columns, remove_overlaps, stats=None, log=print):
+    """Resolves the ``column_bounds`` of a grid; returns what ``resolve_overlaps`` does."""
+    result = np.full_like(X, np.nan, dtype=float)
+    t_values = T[:, 0]
+    intervals = []
+    unresolved = []
+    for x, bounds in columns:
+        column = int(np.flatnonzero(X[0] == x)[0])
+        resolved, pairs = resolve_column(x, bounds, remove_overlaps, stats, log)
+        unresolved += [(int(x), upper, lower) for upper, lower in pairs]
+        with phase(stats, "assign"):
+            for digit, min_t, max_t in resolved:
+                rows = (t_values >= min_t) & (t_values <= max_t)
+                result[rows, column] = digit
+                intervals.append((int(x), digit, min_t, max_t))
+                if stats is not None:
+                    stats.count("cells_assigned", np.count_nonzero(rows))
+    return result, intervals, unresolved
+
+
+def resolve_overlaps(X, T, conditions, remove_overlaps, stats=None, log=print):
+    """Generic ``get_*_no_overlap``: returns the resolved digits and the per-column intervals.
+
+    ``intervals`` lists ``(x, digit, min_t, max_t)`` after resolution, top interval first within
+    each column, and ``unresolved`` the ``(x, upper_digit, lower_digit)`` pairs that still overlap
+    because ``transform`` could not handle their width.  ``stats`` is an optional
+    ``drtools.instrument.Profile``, also handed to ``remove_overlaps``; ``log`` is the
+    ``resolve_column`` one.
+    """
+    return resolve_columns(X, T, column_bounds(X, T, conditions, stats), remove_overlaps, stats, log)
+
+
+def verify_resolution(X, T, conditions, resolved, axis=None):
+    """Checks a resolved table against the raw conditions it was derived from.
+
+    Every cell some digit may select must be assigned, and every assigned digit must be one the
+    conditions allow at that cell.  With ``axis=0`` the counts are per column.
+    """
+    covered = np.zeros_like(X, dtype=bool)
+    allowed = np.zeros_like(X, dtype=bool)
+    for case in conditions.values():
+        values, digit_conditions = case_fields(case)
+        x_mask = np.isin(X, values)
+        for digit, condition in digit_conditions:
+            mask = x_mask & condition(X, T)
+            covered |= mask
+            allowed |= mask & (resolved == digit)
+    assigned = ~np.isnan(resolved)
+    counts = {"cells": covered, "holes": covered & ~assigned, "invalid": assigned & ~allowed}
+    if axis is None:
+        return {field: int(mask.sum()) for field, mask in counts.items()}
+    return {field: mask.sum(axis=axis) for field, mask in counts.items()}
@@ -0,0 +1,172 @@
+"""A small dependency graph of cached tasks executed in a process pool.
+
+A task is a module-level function plus JSON-serialisable arguments; the results of its
+dependencies are appended to those arguments.  Its cache key hashes the function, the arguments,
+the keys of its dependencies and the source of the scripts and of this package, so editing any
+of them invalidates exactly the tasks downstream of the change.  Results are pickled under the
+cache directory; a task that writes files is only reused while those files exist.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from .instrument import Profile, activate
+from .scripts import PYTHON_DIR
+
+SOURCE_DIRS = ("division", "square_root", "drtools")
+
+
+@dataclass
+class Task:
+    key: str
+    function: object
+    args: tuple = ()
+    deps: tuple = ()
+    outputs: tuple = field(default=(), compare=False)
+
+
+def source_fingerprint(directories=SOURCE_DIRS):
+    digest = hashlib.sha256()
+    for directory in directories:
+        root = os.path.join(PYTHON_DIR, directory)
+        for name in sorted(os.listdir(root)):
+            if name.endswith(".py"):
+                digest.update(name.encode())
+                with open(os.path.join(root, name), "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def topological_order(tasks):
+    order = []
+    state = {}
+
+    def visit(key, path):
+        if state.get(key) == "done":
+            return
+        if state.get(key) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + [key])}")
+        if key not in tasks:
+            raise KeyError(f"Unknown dependency {key!r} of {path[-1]!r}")
+        state[key] = "visiting"
+        for dep in tasks[key].deps:
+            visit(dep, path + [key])
+        state[key] = "done"
+        order.append(key)
+
+    for key in tasks:
+        visit(key, [])
+    return order
+
+
+def cache_keys(tasks, order, fingerprint):
+    keys = {}
+    for key in order:
+        task = tasks[key]
+        payload = {
+            "function": f"{task.function.__module__}.{task.function.__qualname__}",
+            "args": task.args,
+            "deps": [keys[dep] for dep in task.deps],
+            "source": fingerprint,
+        }
+        keys[key] = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return keys
+
+
+def _cache_path(cache_dir, digest):
+    return os.path.join(cache_dir, f"{digest}.pkl")
+
+
+def _load_cached(cache_dir, digest, outputs):
+    path = _cache_path(cache_dir, digest)
+    if not os.path.exists(path) or not all(os.path.exists(output) for output in outputs):
+        return False, None
+    with open(path, "rb") as f:
+        return True, pickle.load(f)
+
+
+def _store_cached(cache_dir, digest, result):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(cache_dir, digest)
+    with open(f"{path}.tmp", "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f"{path}.tmp", path)
+
+
+def cached_result(tasks, key, cache_dir):
+    """Returns ``(hit, result)`` for ``tasks[key]`` from the cache of a run over the current sources."""
+    digests = cache_keys(tasks, topological_order(tasks), source_fingerprint())
+    return _load_cached(cache_dir, digests[key], tasks[key].outputs)
+
+
+def store_result(tasks, key, cache_dir, result):
+    """Stores ``result`` as the cached result of ``tasks[key]`` over the current sources."""
+    digests = cache_keys(tasks, topological_order(tasks), source_fingerprint())
+    _store_cached(cache_dir, digests[key], result)
+
+
+def _init_worker():
+    import matplotlib
+
+    matplotlib.use("Agg", force=True)
+
+
+def _timed_call(function, args, profile=None):
+    start = time.perf_counter()
+    if profile is None:
+        result = function(*args)
+        return result, time.perf_counter() - start, None
+    with activate(Profile(track_memory=profile == "memory")) as stats:
+        result = function(*args)
+        summary = stats.summary()
+    return result, time.perf_counter() - start, summary
+
+
+def run_tasks(tasks, jobs=None, cache_dir=None, force=False, log=None, profile=None, profiles=None):
+    """Runs ``{key: Task}`` respecting dependencies; returns ``{key: result}``.
+
+    ``log(key, status, seconds)`` is called as each task finishes with status ``"cached"`` or
+    ``"ran"``.  Without ``cache_dir`` nothing is read from or written to disk.  With ``profile``
+    set to ``"time"`` or ``"memory"`` every task that runs does so under a
+    ``drtools.instrument.Profile`` and its summary is stored in the ``profiles`` dict under the
+    task key; profiles are never cached.
+    """
+    os.environ["MPLBACKEND"] = "Agg"
+    order = topological_order(tasks)
+    digests = cache_keys(tasks, order, source_fingerprint())
+    results = {}
+    waiting = list(order)
+    running = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+        while waiting or running:
+            for key in [key for key in waiting if all(dep in results for dep in tasks[key].deps)]:
+                waiting.remove(key)
+                task = tasks[key]
+                if cache_dir is not None and not force:
+                    hit, result = _load_cached(cache_dir, digests[key], task.outputs)
+                    if hit:
+                        results[key] = result
+                        if log:
+                            log(key, "cached", 0.0)
+                        continue
+                args = tuple(task.args) + tuple(results[dep] for dep in task.deps)
+                running[executor.submit(_timed_call, task.function, args, profile)] = key
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                result, seconds, summary = future.result()
+                results[key] = result
+                if profiles is not None and summary is not None:
+                    profiles[key] = summary
+                if cache_dir is not None:
+                    _store_cached(cache_dir, digests[key], result)
+                if log:
+                    log(key, "ran", seconds)
+    return results
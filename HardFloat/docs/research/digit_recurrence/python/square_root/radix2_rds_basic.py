@@ -39,13 +39,16 @@ ROOT_CONDITIONS = {
 }
 
 
-def apply_conditions(S, T, conditions):
+def apply_conditions(S, T, conditions, stats=None):
     result = np.full_like(S, np.nan, dtype=float)
     for case in conditions.values():
         s_mask = np.isin(S, case["S_values"])
         for s_value, condition in case["s_conditions"]:
             mask = s_mask & condition(S, T)
             result[mask] = s_value
+            if stats is not None:
+                stats.count("mask_evaluations")
+                stats.count("cells_assigned", np.count_nonzero(mask))
     return result
 
 
@@ -133,7 +136,7 @@ def plot_scatter(
         )
 
 
-def plot_root_regions(S, T, s, overlap_s1_s0, overlap_s0_sm1, quadrants):
+def plot_root_regions(S, T, s, overlap_s1_s0, overlap_s0_sm1, quadrants, save_path=None, show=True):
     fig, ax = plt.subplots(figsize=(4, 100))
 
     cmap = create_custom_colormap()
@@ -218,29 +221,28 @@ def plot_root_regions(S, T, s, overlap_s1_s0, overlap_s0_sm1, quadrants):
     ax.yaxis.set_major_formatter(FuncFormatter(binary_formatter(T_BITS, T_FRACTIONAL_BITS)))
 
     plt.tight_layout()
-    current_file_path = os.path.abspath(__file__)
-    current_dir = os.path.dirname(current_file_path)
-    save_path = os.path.abspath(os.path.join(current_dir, "../../figures/square_root"))
+    if save_path is None:
+        current_file_path = os.path.abspath(__file__)
+        current_dir = os.path.dirname(current_file_path)
+        save_path = os.path.abspath(os.path.join(current_dir, "../../figures/square_root"))
     os.makedirs(save_path, exist_ok=True)
     filename = f"radix2_rds_basic_{quadrants}.pdf"
     full_save_path = os.path.join(save_path, filename)
     plt.savefig(full_save_path, dpi=600, format="pdf", bbox_inches="tight")
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)
 
 
 def main():
-    try:
-        # Calculate root digits
-        s = get_root_digit(S, T)
+    # Calculate root digits
+    s = get_root_digit(S, T)
 
-        # Detect overlap regions
-        overlap_s1_s0, overlap_s0_sm1 = detect_overlaps(S, T)
+    # Detect overlap regions
+    overlap_s1_s0, overlap_s0_sm1 = detect_overlaps(S, T)
 
-        # Plot the results for quadrants 1 and 4
-        plot_root_regions(S, T, s, overlap_s1_s0, overlap_s0_sm1, "quadrants_1_4")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    # Plot the results for quadrants 1 and 4
+    plot_root_regions(S, T, s, overlap_s1_s0, overlap_s0_sm1, "quadrants_1_4")
 
 
 if __name__ == "__main__":
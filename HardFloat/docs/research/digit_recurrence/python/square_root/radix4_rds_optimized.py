@@ -58,13 +58,16 @@ ROOT_CONDITIONS = {
 }
 
 
-def apply_conditions(S, T, conditions):
+def apply_conditions(S, T, conditions, stats=None):
     result = np.full_like(S, np.nan, dtype=float)
     for case in conditions.values():
         s_mask = np.isin(S, case["S_values"])
         for s_value, condition in case["s_conditions"]:
             mask = s_mask & condition(S, T)
             result[mask] = s_value
+            if stats is not None:
+                stats.count("mask_evaluations")
+                stats.count("cells_assigned", np.count_nonzero(mask))
     return result
 
 
@@ -110,7 +113,7 @@ def transform(x: int, y: int) -> tuple[int, int]:
         return (xp_high, yp_high)
 
 
-def remove_overlaps(s_list, min_t_list, max_t_list):
+def remove_overlaps(s_list, min_t_list, max_t_list, stats=None, log=print):
     for i in range(len(s_list) - 1):
         if s_list[i + 1] - s_list[i] == 0:
             x = max_t_list[i + 1]
@@ -122,12 +125,18 @@ def remove_overlaps(s_list, min_t_list, max_t_list):
                 new_x, new_y = transform(x, y)
                 max_t_list[i + 1] = new_x
                 min_t_list[i] = new_y
+                if stats is not None:
+                    stats.count("overlaps_resolved")
             except ValueError as e:
-                print(f"Error at index {i}: {e}")
+                if stats is not None:
+                    stats.count("unsupported_diff")
+                    stats.event("unsupported_diff", column=int(s_list[i]), index=i, diff=int(diff))
+                if log is not None:
+                    log(f"Error at index {i}: {e}")
     return min_t_list, max_t_list
 
 
-def get_root_digit_no_overlap(S, T, conditions):
+def get_root_digit_no_overlap(S, T, conditions, stats=None):
     """Calculates root digits after removing overlaps."""
     result = np.full_like(S, np.nan, dtype=float)
 
@@ -145,6 +154,8 @@ def get_root_digit_no_overlap(S, T, conditions):
                 if t_values.size > 0:
                     min_t_values[s_value] = np.min(t_values)
                     max_t_values[s_value] = np.max(t_values)
+            if stats is not None:
+                stats.count("mask_evaluations", len(s_conditions))
 
             # Sort s values based on sign of S
             sorted_s_values = sorted(min_t_values.keys(), reverse=(d_val >= 0))
@@ -155,13 +166,14 @@ def get_root_digit_no_overlap(S, T, conditions):
             max_t_list = [max_t_values[s] for s in sorted_s_values]
 
             # Remove overlaps
-            min_t_list, max_t_list = remove_overlaps(s_list, min_t_list, max_t_list)
-            print(s_list, min_t_list, max_t_list)
+            min_t_list, max_t_list = remove_overlaps(s_list, min_t_list, max_t_list, stats)
 
             # Apply the adjusted conditions
             for i, s_value in enumerate(sorted_s_values):
                 mask = s_mask & (T >= min_t_list[i]) & (T <= max_t_list[i])
                 result[mask] = s_value
+                if stats is not None:
+                    stats.count("cells_assigned", np.count_nonzero(mask))
 
     return result
 
@@ -190,7 +202,7 @@ def create_custom_colormap():
     return ListedColormap(colors)
 
 
-def plot_root_regions_no_overlap(S, T, s, quadrants):
+def plot_root_regions_no_overlap(S, T, s, quadrants, save_path=None, show=True):
     fig, ax = plt.subplots(figsize=(4, 100))
     cmap = create_custom_colormap()
     color_mapping = {
@@ -251,26 +263,25 @@ def plot_root_regions_no_overlap(S, T, s, quadrants):
     ax.yaxis.set_major_formatter(FuncFormatter(binary_formatter(T_BITS, T_FRACTIONAL_BITS)))
 
     plt.tight_layout()
-    current_file_path = os.path.abspath(__file__)
-    current_dir = os.path.dirname(current_file_path)
-    save_path = os.path.abspath(os.path.join(current_dir, "../../figures/square_root"))
+    if save_path is None:
+        current_file_path = os.path.abspath(__file__)
+        current_dir = os.path.dirname(current_file_path)
+        save_path = os.path.abspath(os.path.join(current_dir, "../../figures/square_root"))
     os.makedirs(save_path, exist_ok=True)
     filename = f"radix4_rds_optimized_{quadrants}.pdf"
     full_save_path = os.path.join(save_path, filename)
     plt.savefig(full_save_path, dpi=600, format="pdf", bbox_inches="tight")
-    plt.show()
+    if show:
+        plt.show()
+    plt.close(fig)
 
 
 def main():
-    try:
-        # Calculate root digits without overlaps
-        s_no_overlap = get_root_digit_no_overlap(S, T, ROOT_CONDITIONS)
+    # Calculate root digits without overlaps
+    s_no_overlap = get_root_digit_no_overlap(S, T, ROOT_CONDITIONS)
 
-        # Plot the results for quadrants 1 and 4
-        plot_root_regions_no_overlap(S, T, s_no_overlap, "quadrants_1_4")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    # Plot the results for quadrants 1 and 4
+    plot_root_regions_no_overlap(S, T, s_no_overlap, "quadrants_1_4")
 
 
 if __name__ == "__main__":
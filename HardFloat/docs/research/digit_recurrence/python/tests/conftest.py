@@ -0,0 +1,11 @@
+"""Test setup.
+
+The tests import ``drtools`` from the directory above, so they run from anywhere:
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
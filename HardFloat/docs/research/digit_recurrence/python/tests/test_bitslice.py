@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from drtools import bitslice, simulate
+from drtools.exhaustive import default_iterations, target_lut
+
+OPERAND_BITS = 10
+
+
+def test_matches_word_simulation():
+    spec, lut = target_lut("radix4_qds_optimized")
+    x, d = simulate.random_operands("division", 4096, OPERAND_BITS, seed=3)
+    iterations = default_iterations(spec, OPERAND_BITS)
+    expected = simulate.simulate_division(lut, spec, x, d, iterations, OPERAND_BITS)
+    actual = bitslice.simulate_division(lut, spec, x, d, iterations, OPERAND_BITS)
+    np.testing.assert_array_equal(actual.ok, expected.ok)
+    np.testing.assert_array_equal(actual.failed_at, expected.failed_at)
+    np.testing.assert_array_equal(actual.result, expected.result)
+
+
+def test_cached_selector_is_reused(tmp_path):
+    spec, lut = target_lut("radix4_qds_optimized")
+    functions = bitslice.cached_selector_functions(lut, spec.digit_bound, str(tmp_path))
+    (path,) = (tmp_path / "selectors").iterdir()
+
+    mtime = os.stat(path).st_mtime_ns
+    assert bitslice.cached_selector_functions(lut, spec.digit_bound, str(tmp_path)) == functions
+    assert os.stat(path).st_mtime_ns == mtime
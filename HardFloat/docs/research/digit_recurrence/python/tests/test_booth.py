@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from drtools import booth
+
+
+@pytest.mark.parametrize("width", [8, 32, 64])
+def test_product_matches_reference(width):
+    a, b = booth.corner_operands(width)
+    assert booth.check(width, (a, b)).size == 0
+    assert booth.check(width, booth.random_operands(width, 4096, seed=width)).size == 0
+
+
+@pytest.mark.parametrize(
+    "op, width, half_width",
+    [(op, width, False) for op in sorted(booth.OPS) for width in (32, 64)] + [("mul", 64, True)],
+)
+def test_riscv_ops_match_integer_definition(op, width, half_width):
+    corner = booth.corner_operands(width)
+    operands = [np.concatenate(pair) for pair in zip(corner, booth.random_operands(width, 2048, seed=7))]
+    expected = booth.reference_riscv(op, *operands, width, half_width)
+    np.testing.assert_array_equal(booth.riscv_multiply(op, *operands, width, half_width), expected)
+
+
+def test_reference_riscv_examples():
+    minus_one, minus_two = np.array([(1 << 64) - 1], dtype=np.uint64), np.array([(1 << 64) - 2], dtype=np.uint64)
+    assert booth.reference_riscv("mul", minus_one, minus_two).tolist() == [2]
+    assert booth.reference_riscv("mulh", minus_one, minus_two).tolist() == [0]
+    assert booth.reference_riscv("mulhu", minus_one, minus_two).tolist() == [(1 << 64) - 3]
+    assert booth.reference_riscv("mulhsu", minus_one, minus_two).tolist() == [(1 << 64) - 1]
+    # mulw of 0x7fffffff by 2 wraps to a negative word, sign-extended to 64 bits.
+    assert booth.reference_riscv("mul", [0x7FFFFFFF], [2], half_width=True).tolist() == [(1 << 64) - 2]
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from drtools import chunked, tables
+from drtools.lint import lint_target
+from drtools.lut import HOLE
+from drtools.pipeline import load_target, target_spec
+
+# Limits a few chunks wide for each target.
+TARGETS = [
+    ("radix4_qds_optimized", 256 << 10),
+    ("radix4_rds_optimized", 256 << 10),
+    ({"operation": "division", "radix": 4, "x_bits": 7, "t_bits": 11}, 2 << 20),
+]
+
+
+@pytest.mark.parametrize("target, memory_limit", TARGETS)
+def test_chunks_match_the_dense_pipeline(target, memory_limit):
+    _, X, T, conditions = load_target(target)
+    digits, _, unresolved = tables.resolve_overlaps(
+        X, T, conditions, tables.overlap_policy(target_spec(target)), log=None
+    )
+    summary, resolved, violations = chunked.run(target, memory_limit)
+    assert summary["chunks"] > 1
+    np.testing.assert_array_equal(resolved, np.where(np.isnan(digits), HOLE, np.nan_to_num(digits)))
+    assert summary["unresolved"] == len(unresolved)
+    cells = sorted((v["kind"], v["x"], v["t"]) for v in violations)
+    assert cells == sorted((v["kind"], v["x"], v["t"]) for v in lint_target(target))
+
+
+def test_limit_below_one_column_is_rejected():
+    with pytest.raises(ValueError, match="memory limit"):
+        chunked.run(TARGETS[-1][0], memory_limit=512 << 10)
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from drtools import compressor
+
+
+def _value(columns):
+    return sum(sum(column) << i for i, column in enumerate(columns)) % (1 << len(columns))
+
+
+def test_residual_columns_follow_divider_stage3():
+    heights = [len(column) for column in compressor.residual_columns(64)]
+    assert len(heights) == 66
+    assert heights[:5] == [1, 3, 2, 2, 3]
+    assert set(heights[4:]) == {3}
+
+
+@pytest.mark.parametrize(
+    "scheme, full_adders, half_adders",
+    [
+        ("wallace_carry_save", 63, 2),
+        ("wallace_carry_chain", 63, 2),
+        ("dadda_carry_save", 62, 3),
+        ("dadda_carry_chain", 62, 3),
+    ],
+)
+def test_residual_reduction_of_a_64_bit_divider(scheme, full_adders, half_adders):
+    reduction = compressor.reduce_columns(compressor.residual_columns(64), scheme)
+    assert (reduction.usage.num3to2, reduction.usage.num2to2, reduction.stages) == (full_adders, half_adders, 1)
+    assert max(reduction.heights) <= 2
+
+
+@pytest.mark.parametrize("scheme", compressor.SCHEMES)
+def test_logic_model_keeps_the_sum(scheme):
+    rng = random.Random(scheme)
+    profile = [[rng.randint(0, 1) for _ in range(height)] for height in [1, 3, 5, 9, 12, 12, 8, 6, 4, 2, 1]]
+    reduction = compressor.reduce_columns(profile, scheme, model=compressor.LOGIC)
+    assert max(reduction.heights) <= 2
+    assert _value(reduction.columns) == _value(profile)
@@ -0,0 +1,22 @@
+import pytest
+
+from drtools import tables
+from drtools.encoding import ENCODINGS, _expand, compose, explore
+from drtools.pipeline import load_target, target_spec
+
+
+def test_expand_fills_open_bits():
+    assert _expand((1, None, 0)) == [(1, 0, 0), (1, 1, 0)]
+    assert _expand((None, None)) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+
+@pytest.mark.parametrize("target", ["radix4_qds_optimized", "radix4_rds_optimized"])
+def test_minimized_selector_composes_with_its_consumer(target):
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    digits, _, _ = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec), log=None)
+    reports = explore(spec, X, T, digits)
+    assert reports["sign_magnitude/table"]["feasible"]
+    for encoding in ENCODINGS:
+        if reports[encoding]["feasible"]:
+            assert compose(spec, X, T, digits, encoding, reports[encoding]) == 0, encoding
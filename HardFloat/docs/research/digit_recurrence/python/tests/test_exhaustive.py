@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from drtools import exhaustive, simulate
+
+OPERAND_BITS = 8
+
+
+@pytest.fixture(scope="module")
+def division():
+    return exhaustive.target_lut("radix4_qds_optimized")
+
+
+def test_run_and_resume(division, tmp_path):
+    spec, lut = division
+    checkpoint = str(tmp_path / "radix4.json")
+    summary = exhaustive.run(spec, lut, checkpoint, OPERAND_BITS, shard_size=1024, jobs=1, progress=False)
+    assert summary["complete"] and summary["failures"] == 0
+    assert summary["operands"] == simulate.operand_count("division", OPERAND_BITS)
+
+    with open(checkpoint) as f:
+        state = json.load(f)
+    assert len(state["completed"]) == state["shards"] == summary["operands"] // 1024
+    # A finished checkpoint resumes without verifying anything again.
+    assert exhaustive.run(spec, lut, checkpoint, OPERAND_BITS, shard_size=1024, jobs=1, progress=False) == summary
+
+    with pytest.raises(ValueError, match="--restart"):
+        exhaustive.run(spec, lut, checkpoint, OPERAND_BITS, shard_size=512, jobs=1, progress=False)
+    restarted = exhaustive.run(
+        spec, lut, checkpoint, OPERAND_BITS, shard_size=512, jobs=1, progress=False, restart=True
+    )
+    assert restarted["complete"] and restarted["failures"] == 0
+
+
+def test_bitsliced_matches_word_run(division, tmp_path):
+    spec, lut = division
+    word = exhaustive.run(spec, lut, str(tmp_path / "word.json"), OPERAND_BITS, jobs=1, progress=False)
+    sliced = exhaustive.run(
+        spec, lut, str(tmp_path / "sliced.json"), OPERAND_BITS, jobs=1, progress=False, bitsliced=True
+    )
+    assert (sliced["operands"], sliced["failures"]) == (word["operands"], word["failures"])
+
+
+def test_limits_are_checked_before_workers_start(division, tmp_path):
+    spec, lut = division
+    checkpoint = tmp_path / "radix4.json"
+    with pytest.raises(ValueError, match="multiple of 64"):
+        exhaustive.run(spec, lut, str(checkpoint), OPERAND_BITS, shard_size=1000, bitsliced=True, progress=False)
+    sqrt_spec, sqrt_lut = exhaustive.target_lut("radix4_rds_optimized")
+    with pytest.raises(ValueError, match="division only"):
+        exhaustive.run(sqrt_spec, sqrt_lut, str(checkpoint), OPERAND_BITS, bitsliced=True, progress=False)
+    assert not checkpoint.exists()
@@ -0,0 +1,100 @@
+import math
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from drtools import floatref
+
+NUMPY_TYPES = {16: (np.float16, np.int16), 32: (np.float32, np.int32)}
+
+
+def _numpy_bits(values, fmt):
+    return values.astype(NUMPY_TYPES[fmt][0]).view(NUMPY_TYPES[fmt][1]).astype(np.int64) & ((1 << fmt) - 1)
+
+
+def _floats(bits, fmt):
+    float_type, int_type = NUMPY_TYPES[fmt]
+    return np.asarray(bits, dtype=np.int64).astype(int_type).view(float_type)
+
+
+def _assert_matches_numpy(bits, expected, fmt):
+    nan = np.isnan(_floats(expected, fmt))
+    np.testing.assert_array_equal(bits[~nan], expected[~nan])
+    assert (bits[nan] == floatref.default_nan(fmt)).all()
+
+
+@pytest.mark.parametrize("fmt", [16, 32])
+def test_near_even_division_matches_numpy(fmt):
+    a, b = floatref.random_inputs(fmt, "div", 1 << 16, seed=fmt)
+    bits, _, _ = floatref.divide(a, b, fmt)
+    with np.errstate(all="ignore"):
+        expected = _numpy_bits(_floats(a, fmt) / _floats(b, fmt), fmt)
+    _assert_matches_numpy(bits, expected, fmt)
+
+
+def test_near_even_square_root_matches_numpy_for_every_f16():
+    (a,) = floatref.inputs(16, "sqrt", 0, floatref.input_count(16, "sqrt"))
+    bits, _, _ = floatref.sqrt(a, 16)
+    with np.errstate(all="ignore"):
+        expected = _numpy_bits(np.sqrt(_floats(a, 16)), 16)
+    _assert_matches_numpy(bits, expected, 16)
+
+
+def _value(bits):
+    sign, exponent, fraction = bits >> 15, (bits >> 10) & 31, bits & 1023
+    magnitude = Fraction(fraction, 1 << 24) if exponent == 0 else Fraction(1024 + fraction, 1 << 25) * 2**exponent
+    return -magnitude if sign else magnitude
+
+
+def _round(value, rounding):
+    """The f16 bit pattern of a nonzero rational ``value`` rounded once, and its exception flags."""
+    negative, magnitude = value < 0, abs(value)
+    exponent = max(math.floor(math.log2(magnitude)), -14)
+    while magnitude >= 2 ** (exponent + 1):
+        exponent += 1
+    while exponent > -14 and magnitude < 2**exponent:
+        exponent -= 1
+    ulp = Fraction(2) ** (exponent - 10)
+    units, remainder = divmod(magnitude / ulp, 1)
+    up = {
+        "near_even": remainder > Fraction(1, 2) or (remainder == Fraction(1, 2) and units % 2 == 1),
+        "near_maxMag": remainder >= Fraction(1, 2),
+        "minMag": False,
+        "min": negative and remainder > 0,
+        "max": not negative and remainder > 0,
+        "odd": remainder > 0 and units % 2 == 0,
+    }[rounding]
+    units += up
+    flags = floatref.FLAG_INEXACT if remainder else 0
+    if units * ulp >= 65536:
+        flags = floatref.FLAG_OVERFLOW | floatref.FLAG_INEXACT
+        to_infinity = rounding in ("near_even", "near_maxMag") or rounding == ("min" if negative else "max")
+        bits = 0x7C00 if to_infinity else 0x7BFF
+    else:
+        bits = int(_numpy_bits(np.array([float(units * ulp)]), 16)[0])
+    return bits | (0x8000 if negative else 0), flags
+
+
+@pytest.mark.parametrize("rounding", sorted(floatref.ROUNDING))
+def test_division_rounds_like_exact_arithmetic(rounding):
+    a, b = floatref.random_inputs(16, "div", 4096, seed=1)
+    bits, flags, _ = floatref.divide(a, b, 16, rounding)
+    exponent_mask = 0x7C00
+    for i in range(a.size):
+        if (a[i] & exponent_mask) == exponent_mask or (b[i] & exponent_mask) == exponent_mask:
+            continue
+        if a[i] & 0x7FFF == 0 or b[i] & 0x7FFF == 0:
+            continue
+        expected, expected_flags = _round(_value(int(a[i])) / _value(int(b[i])), rounding)
+        assert (bits[i], flags[i] & ~floatref.FLAG_UNDERFLOW) == (expected, expected_flags), (a[i], b[i])
+
+
+def test_special_operands():
+    one, zero, infinity, minus_one = 0x3C00, 0x0000, 0x7C00, 0xBC00
+    bits, flags, _ = floatref.divide(np.array([one, zero, infinity]), np.array([zero, zero, infinity]), 16)
+    assert bits.tolist() == [infinity, floatref.default_nan(16), floatref.default_nan(16)]
+    assert flags.tolist() == [floatref.FLAG_INFINITE, floatref.FLAG_INVALID, floatref.FLAG_INVALID]
+    bits, flags, _ = floatref.sqrt(np.array([minus_one, 0x8000, infinity]), 16)
+    assert bits.tolist() == [floatref.default_nan(16), 0x8000, infinity]
+    assert flags.tolist() == [floatref.FLAG_INVALID, 0, 0]
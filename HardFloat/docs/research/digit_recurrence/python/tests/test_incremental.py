@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from drtools import tables
+from drtools.incremental import IncrementalTable
+
+TARGET = "radix4_qds_optimized"
+
+
+@pytest.fixture
+def table():
+    return IncrementalTable(TARGET)
+
+
+def _assert_matches_full_run(table, remove_overlaps):
+    X, T, conditions = table.X, table.T, table.conditions
+    np.testing.assert_array_equal(table.generate_result()["digits"], tables.apply_conditions(X, T, conditions))
+    for kept, full in zip(table.generate_result()["overlaps"], tables.detect_overlaps(X, T, conditions)):
+        np.testing.assert_array_equal(kept, full)
+    digits, intervals, unresolved = tables.resolve_overlaps(X, T, conditions, remove_overlaps, log=None)
+    resolved = table.resolve_result()
+    np.testing.assert_array_equal(resolved["digits"], digits)
+    assert (resolved["intervals"], resolved["unresolved"]) == (intervals, unresolved)
+    counts = tables.verify_resolution(X, T, conditions, digits, axis=0)
+    assert table.report() == {field: int(count.sum()) for field, count in counts.items()}
+
+
+def test_boundary_edit(table, tmp_path):
+    case = table.conditions["positive_D"]
+    x = case["D_values"][1]
+    condition = dict(case["q_conditions"])[1]
+    update = table.edit("positive_D", 1, lambda X, T: condition(X, T) & (X != x))
+    assert update["boundaries"] == [("positive_D", 1)]
+    assert update["evaluated"] == [x]
+    _assert_matches_full_run(table, table.remove_overlaps)
+    with pytest.raises(ValueError, match="edited in memory"):
+        table.store(str(tmp_path / "cache"), str(tmp_path / "figures"))
+
+
+def test_seam_edit(table):
+    remove_overlaps = tables.split_overlaps(lambda x, y: (y - 1, y))
+    update = table.edit_seam(remove_overlaps)
+    assert update["boundaries"] == [] and update["evaluated"] == []
+    assert update["resolved"]
+    _assert_matches_full_run(table, remove_overlaps)
+
+
+def test_unchanged_sources_update_nothing(table, tmp_path):
+    path = str(tmp_path / "state.pkl")
+    table.save(path)
+    loaded, update = IncrementalTable.load(path, TARGET)
+    assert update == {"boundaries": [], "evaluated": [], "resolved": [], "cells": 0, "holes": 0, "invalid": 0}
+    np.testing.assert_array_equal(loaded.resolve_result()["digits"], table.resolve_result()["digits"])
+    assert loaded.resolve_result()["intervals"] == table.resolve_result()["intervals"]
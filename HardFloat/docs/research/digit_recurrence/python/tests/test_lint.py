@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from drtools import tables
+from drtools.lint import lint_table, lint_target
+from drtools.pipeline import load_target, target_spec
+from drtools.regions import reachable_cells
+
+
+def _kinds(violations):
+    kinds = {}
+    for violation in violations:
+        kinds[violation["kind"]] = kinds.get(violation["kind"], 0) + 1
+    return kinds
+
+
+@pytest.mark.parametrize(
+    "target, kinds",
+    [
+        ("radix2_qds_basic", {}),
+        ("radix4_qds_basic", {}),
+        ("radix4_qds_optimized", {}),
+        ("radix2_rds_basic", {"hole": 6}),
+        ("radix4_rds_basic", {"hole": 52}),
+        ("radix4_rds_optimized", {"hole": 52}),
+    ],
+)
+def test_script_targets(target, kinds):
+    assert _kinds(lint_target(target)) == kinds
+
+
+def test_square_root_holes_are_reachable():
+    target = "radix4_rds_optimized"
+    spec = target_spec(target)
+    _, X, T, _ = load_target(target)
+    reachable = reachable_cells(spec, X, T)
+    for violation in lint_target(target):
+        row, column = np.argwhere((X == violation["x"]) & (T == violation["t"]))[0]
+        assert reachable[row, column]
+
+
+def test_cleared_cell_is_a_hole():
+    target = {"operation": "division", "radix": 4, "x_bits": 5, "t_bits": 8}
+    spec = target_spec(target)
+    _, X, T, conditions = load_target(target)
+    digits, intervals, unresolved = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec), log=None)
+    assert lint_table(spec, X, T, digits, conditions, intervals, unresolved) == []
+
+    row, column = np.argwhere(reachable_cells(spec, X, T) & ~np.isnan(digits))[0]
+    digits[row, column] = np.nan
+    violations = lint_table(spec, X, T, digits, conditions, intervals, unresolved)
+    assert [(v["kind"], v["x"], v["t"]) for v in violations] == [("hole", X[row, column], T[row, column])]
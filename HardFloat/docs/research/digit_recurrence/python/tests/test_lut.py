@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from drtools import tables
+from drtools.lut import HOLE, compile_lut, select_digit
+from drtools.pipeline import load_target, target_spec
+
+
+@pytest.mark.parametrize("target", ["radix4_qds_optimized", "radix2_rds_basic"])
+def test_select_digit_reads_back_the_grid(target):
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    digits, _, _ = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec), log=None)
+    lut = compile_lut(spec, X, T, digits)
+    expected = np.where(np.isnan(digits), HOLE, np.nan_to_num(digits)).astype(np.int8)
+    inside = (X >= lut.first_column) & (X < lut.first_column + lut.columns)
+    np.testing.assert_array_equal(select_digit(lut, X[inside], T[inside]), expected[inside])
+
+
+def test_columns_outside_the_table_are_holes():
+    target = "radix4_qds_optimized"
+    _, X, T, conditions = load_target(target)
+    spec = target_spec(target)
+    digits, _, _ = tables.resolve_overlaps(X, T, conditions, tables.overlap_policy(spec), log=None)
+    lut = compile_lut(spec, X, T, digits)
+    columns = [lut.first_column - 1, lut.first_column + lut.columns]
+    assert select_digit(lut, columns, [0, 0]).tolist() == [HOLE, HOLE]
@@ -0,0 +1,32 @@
+import pytest
+
+from drtools import simulate
+from drtools.exhaustive import default_iterations, target_lut
+from drtools.lint import lint_target
+from drtools.regions import TableSpec, _merge, _subtract, sqrt_gaps
+
+SQRT_TARGETS = [
+    {"operation": "square_root", "radix": 2, "x_bits": 4, "t_bits": 6},
+    {"operation": "square_root", "radix": 4, "x_bits": 5, "t_bits": 8},
+    {"operation": "square_root", "radix": 4, "x_bits": 6, "t_bits": 10},
+]
+
+
+def test_spans():
+    assert _merge([(5, 7), (0, 2), (3, 3), (9, 8), (6, 10)]) == [(0, 3), (5, 10)]
+    assert _subtract([(0, 10), (20, 30)], [(2, 3), (8, 22)]) == [(0, 1), (4, 7), (23, 30)]
+    assert _subtract([(0, 4)], []) == [(0, 4)]
+
+
+@pytest.mark.parametrize("target", SQRT_TARGETS)
+def test_derived_square_root_tables_are_complete(target):
+    assert sqrt_gaps(TableSpec(**target)) == []
+    assert lint_target(target) == []
+
+
+@pytest.mark.parametrize("target", SQRT_TARGETS)
+def test_derived_square_root_tables_converge(target):
+    spec, lut = target_lut(target)
+    (radicands,) = simulate.random_operands("square_root", 4096, 10, seed=1)
+    result = simulate.simulate_sqrt(lut, spec, radicands, default_iterations(spec, 10), 10)
+    assert result.ok.all()
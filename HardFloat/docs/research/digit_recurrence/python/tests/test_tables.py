@@ -0,0 +1,40 @@
+import pytest
+
+from drtools import tables
+from drtools.instrument import Profile
+from drtools.pipeline import load_target, target_spec
+from drtools.scripts import FIGURE_SCRIPTS
+
+
+def test_aligned_split_matches_the_optimized_transform():
+    transform = FIGURE_SCRIPTS["radix4_qds_optimized"].load().transform
+    for y in range(-40, 40):
+        for x in range(y, y + 15):
+            assert tables.aligned_split(x, y) == transform(x, y), (x, y)
+
+
+def test_split_overlaps_falls_back_for_wide_overlaps():
+    def narrow(x, y):
+        raise ValueError("not covered")
+
+    stats = Profile()
+    x_list, min_t, max_t = [8, 8], [-3, 2], [5, 12]
+    tables.split_overlaps(narrow)(x_list, min_t, max_t, stats)
+    assert (max_t[1], min_t[0]) == tables.aligned_split(5, -3)
+    assert stats.counters == {"aligned_splits": 1, "overlaps_resolved": 1}
+
+
+@pytest.mark.parametrize(
+    "target",
+    [
+        "radix4_qds_optimized",
+        {"operation": "division", "radix": 2, "x_bits": 5, "t_bits": 8},
+        {"operation": "division", "radix": 4, "x_bits": 6, "t_bits": 10},
+        {"operation": "square_root", "radix": 4, "x_bits": 5, "t_bits": 8},
+    ],
+)
+def test_overlap_policy_resolves_every_overlap(target):
+    _, X, T, conditions = load_target(target)
+    policy = tables.overlap_policy(target_spec(target))
+    _, _, unresolved = tables.resolve_overlaps(X, T, conditions, policy, log=None)
+    assert unresolved == []